@@ -0,0 +1,154 @@
+#Author(s)     : Pedro Espino (pespino@berkeley.edu)
+#Licence       : GPLv3
+
+# This module calculates the Food Desert and Food Swamp Indices from city-wide rasters instead of sampling each census tract
+# on its own. The supermarket and bodega coordinates are binned onto one grid covering every tract (plus the driving distance
+# around them) at the analysis resolution, and the binned counts are convolved (through FFTs) with disks of radius walking
+# and driving distance. This gives the number of stores within reach of every cell of the city at once. Every tract is then
+# rasterized into a map of cell IDs, and the per-tract averages come from summing the store count rasters over those IDs.
+# Distances are measured between cell centres, so store counts can differ from the per-tract sampler near the disk edges.
+
+import os
+import numpy as np
+import shapely
+
+from tract_indices import access_indices
+
+#grid of cells of size resolution (in degrees) covering bounds (lonmin, latmin, lonmax, latmax) padded by margin on every side
+def make_raster_grid(bounds, resolution, margin=0.0):
+    lonmin, latmin, lonmax, latmax = bounds
+    x0 = lonmin - margin
+    y0 = latmin - margin
+    nx = int(np.ceil((lonmax + margin - x0)/resolution)) + 1
+    ny = int(np.ceil((latmax + margin - y0)/resolution)) + 1
+    return {'x0': x0, 'y0': y0, 'resolution': resolution, 'nx': nx, 'ny': ny}
+
+#longitudes and latitudes of the centres of the grid cells, as (ny, nx) arrays
+def cell_centres(GRID):
+    xs = GRID['x0'] + (np.arange(GRID['nx']) + 0.5)*GRID['resolution']
+    ys = GRID['y0'] + (np.arange(GRID['ny']) + 0.5)*GRID['resolution']
+    return np.meshgrid(xs, ys)
+
+#number of stores ([longitude, latitude] coordinates) in each grid cell, stores outside the grid are left out
+def bin_stores(GRID, store_coords):
+    store_coords = np.asarray(store_coords, dtype=float).reshape(-1, 2)
+    columns = np.floor((store_coords[:,0] - GRID['x0'])/GRID['resolution']).astype(np.int64)
+    rows = np.floor((store_coords[:,1] - GRID['y0'])/GRID['resolution']).astype(np.int64)
+    inside = (columns>=0) & (columns<GRID['nx']) & (rows>=0) & (rows<GRID['ny'])
+    counts = np.bincount(rows[inside]*GRID['nx'] + columns[inside], minlength=GRID['nx']*GRID['ny'])
+    return counts.reshape(GRID['ny'], GRID['nx'])
+
+#disk of cells whose centres lie within radius of the centre cell, as a square array of ones and zeros
+def disk_kernel(radius, resolution):
+    reach = int(np.floor(radius/resolution))
+    offsets = np.arange(-reach, reach+1)*resolution
+    dx, dy = np.meshgrid(offsets, offsets)
+    return (np.hypot(dx, dy)<=radius).astype(float)
+
+#number of stores within radius of every grid cell, by convolving the binned store counts with a disk
+def store_count_raster(GRID, store_coords, radius):
+    #scipy.signal takes about half a second to import, so it is only imported once a raster is needed
+    from scipy.signal import fftconvolve
+    counts = bin_stores(GRID, store_coords)
+    if(not counts.any()):
+        return np.zeros(counts.shape, dtype=np.int64)
+    #the convolution of integer counts is exact up to round-off, so round back to whole stores
+    return np.rint(fftconvolve(counts, disk_kernel(radius, GRID['resolution']), mode='same')).astype(np.int64)
+
+#the store count rasters used by the indices: supermarkets within walking and driving distance, bodegas within walking distance
+def accessibility_rasters(GRID, supermarket_coords, bodega_coords, walking_distance, driving_distance):
+    return {
+        'supermarkets_walking': store_count_raster(GRID, supermarket_coords, walking_distance),
+        'supermarkets_driving': store_count_raster(GRID, supermarket_coords, driving_distance),
+        'bodegas_walking': store_count_raster(GRID, bodega_coords, walking_distance),
+    }
+
+#map of the grid cells whose centres fall inside each geometry, with the index of the geometry in GEOMETRIES (-1 elsewhere)
+def rasterize_geometries(GRID, GEOMETRIES):
+    xcentres, ycentres = cell_centres(GRID)
+    cell_ids = np.full((GRID['ny'], GRID['nx']), -1, dtype=np.int64)
+    for k, geom in enumerate(GEOMETRIES):
+        #only test the cells within the bounds of the geometry
+        lonmin, latmin, lonmax, latmax = geom.bounds
+        c0 = max(int(np.floor((lonmin - GRID['x0'])/GRID['resolution'])), 0)
+        c1 = min(int(np.ceil((lonmax - GRID['x0'])/GRID['resolution'])), GRID['nx'])
+        r0 = max(int(np.floor((latmin - GRID['y0'])/GRID['resolution'])), 0)
+        r1 = min(int(np.ceil((latmax - GRID['y0'])/GRID['resolution'])), GRID['ny'])
+        if(c1<=c0 or r1<=r0):
+            continue
+        shapely.prepare(geom)
+        inside = shapely.contains_xy(geom, xcentres[r0:r1, c0:c1], ycentres[r0:r1, c0:c1])
+        cell_ids[r0:r1, c0:c1][inside] = k
+    return cell_ids
+
+#save the grid and store count rasters to an npz file, for use in other analyses
+def save_rasters(path, GRID, RASTERS):
+    tmp_path = path + '.tmp.npz'
+    np.savez(tmp_path, grid=np.array([GRID['x0'], GRID['y0'], GRID['resolution'], GRID['nx'], GRID['ny']], dtype=float), **RASTERS)
+    os.replace(tmp_path, path)
+
+#calculate the indices for a list of task tuples (tract index, geometry, NTA code, vehicle fraction, population) from the
+#city-wide rasters, yielding (tract index, parts) in the same order as TASKS with the same parts as iterate_tract_indices.
+#If RASTERS is a dict, the grid and store count rasters are put into it, and if TRACT_STATS is a list the number of sample
+#cells of each tract is appended to it. The grid covers grid_bounds (lonmin, latmin, lonmax, latmax), by default the bounds
+#of the tracts in TASKS. Runs over some of the tracts (e.g. incremental updates) should pass the bounds of all of them, so
+#that their cells line up with those of a full run
+def iterate_raster_tract_indices(TASKS, supermarket_coords, bodega_coords, resolution, walking_distance, driving_distance,
+                                 RASTERS=None, TRACT_STATS=None, grid_bounds=None):
+    TASKS = list(TASKS)
+    #polygon parts of every tract which is not a park or cemetery (NTA codes ending in '99')
+    TASK_PARTS=[]
+    PART_GEOMETRIES=[]
+    for tract_index, tract_geometry, ntacode, fraction_of_vehicles_in_ct, population_in_ct in TASKS:
+        parts = list(shapely.get_parts(tract_geometry))
+        if(ntacode[-2:]=='99'):
+            TASK_PARTS.append((parts, None))
+        else:
+            TASK_PARTS.append((parts, np.arange(len(PART_GEOMETRIES), len(PART_GEOMETRIES)+len(parts))))
+            PART_GEOMETRIES.extend(parts)
+    if(len(PART_GEOMETRIES)>0):
+        if(grid_bounds is None):
+            grid_bounds = shapely.total_bounds(PART_GEOMETRIES)
+        GRID = make_raster_grid(grid_bounds, resolution, margin=driving_distance)
+        CITY_RASTERS = accessibility_rasters(GRID, supermarket_coords, bodega_coords, walking_distance, driving_distance)
+        cell_ids = rasterize_geometries(GRID, PART_GEOMETRIES).ravel()
+        in_part = cell_ids>=0
+        #number of sample cells and summed store counts of every part
+        part_cells = np.bincount(cell_ids[in_part], minlength=len(PART_GEOMETRIES))
+        PART_SUMS = {key: np.bincount(cell_ids[in_part], weights=raster.ravel()[in_part], minlength=len(PART_GEOMETRIES))
+                     for key, raster in CITY_RASTERS.items()}
+        if(RASTERS is not None):
+            RASTERS['grid'] = GRID
+            RASTERS.update(CITY_RASTERS)
+
+    for (tract_index, tract_geometry, ntacode, fraction_of_vehicles_in_ct, population_in_ct), (parts, part_ids) in zip(TASKS, TASK_PARTS):
+        TRACT_PARTS=[]
+        number_of_cells = 0
+        sums = {'supermarkets_walking': 0.0, 'supermarkets_driving': 0.0, 'bodegas_walking': 0.0}
+        for k, geom in enumerate(parts):
+            xs, ys = geom.exterior.xy
+            if(part_ids is None):
+                TRACT_PARTS.append({'xs': np.asarray(xs), 'ys': np.asarray(ys), 'park': True})
+                continue
+            #as with the per-tract sampler, each part is averaged over the sample points of the tract's parts so far
+            number_of_cells += part_cells[part_ids[k]]
+            for key in sums:
+                sums[key] += PART_SUMS[key][part_ids[k]]
+            if(number_of_cells>0):
+                avg_walking_distance_supermarkets = sums['supermarkets_walking']/number_of_cells
+                avg_driving_distance_supermarkets = sums['supermarkets_driving']/number_of_cells
+                avg_walking_distance_bodegas = sums['bodegas_walking']/number_of_cells
+            else:
+                avg_walking_distance_supermarkets = 0.0
+                avg_driving_distance_supermarkets = 0.0
+                avg_walking_distance_bodegas = 0.0
+
+            food_access_ind, number_of_bodegas, food_desert_index, food_swamp_index = access_indices(
+                avg_walking_distance_supermarkets, avg_driving_distance_supermarkets, avg_walking_distance_bodegas,
+                fraction_of_vehicles_in_ct, population_in_ct)
+            TRACT_PARTS.append({'xs': np.asarray(xs), 'ys': np.asarray(ys), 'park': False,
+                                'food_access_ind': food_access_ind, 'number_of_bodegas': number_of_bodegas,
+                                'food_desert_index': food_desert_index, 'food_swamp_index': food_swamp_index})
+        if(TRACT_STATS is not None):
+            TRACT_STATS.append({'tract_index': tract_index, 'sample_points': int(number_of_cells)})
+        yield tract_index, TRACT_PARTS
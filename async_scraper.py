@@ -0,0 +1,90 @@
+#Author(s)     : Pedro Espino (pespino@berkeley.edu)
+#Licence       : GPLv3
+
+# This module scrapes supermarket listings from supermarketpage.com (or any site with the same layout, given by base_url).
+# The listing pages are fetched concurrently by asyncio, over a bounded pool of persistent (keep-alive) HTTP connections, so
+# that no more than max_concurrency requests are in flight and every connection is reused for many pages. Failed requests
+# (dropped connections, timeouts and 429/5xx responses) are retried with exponential backoff. Each page is parsed from the
+# response stream as it downloads (see listing_parser.py), and the stores are returned in the order the pages are linked.
+
+import asyncio
+import http.client
+from urllib.error import HTTPError
+from urllib.parse import urljoin, urlsplit
+
+from listing_parser import iter_response_chunks, iter_store_links, iter_listing_records
+
+DEFAULT_BASE_URL = "http://supermarketpage.com"
+
+#responses worth retrying, the other error responses fail straight away
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+#url of a link on the site, moved onto base_url (the listing pages link to the site by its full address)
+def resolve_link(base_url, page_url, link):
+    parts = urlsplit(urljoin(page_url, link))
+    path = parts.path + ('?' + parts.query if parts.query else '')
+    return urljoin(base_url.rstrip('/') + '/', path.lstrip('/'))
+
+#a GET request over an open connection. Returns parse applied to the chunks of the response body as they arrive (the whole
+#body if parse is None). Runs in a worker thread
+def _request(connection, url, headers, parse=None):
+    parts = urlsplit(url)
+    path = parts.path + ('?' + parts.query if parts.query else '')
+    connection.request('GET', path or '/', headers=headers)
+    response = connection.getresponse()
+    if(response.status>=400):
+        response.read()
+        raise HTTPError(url, response.status, response.reason, response.headers, None)
+    if(parse is None):
+        return response.read()
+    result = parse(iter_response_chunks(response))
+    #the whole body has to be read before the connection can be used for the next request
+    response.read()
+    return result
+
+#fetch a url with a connection from the pool, retrying failed requests after backoff, 2*backoff, 4*backoff, ... seconds.
+#parse is applied to the response stream, and starts over on a fresh stream when a request is retried
+async def fetch_page(POOL, url, headers, parse=None, retries=3, backoff=0.5):
+    for attempt in range(retries+1):
+        connection = await POOL.get()
+        try:
+            return await asyncio.to_thread(_request, connection, url, headers, parse)
+        except (HTTPError, OSError, http.client.HTTPException) as error:
+            #a dropped or half-read connection can not be reused, closing it makes the next request reconnect
+            connection.close()
+            if((isinstance(error, HTTPError) and error.code not in RETRY_STATUSES) or attempt==retries):
+                raise
+        finally:
+            POOL.put_nowait(connection)
+        await asyncio.sleep(backoff*2**attempt)
+
+#pool of max_concurrency persistent connections to the host of base_url
+def open_connection_pool(base_url, max_concurrency=8, timeout=30):
+    parts = urlsplit(base_url)
+    connection_class = http.client.HTTPSConnection if parts.scheme=='https' else http.client.HTTPConnection
+    POOL = asyncio.Queue()
+    for k in range(max_concurrency):
+        POOL.put_nowait(connection_class(parts.hostname, parts.port, timeout=timeout))
+    return POOL
+
+def close_connection_pool(POOL):
+    while not POOL.empty():
+        POOL.get_nowait().close()
+
+#scrape the (address, state, zipcode) of every store in state with a zipcode in zipcodes, in the order their pages are linked
+#from the state page. Returns the stores and the list of listing pages
+async def scrape_supermarkets(zipcodes, base_url=DEFAULT_BASE_URL, state='NY', headers=None, max_concurrency=8, retries=3,
+                              backoff=0.5, timeout=30):
+    headers = dict(headers or {})
+    zipcodes = set(zipcodes)
+    POOL = open_connection_pool(base_url, max_concurrency, timeout)
+    try:
+        state_url = resolve_link(base_url, base_url, '/state/%s/' %state)
+        LINKS = await fetch_page(POOL, state_url, headers, lambda chunks: list(iter_store_links(chunks)), retries, backoff)
+        parse_listing = lambda chunks: list(iter_listing_records(chunks, zipcodes, state))
+        #every page is parsed while it downloads, the pages are put back in link order at the end
+        PAGE_STORES = await asyncio.gather(*[fetch_page(POOL, resolve_link(base_url, state_url, link), headers, parse_listing,
+                                                        retries, backoff) for link in LINKS])
+    finally:
+        close_connection_pool(POOL)
+    return [store for stores in PAGE_STORES for store in stores], LINKS
@@ -0,0 +1,156 @@
+#Author(s)     : Pedro Espino (pespino@berkeley.edu)
+#Licence       : GPLv3
+
+# This script scores arbitrary lists of points (households, clinics, ...) with the same quantities the census tract sampler
+# computes at each of its grid points: the number of supermarkets within walking and driving distance and of bodegas within
+# walking distance, and the food access and swamp indices they give with the vehicle fraction of the point's census tract
+# (and the desert index, with the tract's population). Points are handled in chunks, with one KD-tree query per chunk and
+# radius, so memory stays bounded however many points are given. Points come as arrays (score_points) or as a CSV file with
+# longitude and latitude columns, and optionally a BoroCT2010 column (score_csv). Points without a tract column are placed
+# in the tract they fall in, as are rows whose code is missing or not loaded. For example
+#     python batch_scoring.py households.csv households_scored.csv --lon-column lon --lat-column lat --tract-column boroct2010
+
+import argparse
+import os
+import numpy as np
+import pandas
+import shapely
+
+from food_desert_swamp_indices import NYC_BOROUGHS, add_input_arguments, load_inputs, distances_in_degrees
+from instrumentation import new_report, timed_stage
+from store_counting import build_store_tree, count_stores_within
+from tract_indices import access_indices
+
+#columns added to each point by score_points, in the order they are written
+SCORE_COLUMNS=['boroct2010', 'supermarkets_walking', 'supermarkets_driving', 'bodegas_walking', 'vehicle_fraction',
+               'food_access_ind', 'food_desert_index', 'food_swamp_index']
+
+#the census tract data points are scored with: the BoroCT2010 codes, vehicle fractions and populations of the tracts, and a
+#tree of their geometries to place points in them
+def make_tract_data(INPUTS):
+    GEO_TABLE = INPUTS['GEO_TABLE']
+    return {'boroct2010': np.asarray(GEO_TABLE['BoroCT2010'], dtype=np.int64),
+            'vehicle_fraction': np.asarray(INPUTS['GEO_VEHICLE_FRACTION'], dtype=float),
+            'population': np.asarray(INPUTS['GEO_POPULATION'], dtype=float),
+            'tree': shapely.STRtree(GEO_TABLE['geometry'])}
+
+#index (into TRACT_DATA) of the tract each point falls in, -1 for points outside every tract. A point on the border of two
+#tracts takes one of them
+def locate_tracts(TRACT_DATA, lons, lats):
+    tract_ids = np.full(len(lons), -1, dtype=np.int64)
+    point_ids, tree_ids = TRACT_DATA['tree'].query(shapely.points(lons, lats), predicate='within')
+    tract_ids[point_ids] = tree_ids
+    return tract_ids
+
+#index (into TRACT_DATA) of each BoroCT2010 code, -1 for the codes which are not loaded
+def match_tracts(TRACT_DATA, codes):
+    codes = np.asarray(codes, dtype=np.int64)
+    if(len(TRACT_DATA['boroct2010'])==0):
+        return np.full(len(codes), -1, dtype=np.int64)
+    order = np.argsort(TRACT_DATA['boroct2010'])
+    sorted_codes = TRACT_DATA['boroct2010'][order]
+    positions = np.minimum(np.searchsorted(sorted_codes, codes), len(sorted_codes)-1)
+    return np.where(sorted_codes[positions]==codes, order[positions], -1)
+
+#score a batch of points (finite longitudes and latitudes, in degrees) against the store KD-trees, chunk_size points at a
+#time. With TRACT_DATA, the vehicle fraction and population of each point are those of its tract (given by tract_ids, or
+#found from the tract geometries), otherwise of the scalars or arrays fraction_of_vehicles and population. Points outside
+#every tract count no vehicles and have no population, so no desert index. Returns a dict of arrays, one entry per point
+def score_points(lons, lats, supermarket_tree, bodega_tree, walking_distance, driving_distance, TRACT_DATA=None, tract_ids=None,
+                 fraction_of_vehicles=0.0, population=np.nan, chunk_size=200000, workers=1):
+    lons = np.asarray(lons, dtype=float).ravel()
+    lats = np.asarray(lats, dtype=float).ravel()
+    if(len(lons)!=len(lats) or not (np.isfinite(lons).all() and np.isfinite(lats).all())):
+        raise ValueError("points need a finite longitude and latitude each")
+    if(TRACT_DATA is not None):
+        if(tract_ids is None):
+            tract_ids = np.concatenate([locate_tracts(TRACT_DATA, lons[k:k+chunk_size], lats[k:k+chunk_size])
+                                        for k in range(0, len(lons), chunk_size)] or [np.zeros(0, dtype=np.int64)])
+        tract_ids = np.asarray(tract_ids, dtype=np.int64)
+        in_tract = tract_ids>=0
+        fraction_of_vehicles = np.where(in_tract, TRACT_DATA['vehicle_fraction'][tract_ids], 0.0)
+        population = np.where(in_tract, TRACT_DATA['population'][tract_ids], np.nan)
+        boroct2010 = np.where(in_tract, TRACT_DATA['boroct2010'][tract_ids], -1)
+    else:
+        boroct2010 = np.full(len(lons), -1, dtype=np.int64)
+    fraction_of_vehicles = np.broadcast_to(np.asarray(fraction_of_vehicles, dtype=float), lons.shape)
+    population = np.broadcast_to(np.asarray(population, dtype=float), lons.shape)
+
+    SCORES = {'boroct2010': boroct2010, 'vehicle_fraction': np.array(fraction_of_vehicles)}
+    for key in ('supermarkets_walking', 'supermarkets_driving', 'bodegas_walking'):
+        SCORES[key] = np.zeros(len(lons), dtype=int)
+    for k in range(0, len(lons), chunk_size):
+        xps = lons[k:k+chunk_size]
+        yps = lats[k:k+chunk_size]
+        SCORES['supermarkets_walking'][k:k+chunk_size] = count_stores_within(supermarket_tree, xps, yps, walking_distance, workers=workers)
+        SCORES['supermarkets_driving'][k:k+chunk_size] = count_stores_within(supermarket_tree, xps, yps, driving_distance, workers=workers)
+        SCORES['bodegas_walking'][k:k+chunk_size] = count_stores_within(bodega_tree, xps, yps, walking_distance, workers=workers)
+    SCORES['food_access_ind'], number_of_bodegas, SCORES['food_desert_index'], SCORES['food_swamp_index'] = access_indices(
+        SCORES['supermarkets_walking'], SCORES['supermarkets_driving'], SCORES['bodegas_walking'], fraction_of_vehicles, population)
+    return SCORES
+
+#score the points of a CSV file, chunk_rows rows at a time, writing every input column plus SCORE_COLUMNS to out_path. Rows
+#without a finite longitude and latitude are written with empty scores. Returns the number of rows written
+def score_csv(in_path, out_path, supermarket_tree, bodega_tree, walking_distance, driving_distance, TRACT_DATA=None,
+              lon_column='lon', lat_column='lat', tract_column=None, chunk_rows=500000, workers=1):
+    tmp_path = out_path + '.tmp'
+    number_of_rows = 0
+    with open(tmp_path, 'w', newline='') as f:
+        for CHUNK in pandas.read_csv(in_path, chunksize=chunk_rows):
+            for column in (lon_column, lat_column) + ((tract_column,) if tract_column else ()):
+                if(column not in CHUNK.columns):
+                    raise ValueError("%s has no column '%s'" %(in_path, column))
+            lons = pandas.to_numeric(CHUNK[lon_column], errors='coerce').to_numpy(dtype=float)
+            lats = pandas.to_numeric(CHUNK[lat_column], errors='coerce').to_numpy(dtype=float)
+            valid = np.isfinite(lons) & np.isfinite(lats)
+            tract_ids = None
+            if(TRACT_DATA is not None and tract_column):
+                codes = pandas.to_numeric(CHUNK[tract_column], errors='coerce').fillna(-1).to_numpy(dtype=np.int64)
+                tract_ids = match_tracts(TRACT_DATA, codes[valid])
+                #rows with a missing code, or one that is not loaded, are placed in the tract they fall in instead
+                missing = tract_ids<0
+                if(missing.any()):
+                    tract_ids[missing] = locate_tracts(TRACT_DATA, lons[valid][missing], lats[valid][missing])
+            SCORES = score_points(lons[valid], lats[valid], supermarket_tree, bodega_tree, walking_distance, driving_distance,
+                                  TRACT_DATA=TRACT_DATA, tract_ids=tract_ids, workers=workers)
+            for key in SCORE_COLUMNS:
+                #integer columns keep empty entries for the rows which could not be scored
+                dtype = 'Int64' if SCORES[key].dtype.kind in 'iu' else float
+                column = pandas.Series(pandas.NA if dtype=='Int64' else np.nan, index=CHUNK.index, dtype=dtype)
+                column[valid] = SCORES[key]
+                if(key=='boroct2010'):
+                    column = column.mask(column<0)
+                CHUNK[key] = column
+            CHUNK.to_csv(f, header=(number_of_rows==0), index=False)
+            number_of_rows += len(CHUNK)
+    os.replace(tmp_path, out_path)
+    return number_of_rows
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description="Count the supermarkets and bodegas within reach of every point of a CSV file")
+    parser.add_argument('points', help="CSV file of the points to score")
+    parser.add_argument('output', help="CSV file the scored points are written to")
+    parser.add_argument('--lon-column', default='lon', help="column of the point longitudes")
+    parser.add_argument('--lat-column', default='lat', help="column of the point latitudes")
+    parser.add_argument('--tract-column', default=None,
+                        help="column of the BoroCT2010 code of each point's tract (points without one, or with a code that is not loaded, are placed in the tract they fall in)")
+    parser.add_argument('--chunk-rows', type=int, default=500000, help="number of rows read and scored at a time")
+    parser.add_argument('--workers', type=int, default=1, help="number of threads for the store counts (-1 uses every CPU)")
+    add_input_arguments(parser, boroughs=NYC_BOROUGHS)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_arguments(argv)
+    RUN_REPORT = new_report('batch_scoring')
+    INPUTS = load_inputs(args, RUN_REPORT)
+    resolution, walking_distance, driving_distance = distances_in_degrees(args)
+    print("Scoring the points of %s" %args.points)
+    with timed_stage(RUN_REPORT, "score_points") as stage:
+        stage['items'] = score_csv(args.points, args.output, build_store_tree(INPUTS['SUPERMARKET_COORDS']),
+                                   build_store_tree(INPUTS['BODEGA_COORDS']), walking_distance, driving_distance,
+                                   TRACT_DATA=make_tract_data(INPUTS), lon_column=args.lon_column, lat_column=args.lat_column,
+                                   tract_column=args.tract_column, chunk_rows=args.chunk_rows, workers=args.workers)
+    print("%d points scored in %.2f s, written to %s" %(stage['items'], stage['wall_s'], args.output))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+#Author(s)     : Pedro Espino (pespino@berkeley.edu)
+#Licence       : GPLv3
+
+# This module reads the consumer data from SimplyAnalytics (percent of households with one vehicle, population and per capita
+# income by census tract) and joins it to the census tract geometries. The "Name" column of each dataset is parsed into the
+# BoroCT2010 codes used by NYC Open Data, and the datasets are joined into one table indexed by BoroCT2010, so that looking up
+# a tract is a hashed O(1) lookup instead of a scan over every row. Tracts missing from a dataset are marked in explicit masks.
+
+import numpy as np
+import pandas
+
+#make a dict for parsing borough names to codes used in census tract codes (CT codes)
+BORO_NAMES_AND_CODES = {
+    "New York": 1,
+    "Bronx": 2,
+    "Kings": 3,
+    "Queens": 4,
+    "Richmond": 5
+}
+
+#columns of the SimplyAnalytics datasets, and the names they get in the consumer table
+CARACCESS_COLUMN='% Vehicles Available | 1 vehicle available, 2023 [Estimated]'
+POPULATION_COLUMN='# Total Population, 2023 [Estimated]'
+PERCAP_INC_COLUMN='Per Capita Income, 2023 [Estimated]'
+
+#parse SimplyAnalytics names ("<tract>, <borough> County, NY") into BoroCT2010 codes, -1 where the name can not be parsed
+def parse_boroct2010(names):
+    name_fields = pandas.Series(names, dtype=object).astype(str).str.split(',')
+    ca_ct = name_fields.str[0].str[2:]
+    ca_boroname = name_fields.str[1].str[1:-7]
+    ca_borocode = ca_boroname.map(BORO_NAMES_AND_CODES)
+    #the borough code goes in front of the census tract code, as in the NYC open data
+    full_census_tract = pandas.to_numeric(ca_borocode.astype('Int64').astype(str) + ca_ct, errors='coerce')
+    return full_census_tract.fillna(-1).to_numpy(np.int64)
+
+#read one SimplyAnalytics dataset into a Series of its value column indexed by BoroCT2010
+def _read_by_tract(csv_path, value_column):
+    dataframe = pandas.read_csv(csv_path, usecols=['Name', value_column])
+    values = pandas.Series(pandas.to_numeric(dataframe[value_column], errors='coerce').to_numpy(float),
+                           index=parse_boroct2010(dataframe['Name']))
+    values = values[values.index>=0]
+    return values[~values.index.duplicated(keep='first')]
+
+#read the car access, population and per capita income datasets into one table indexed by BoroCT2010, with the columns
+#vehicles_pct, population and percap_income (NaN where a dataset has no value for a tract)
+def load_consumer_table(car_access_csv, population_csv, percap_inc_csv):
+    return pandas.DataFrame({
+        'vehicles_pct': _read_by_tract(car_access_csv, CARACCESS_COLUMN),
+        'population': _read_by_tract(population_csv, POPULATION_COLUMN),
+        'percap_income': _read_by_tract(percap_inc_csv, PERCAP_INC_COLUMN),
+    })
+
+#look up the consumer data of each census tract in boroct2010, returns a dict of arrays aligned with boroct2010: the columns
+#of the consumer table along with has_<column> masks which are False where a tract has no value
+def join_consumer_data(boroct2010, consumer_table):
+    joined = consumer_table.reindex(np.asarray(boroct2010, dtype=np.int64))
+    CONSUMER_DATA={}
+    for column in consumer_table.columns:
+        CONSUMER_DATA[column] = joined[column].to_numpy(float)
+        CONSUMER_DATA['has_%s' %column] = ~np.isnan(CONSUMER_DATA[column])
+    return CONSUMER_DATA
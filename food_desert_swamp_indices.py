@@ -3,208 +3,46 @@
 
 # This script calculates the Food Desert and Food Swamp Indices throughout NYC (see https://sites.google.com/view/pilambdaepsilon/data)
 # It takes in data from the NYC Open Data portal and SimplyAnalytics to calculate the average number of accessible supermarkets and bodegas
-# throughout the city, and saves the results into a file. It also produces a map of the indices. Specify which boroughs you want to consider below.
-
-import matplotlib.pyplot as plt
-from matplotlib import rc
-from matplotlib import rcParams
-from matplotlib.patches import Circle
-import matplotlib
-import matplotlib.colorbar as cbar
-import pylab
+# throughout the city, and saves the results into a file. It also produces a map of the indices. The boroughs, distances, input and
+# output files are set from the command line (see python food_desert_swamp_indices.py --help), for example
+#     python food_desert_swamp_indices.py --boroughs Bronx Brooklyn --workers 8 --no-map
+# With --no-map the plotting libraries are never imported, so batch runs only pay for the computation. With --sweep the indices
+# are computed for every combination of several walking distances, driving distances and vehicle fraction scales in one pass
+# (see radius_sweep.py), and saved as a cube instead of the usual outputs.
+
+import argparse
 import os
-import math
 from os.path import exists
-from matplotlib.pyplot import figure
-import numpy.ma as ma
-import pandas
-import numpy as np
-import cmasher as cmr
-
-from matplotlib.collections import PatchCollection
-from matplotlib.patches import Polygon
-from matplotlib.ticker import LogFormatter 
-from shapely import geometry
-from shapely.geometry import Point, MultiPoint
-from shapely.geometry import MultiPolygon, Polygon
-import shapely.wkt
 from datetime import datetime
+import numpy as np
+import shapely
+
+from consumer_data import load_consumer_table, join_consumer_data
+from food_stores import load_nyc_zipcodes, load_nyc_food_stores, load_web_supermarkets, store_coords
+from geometry_cache import load_tract_geometries, file_hash
+from supermarket_dedup import combine_supermarkets
+from incremental_update import load_tract_state, state_matches, affected_tracts, patch_results_file, save_tract_state
+from tract_indices import RESULTS_HEADER, format_result_row, iterate_tract_indices
+from accessibility_raster import iterate_raster_tract_indices, save_rasters
+from instrumentation import new_report, timed_stage, write_report
+from index_output import binary_output_path, make_index_records, write_index_records, patch_index_records
+from street_network import load_street_graph, network_count_tables
+from radius_sweep import sweep_indices, save_sweep
+
+#default locations of the datasets
+DATA_DIR='/home/pedro/Singularity/Desktop/DS/FoodDeserts'
+GEOSPATIAL_CSV=os.path.join(DATA_DIR, 'nyct2010.csv')
+CARACCESS_CSV=os.path.join(DATA_DIR, 'Percent_Households_One_Vehicle_Available.csv')
+POPULATION_CSV=os.path.join(DATA_DIR, 'Population_by_CT.csv')
+PERCAP_INC_CSV=os.path.join(DATA_DIR, 'Per_Capita_Income_CT.csv')
+ZIPCODE_CSV=os.path.join(DATA_DIR, 'Modified_Zip_Code_Tabulation_Areas__MODZCTA__20240229.csv')
+FOODSTORE_CSV=os.path.join(DATA_DIR, 'Retail_Food_Stores_20240226.csv')
+#list of supermarket coordinates and addresses (output from script pull_supermarkets_from_web.py)
+WEB_SUPERMARKETS_FILE='SUPERMARKET_ADDRESSES_AND_COORDINATES_WEB'
+
+#every NYC borough, for tools which consider the whole city
+NYC_BOROUGHS=["Bronx", "Brooklyn", "Manhattan", "Queens", "Staten Island"]
 
-universal_fontsize=20
-universal_linewidth=2
-
-rcParams.update({'figure.autolayout': True})
-matplotlib.rc('text', usetex = True)
-matplotlib.rc('font', **{'family': 'serif', 'serif':['Computer Modern'], 'size':11})
-matplotlib.rcParams['text.latex.preamble']=r"\usepackage{amsmath,amssymb}"
-matplotlib.rcParams['xtick.minor.size'] = 1
-matplotlib.rcParams['xtick.minor.width'] = 1
-matplotlib.rcParams['xtick.labelsize'] = universal_fontsize
-matplotlib.rcParams['ytick.labelsize'] = universal_fontsize
-matplotlib.rc('legend', fontsize=universal_fontsize)
-
-#specify which boroughs to consider (the more boroughs the longer the analysis takes)
-BOROUGHS_TO_CONSIDER=["Bronx"]#, "Brooklyn", "Queens", "Manhattan", "Staten Island"]
-#rewrite results from previous runs? (TODO: make this a command line argument)
-#rewrite_results=False
-rewrite_results=True
-
-if(rewrite_results):
-    print("REWRITING RESULTS OF ANALYSIS")
-    desert_swamp_results=open("DESERT_SWAMP_INDICES","w")
-    desert_swamp_results.write("#[1]Boro [2]CTCode [3]Desert [4]Swamp [5]No.Bodegas [6]No.People\n")
-
-#import the datasets for consumer data on percent of households with one vehicle, population by census tract, and per capita income
-car_access_dataframe=pandas.read_csv('/home/pedro/Singularity/Desktop/DS/FoodDeserts/Percent_Households_One_Vehicle_Available.csv')
-population_dataframe=pandas.read_csv('/home/pedro/Singularity/Desktop/DS/FoodDeserts/Population_by_CT.csv')
-percap_inc_dataframe=pandas.read_csv('/home/pedro/Singularity/Desktop/DS/FoodDeserts/Per_Capita_Income_CT.csv')
-
-#import the geospatial dataset
-print("Reading geospatial data")
-geo_dataframe = pandas.read_csv('/home/pedro/Singularity/Desktop/DS/FoodDeserts/nyct2010.csv')
-#put the geo data into arrays
-GEO_BORONAME=np.asarray(geo_dataframe['BoroName'])
-GEO_AREAS=np.asarray(geo_dataframe['the_geom'])
-GEO_NTANAME=np.asarray(geo_dataframe['NTAName'])
-GEO_PUMA=np.asarray(geo_dataframe['PUMA'])
-GEO_NTACODE=np.asarray(geo_dataframe['NTACode'])
-GEO_CTLAB=np.asarray(geo_dataframe['CTLabel'])
-GEO_CT2010=np.asarray(geo_dataframe['CT2010'])
-GEO_BOROCT2010=np.asarray(geo_dataframe['BoroCT2010'])
-
-#make numpy arrays from the relevant keys for the auxiliary consumer data
-print("Importing relevant consumer data")
-CARACCESS_NAME=np.asarray(car_access_dataframe['Name'])
-CARACCESS_VEHICLES=np.asarray(car_access_dataframe['% Vehicles Available | 1 vehicle available, 2023 [Estimated]'])
-POPULATION_BY_CT=np.asarray(population_dataframe['# Total Population, 2023 [Estimated]'])
-PERCAP_INC_BY_CT=np.asarray(percap_inc_dataframe['Per Capita Income, 2023 [Estimated]'])
-CARACCESS_CT=[]
-#make a dict for parsing borough names to codes used in census tract codes (CT codes)
-BORO_NAMES_AND_CODES = {
-    "New York": 1,
-    "Bronx": 2,
-    "Kings": 3,
-    "Queens": 4,
-    "Richmond": 5
-}
-#take the boro names and codes from this data and match it to the format of the NYC open data
-for i in range(0, len(CARACCESS_NAME)):
-    ca_ct=CARACCESS_NAME[i].split(',')[0][2:]
-    #full_census_tract=ca_ct
-    ca_boroname = CARACCESS_NAME[i].split(',')[1][1:-7]
-    ca_borocode = BORO_NAMES_AND_CODES[ca_boroname]
-    full_census_tract = int("%d%s"%(ca_borocode, ca_ct))
-    neighborhood_indices = np.where(GEO_BOROCT2010 == full_census_tract)[0]
-    
-    CARACCESS_CT.append(full_census_tract)
-    
-#arrays are better
-CARACCESS_CT=np.array(CARACCESS_CT)
-
-#get the NYC zipcodes to find all NYC supermarkets
-zipcode_dataframe = pandas.read_csv('/home/pedro/Singularity/Desktop/DS/FoodDeserts/Modified_Zip_Code_Tabulation_Areas__MODZCTA__20240229.csv')
-ZCTA = np.asarray(zipcode_dataframe['ZCTA'])
-NYC_ZIPCODES=[]
-for i in range(0, len(ZCTA)-1):
-    for j in range(0, len(ZCTA[i].split(','))):
-        zipcode=ZCTA[i].split(',')[j].strip()
-        NYC_ZIPCODES.append(zipcode)
-
-#Import the food store database from NYC Open Data
-#foodstore_dataframe = pandas.read_csv('path to retail store db')
-print("Parsing NYC Open Data for NYC area supermarkets")
-foodstore_dataframe = pandas.read_csv('/home/pedro/Singularity/Desktop/DS/FoodDeserts/Retail_Food_Stores_20240226.csv')
-FOODSTORE_BORO=np.asarray(foodstore_dataframe['County'])
-FOODSTORE_TYPE=np.asarray(foodstore_dataframe['Establishment Type'])
-FOODSTORE_OPTYPE=np.asarray(foodstore_dataframe['Operation Type'])
-FOODSTORE_LICENSE=np.asarray(foodstore_dataframe['License Number'])
-FOODSTORE_DBANAME=np.asarray(foodstore_dataframe['DBA Name'])
-FOODSTORE_NAME=np.asarray(foodstore_dataframe['Entity Name'])
-FOODSTORE_ADDNUMS = np.asarray(foodstore_dataframe['Street Number'])
-FOODSTORE_ADDNAMES=np.asarray(foodstore_dataframe['Street Name'])
-FOODSTORE_ZIPCODES=np.asarray(foodstore_dataframe['Zip Code'])
-FOODSTORE_COORDS=np.asarray(foodstore_dataframe['Georeference'])
-FOODSTORE_AREASQFT=np.asarray(foodstore_dataframe['Square Footage'])
-NYC_FOODSTORE_ADDRESSFULL=[]
-NYC_FOODSTORE_BORO=[]
-NYC_FOODSTORE_ZIPCODE=[]
-NYC_FOODSTORE_COORDS=[]
-NYC_FOODSTORE_AREASQFT=[]
-NYC_FOODSTORE_NAME=[]
-NYC_FOODSTORE_DBANAME=[]
-NYC_FOODSTORE_TYPE=[]
-NYC_FOODSTORE_OPTYPE=[]
-NYC_FOODSTORE_LICENSE=[]
-
-#find all NYC foodstores
-for i in range(0, len(FOODSTORE_BORO)):
-    if(str(FOODSTORE_ZIPCODES[i]) in NYC_ZIPCODES):
-        NYC_FOODSTORE_ADDRESSFULL.append("%s %s" %(FOODSTORE_ADDNUMS[i], FOODSTORE_ADDNAMES[i]))
-        NYC_FOODSTORE_BORO.append(FOODSTORE_BORO[i])
-        NYC_FOODSTORE_ZIPCODE.append(FOODSTORE_ZIPCODES[i])
-        NYC_FOODSTORE_COORDS.append([float(FOODSTORE_COORDS[i].split(' ')[1][1:]),float(FOODSTORE_COORDS[i].split(' ')[2][:-1])])
-        NYC_FOODSTORE_AREASQFT.append(FOODSTORE_AREASQFT[i])
-        NYC_FOODSTORE_NAME.append(FOODSTORE_NAME[i])
-        NYC_FOODSTORE_DBANAME.append(FOODSTORE_DBANAME[i])
-        NYC_FOODSTORE_TYPE.append(FOODSTORE_TYPE[i])
-        NYC_FOODSTORE_OPTYPE.append(FOODSTORE_OPTYPE[i])
-        NYC_FOODSTORE_LICENSE.append(FOODSTORE_LICENSE[i])
-
-        
-#FIRST ROW CONSIDERS SIZE DISTRIBUTION OF BODEGAS AND SUPERMARKETS
-#SECOND ROW CONSIDERS SIZE DISTRIBUTION OF MARKETS AND ALL FOOD STORES
-print("Parsing NYC food stores to find supermarkets and bodegas")
-BODEGASIZEDIST=[]
-BODEGATYPEDIST=[]
-BODEGAOPTYPEDIST=[]
-BODEGA_COORDS_NYCOD=[]
-SUPERMARKETSIZEDIST=[]
-SUPERMARKETTYPEDIST=[]
-SUPERMARKETOPTYPEDIST=[]
-SUPERMARKET_COORDS_NYCOD=[]
-
-#acceptable store types - mainly excludes wholesale that doesn't specialize in food
-acceptable_types=['JACD', 'JACK', 'JABC', 'JABCK', 'JABCD', 'JAC','JAD', 'JACH', 'JABCH', 'JABHK', 'JACDK']
-
-
-for i in range(0, len(NYC_FOODSTORE_ADDRESSFULL)):
-    dbaname=NYC_FOODSTORE_DBANAME[i]
-    storename=NYC_FOODSTORE_NAME[i]
-    storetype=NYC_FOODSTORE_TYPE[i]
-    store_name_reference='\t'.join([storename, dbaname])
-    #get the bodegas into their separate arrays
-    if("DELI" in store_name_reference or "GROCER" in store_name_reference or "BODEG" in store_name_reference):
-        BODEGASIZEDIST.append(NYC_FOODSTORE_AREASQFT[i])
-        BODEGATYPEDIST.append(NYC_FOODSTORE_TYPE[i])
-        BODEGAOPTYPEDIST.append(NYC_FOODSTORE_OPTYPE[i])
-        BODEGA_COORDS_NYCOD.append(NYC_FOODSTORE_COORDS[i])
-    elif(("SUPERMARKET" in store_name_reference or "COOP" in store_name_reference) and storetype in acceptable_types):
-        SUPERMARKETSIZEDIST.append(NYC_FOODSTORE_AREASQFT[i])
-        SUPERMARKETTYPEDIST.append(NYC_FOODSTORE_TYPE[i])
-        SUPERMARKETOPTYPEDIST.append(NYC_FOODSTORE_OPTYPE[i])
-        SUPERMARKET_COORDS_NYCOD.append(NYC_FOODSTORE_COORDS[i])
-
-print("Importing web-scraped supermarket locations")        
-#Import the list of supermarket coordinates and addresses (output from script pull_supermarkets_from_web.py)
-SUPERMARKET_COORDS_web=[]
-SUPERMARKET_ZIPCODES_web=[]
-SUPERMARKET_ADDRESSES_web=[]
-supermarketpage_file='SUPERMARKET_ADDRESSES_AND_COORDINATES_WEB'
-SUPERMARKET_COORDS_long, SUPERMARKET_COORDS_lat = np.genfromtxt(supermarketpage_file,
-             usecols=(3,2), delimiter=',', unpack=True, comments="#")
-f=open(supermarketpage_file,"r")
-lines=f.readlines()[2:]
-for x in lines:
-    addline=x.split(',')[0]
-    zipline=x.split(',')[1]
-    loclong=x.split(',')[3]
-    loclat=x.split(',')[2]
-    SUPERMARKET_ZIPCODES_web.append(zipline.split(' ')[3])
-    SUPERMARKET_ADDRESSES_web.append(addline)
-    SUPERMARKET_COORDS_web.append([float(loclong), float(loclat)])
-f.close()
-
-#find potential duplicate supermarkets between those scraped from the web and the ones in the NYC Open Data dataset
 #define useful conversion factors for analysis
 conv_deg_to_km = 1e4/90.
 conv_km_to_ft = 3280.84
@@ -212,176 +50,410 @@ conv_km_to_mi=0.6213712
 conv_mi_to_km=1./conv_km_to_mi
 conv_km_to_deg=1./conv_deg_to_km
 
-#make an empty array in which to store the combined, non-duplicate supermarket coordinates
-print("Cross-referencing and combining supermarket lists to avoid duplicate locations")
-SUPERMARKET_COORDS_COMBINED=[]
-minindices=[]
-#loop through supermarket locations scraped from web, and calculate the distance from those from the NYCOD dataset
-#if they are within 200 ft. of each other, then they are duplicates
-for i in range(0, len(SUPERMARKET_COORDS_web)):
-    absdiff_x = np.abs(SUPERMARKET_COORDS_web[i][0] - np.asarray(SUPERMARKET_COORDS_NYCOD)[:,0])
-    reldiff_x = absdiff_x/SUPERMARKET_COORDS_web[j][0]
-    
-    absdiff_y = np.abs(SUPERMARKET_COORDS_web[i][1] - np.asarray(SUPERMARKET_COORDS_NYCOD)[:,1])
-    reldiff_y = absdiff_y/SUPERMARKET_COORDS_web[i][1]
-    
-    absdiff_comb = (absdiff_x**2 + absdiff_y**2)*(conv_deg_to_km*conv_km_to_ft)**2
-    reldiff_comb = reldiff_x**2 + reldiff_y**2
-    
-    minindexrel=np.argmin(reldiff_comb)
-    minindexabs=np.argmin(absdiff_comb)
-    if(np.sqrt(absdiff_comb[minindexabs]) <= 200.0):
-        minindices.append(minindexabs)
-    SUPERMARKET_COORDS_COMBINED.append(SUPERMARKET_COORDS_web[i])
-
-#keep the nonduplicates (TODO: find more efficient pythonic way of doing this with list comprehension)
-for i in range(0, len(SUPERMARKET_COORDS_NYCOD)):
-    if(i not in minindices):
-        SUPERMARKET_COORDS_COMBINED.append(SUPERMARKET_COORDS_NYCOD[i])
-        
+#add the arguments for the boroughs, distances and input files to a parser, shared by every tool which loads the datasets
+def add_input_arguments(parser, boroughs=("Bronx",)):
+    #what to compute
+    parser.add_argument('--boroughs', nargs='+', default=list(boroughs), metavar='BOROUGH',
+                        help="boroughs to consider, e.g. Bronx Brooklyn Queens Manhattan 'Staten Island' (the more boroughs the longer the analysis takes)")
+    parser.add_argument('--resolution', type=float, default=0.15, help="separation of the sample points in each tract, in miles")
+    parser.add_argument('--walking-distance', type=float, default=0.5, help="walking distance, in miles")
+    parser.add_argument('--driving-distance', type=float, default=2.0, help="driving distance, in miles")
+    parser.add_argument('--supermarket-match-ft', type=float, default=200.0,
+                        help="NYC Open Data supermarkets within this many feet of a web supermarket are duplicates")
+    #inputs
+    parser.add_argument('--tracts', default=GEOSPATIAL_CSV, help="census tract geometries (nyct2010.csv)")
+    parser.add_argument('--car-access', default=CARACCESS_CSV, help="percent of households with one vehicle by census tract")
+    parser.add_argument('--population', default=POPULATION_CSV, help="population by census tract")
+    parser.add_argument('--percap-income', default=PERCAP_INC_CSV, help="per capita income by census tract")
+    parser.add_argument('--zipcodes', default=ZIPCODE_CSV, help="NYC zipcodes (MODZCTA)")
+    parser.add_argument('--food-stores', nargs='+', default=[FOODSTORE_CSV], help="retail food store database file(s)")
+    parser.add_argument('--web-supermarkets', default=WEB_SUPERMARKETS_FILE, help="supermarkets scraped from the web")
+    return parser
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description="Calculate the Food Desert and Food Swamp Indices of NYC census tracts")
+    add_input_arguments(parser)
+    #outputs
+    parser.add_argument('--output', default='DESERT_SWAMP_INDICES', help="file the indices are written to")
+    parser.add_argument('--no-rewrite', action='store_true', help="do not rewrite the results of previous runs")
+    parser.add_argument('--format', choices=['text', 'binary', 'both'], default='text',
+                        help="write the indices as text (OUTPUT), as a memory-mappable NumPy structured array at full precision (OUTPUT.npy), or both")
+    parser.add_argument('--map', default='figures/food_desert_food_swamp.pdf', help="file the map of the indices is saved to")
+    parser.add_argument('--no-map', action='store_true', help="only compute the indices, without importing the plotting libraries")
+    parser.add_argument('--draft', action='store_true', help="save a quick, low resolution PNG of the map instead of the full PDF")
+    parser.add_argument('--report', default=None, help="JSON report of the time and memory of each stage (OUTPUT.report.json by default)")
+    parser.add_argument('--profile-dir', default=None, help="run every stage under cProfile, saving the stats to this directory")
+    parser.add_argument('--trace-memory', action='store_true', help="trace the peak Python memory of each stage")
+    #how to compute it
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help="number of processes across which the census tracts are spread (1 runs everything serially)")
+    parser.add_argument('--incremental', action='store_true',
+                        help="only recompute the tracts near stores that opened or closed since the last run, and patch their rows into the output")
+    parser.add_argument('--state-file', default='DESERT_SWAMP_STATE.npz', help="state saved for incremental updates")
+    parser.add_argument('--raster-engine', action='store_true',
+                        help="count the accessible stores from city-wide store count rasters instead of sampling each tract on its own")
+    parser.add_argument('--raster-file', default='ACCESSIBILITY_RASTERS.npz', help="file the rasters of the raster engine are saved to")
+    parser.add_argument('--street-graph', default=None,
+                        help="count the stores within walking and driving distance along the streets of this graph (.npz, see street_network.py) instead of in straight lines")
+    parser.add_argument('--adaptive-tolerance', type=float, default=None,
+                        help="sample each tract on a quadtree refined where the store counts change, until the error of its averages is within this relative tolerance (e.g. 0.05; no cell is then smaller than --resolution)")
+    parser.add_argument('--sweep', action='store_true',
+                        help="compute the indices for every combination of --sweep-walking, --sweep-driving and --sweep-vehicle-scale in one pass, saving them to --sweep-output instead of the usual outputs")
+    parser.add_argument('--sweep-walking', type=float, nargs='+', default=[0.25, 0.5, 0.75, 1.0], help="walking distances of the sweep, in miles")
+    parser.add_argument('--sweep-driving', type=float, nargs='+', default=[1.0, 2.0, 3.0, 4.0, 5.0], help="driving distances of the sweep, in miles")
+    parser.add_argument('--sweep-vehicle-scale', type=float, nargs='+', default=[1.0],
+                        help="factors the vehicle fraction of every tract is scaled by in the sweep (capped at a fraction of one)")
+    parser.add_argument('--sweep-output', default='DESERT_SWAMP_SWEEP.npz', help="file the indices of the sweep are saved to")
+    args = parser.parse_args(argv)
+    if(args.sweep and (args.raster_engine or args.street_graph or args.adaptive_tolerance is not None or args.incremental)):
+        parser.error("--sweep cannot be used with --raster-engine, --street-graph, --adaptive-tolerance or --incremental")
+    if(args.raster_engine and (args.street_graph or args.adaptive_tolerance is not None)):
+        parser.error("--raster-engine cannot be used with --street-graph or --adaptive-tolerance")
+    if(args.report is None):
+        args.report = args.output + '.report.json'
+    return args
+
+#read the tracts, consumer data and stores, returns a dict with the tract table (GEO_TABLE), the vehicle fraction and
+#population of each tract and the combined supermarket and bodega coordinates
+def load_inputs(args, RUN_REPORT):
+    #import the geospatial dataset (through the binary geometry cache, keeping only the boroughs we consider)
+    print("Reading geospatial data")
+    with timed_stage(RUN_REPORT, "read_geospatial_data") as stage:
+        GEO_TABLE = load_tract_geometries(args.tracts, boroughs=args.boroughs)
+        stage['items'] = len(GEO_TABLE['geometry'])
+
+    #import the consumer data on percent of households with one vehicle, population by census tract, and per capita income,
+    #and join it to the census tracts by their BoroCT2010 codes
+    print("Importing relevant consumer data")
+    with timed_stage(RUN_REPORT, "read_consumer_data") as stage:
+        CONSUMER_TABLE = load_consumer_table(args.car_access, args.population, args.percap_income)
+        CONSUMER_DATA = join_consumer_data(GEO_TABLE['BoroCT2010'], CONSUMER_TABLE)
+        #tracts without car access data have no households with a vehicle, and tracts without population data get one person,
+        #which drives the relevant index to the bounds
+        GEO_VEHICLE_FRACTION = np.where(CONSUMER_DATA['has_vehicles_pct'], CONSUMER_DATA['vehicles_pct']/100.0, 0.0)
+        GEO_POPULATION = np.where(CONSUMER_DATA['has_population'], CONSUMER_DATA['population'], 1.0)
+        stage['items'] = len(CONSUMER_TABLE)
+
+    #read and classify the NYC food stores
+    with timed_stage(RUN_REPORT, "read_food_stores") as stage:
+        #get the NYC zipcodes to find all NYC supermarkets
+        NYC_ZIPCODES = load_nyc_zipcodes(args.zipcodes)
+
+        #Import the food store database from NYC Open Data, keeping the NYC food stores
+        print("Parsing NYC Open Data for NYC area supermarkets")
+        NYC_FOODSTORES = load_nyc_food_stores(args.food_stores, NYC_ZIPCODES)
+
+        #get the coordinates of the bodegas and supermarkets (stores that look like bodegas are not counted as supermarkets)
+        print("Parsing NYC food stores to find supermarkets and bodegas")
+        BODEGA_COORDS_NYCOD = store_coords(NYC_FOODSTORES, NYC_FOODSTORES['is_bodega'])
+        SUPERMARKET_COORDS_NYCOD = store_coords(NYC_FOODSTORES, NYC_FOODSTORES['is_supermarket'] & ~NYC_FOODSTORES['is_bodega'])
+        stage['items'] = len(NYC_FOODSTORES)
+
+    print("Importing web-scraped supermarket locations")
+    with timed_stage(RUN_REPORT, "read_web_supermarkets") as stage:
+        WEB_SUPERMARKETS = load_web_supermarkets(args.web_supermarkets)
+        SUPERMARKET_COORDS_web = store_coords(WEB_SUPERMARKETS)
+        stage['items'] = len(WEB_SUPERMARKETS)
+
+    #combine the supermarket lists, NYC Open Data supermarkets within 200 ft. of a web supermarket are duplicates
+    print("Cross-referencing and combining supermarket lists to avoid duplicate locations")
+    with timed_stage(RUN_REPORT, "combine_supermarkets") as stage:
+        SUPERMARKET_COORDS_COMBINED, SUPERMARKET_MATCHES = combine_supermarkets(SUPERMARKET_COORDS_web, SUPERMARKET_COORDS_NYCOD,
+                                                                                radius_ft=args.supermarket_match_ft)
+        stage['items'] = len(SUPERMARKET_COORDS_COMBINED)
+    print("%d duplicate supermarkets found" %len(np.unique(SUPERMARKET_MATCHES['nycod_index'])))
+    return {'GEO_TABLE': GEO_TABLE, 'GEO_VEHICLE_FRACTION': GEO_VEHICLE_FRACTION, 'GEO_POPULATION': GEO_POPULATION,
+            'SUPERMARKET_COORDS': SUPERMARKET_COORDS_COMBINED, 'BODEGA_COORDS': BODEGA_COORDS_NYCOD}
+
+#set up a discrete grid, each point separated by args.resolution miles (0.15 by default), also specify what we consider
+#walking distance and driving distance. Returns the three in degrees
+def distances_in_degrees(args):
+    resolution=args.resolution/(conv_km_to_mi*conv_deg_to_km)
+    walking_distance=args.walking_distance/(conv_km_to_mi*conv_deg_to_km)
+    driving_distance=args.driving_distance/(conv_km_to_mi*conv_deg_to_km)
+    return resolution, walking_distance, driving_distance
+
+#how the stores are counted, if not on the default sampling grid in straight lines (saved with the state of a run, so that
+#incremental updates only patch results computed the same way)
+def counting_method(args):
+    METHOD=[]
+    if(args.raster_engine):
+        METHOD.append('raster')
+    if(args.street_graph):
+        METHOD.append('network:%s' %file_hash(args.street_graph))
+    if(args.adaptive_tolerance is not None):
+        METHOD.append('adaptive:%g' %args.adaptive_tolerance)
+    return ' '.join(METHOD)
+
+#collect the census tracts in the boroughs we consider, along with their vehicle fraction and population, as task tuples
+#(tract index, geometry, NTA code, vehicle fraction, population)
+def make_tract_tasks(INPUTS, boroughs):
+    GEO_TABLE = INPUTS['GEO_TABLE']
+    TRACT_TASKS=[]
+    for i in range(0, len(GEO_TABLE['geometry'])):
+        if(GEO_TABLE['BoroName'][i] in boroughs):
+            TRACT_TASKS.append((i, GEO_TABLE['geometry'][i], GEO_TABLE['NTACode'][i], INPUTS['GEO_VEHICLE_FRACTION'][i], INPUTS['GEO_POPULATION'][i]))
+    return TRACT_TASKS
+
 #=======================================================================
-#  __  __       _                              _           _     
-# |  \/  |     (_)           /\               | |         (_)    
-# | \  / | __ _ _ _ __      /  \   _ __   __ _| |_   _ ___ _ ___ 
+#  __  __       _                              _           _
+# |  \/  |     (_)           /\               | |         (_)
+# | \  / | __ _ _ _ __      /  \   _ __   __ _| |_   _ ___ _ ___
 # | |\/| |/ _` | | '_ \    / /\ \ | '_ \ / _` | | | | / __| / __|
 # | |  | | (_| | | | | |  / ____ \| | | | (_| | | |_| \__ \ \__ \
 # |_|  |_|\__,_|_|_| |_| /_/    \_\_| |_|\__,_|_|\__, |___/_|___/
-#                                                 __/ |          
-#                                                |___/           
+#                                                 __/ |
+#                                                |___/
 #=======================================================================
-#calculate the food insecurity index and map it
-fig, ax= plt.subplots(nrows=1, ncols=2,figsize=(16,8))
-cmap1 = matplotlib.cm.get_cmap('PiYG_r')
-cmap2 = matplotlib.cm.get_cmap('PRGn_r')
-
-startTime = datetime.now()
-
-#these bounds make for nice plots
-minsupes=[1e1, 1e-1]
-maxsupes=[1e5, 1e1]
-normalize1 = matplotlib.colors.LogNorm(vmin=minsupes[0], vmax=maxsupes[0])
-normalize2 = matplotlib.colors.LogNorm(vmin=minsupes[1], vmax=maxsupes[1])
-
-startTime = datetime.now()
-
-#set up a discrete grid, each point separated by 0.15 miles, also specify what we consider walking distance
-#and driving distance
-resolution=0.15/(conv_km_to_mi*conv_deg_to_km)
-walking_distance=0.5/(conv_km_to_mi*conv_deg_to_km)
-driving_distance=2.0/(conv_km_to_mi*conv_deg_to_km)
-
-#make a list of points corresponding to  supermarket_coords
-supermarket_points = MultiPoint(SUPERMARKET_COORDS_COMBINED)
-bodega_points = MultiPoint(BODEGA_COORDS_NYCOD)
-
-#make empty arrays for some of the quantities we want to keep from the analysis
-FOOD_ACCESSIBILITY=[]
-NUMBER_OF_BODEGAS=[]
-NUMBER_OF_PEOPLE=[]
-FOOD_DESERT_INDEX=[]
-FOOD_SWAMP_INDEX=[]
-
-print("Calculating/Mapping Food Desert and Swamp Indices")
-for i in range(0, len(GEO_AREAS)):
-    #for each geometric area, we want to enumerate the number of supermarkets and bodegas in walking and driving distance
-    valid_points=[]
-    supermarket_enumerator_walking=[]
-    supermarket_enumerator_driving=[]
-    bodega_enumerator_walking=[]
-    MP = shapely.wkt.loads(GEO_AREAS[i])
-    if(GEO_BORONAME[i] in BOROUGHS_TO_CONSIDER):
-        boro_census_tract=GEO_BOROCT2010[i]
-        ca_matching_index = np.where(CARACCESS_CT==boro_census_tract)
-        #get the fraction of households with one vehicle in this CT
-        try:
-            fraction_of_vehicles_in_ct=CARACCESS_VEHICLES[ca_matching_index][0]/100.0
-        except:
-            fraction_of_vehicles_in_ct=0.0
-        try:
-            population_in_ct = POPULATION_BY_CT[ca_matching_index][0]
-        except:
-            population_in_ct = 1.0 #this drives the relevant index to the bounds
-        #for each geometry, calculate the relevant quantity and map it
-        for geom in MP.geoms:
-            xs, ys = geom.exterior.xy
-            #areas ending in '99' are parks or cemeteries
-            if(GEO_NTACODE[i][-2:]!='99'):
-                #get the bounds of the geometry
-                lonmin, latmin, lonmax, latmax = geom.bounds
-                #make a grid of points which we sample in this geometry
-                xgrid, ygrid = np.meshgrid(np.arange(lonmin, lonmax, resolution), np.arange(latmin, latmax, resolution))
-                points = MultiPoint(list(zip(xgrid.flatten(),ygrid.flatten())))
-                #see which points fall inside the geometry
-                valid_points.extend([j for j in points if geom.contains(j)])
-                xps = [point.x for point in valid_points]
-                yps = [point.y for point in valid_points]
-                #for each point in the geometry make buffers corresponding to walking and driving distances
-                for a in range(0, len(valid_points)):
-                    local_xcoord=xps[a]
-                    local_ycoord=yps[a]
-                    localbuffer_walking = Point(local_xcoord,local_ycoord).buffer(walking_distance)
-                    localbuffer_driving = Point(local_xcoord,local_ycoord).buffer(driving_distance)
-                    
-                    locbuffxs_walking,locbuffys_walking = localbuffer_walking.exterior.xy
-                    locbuffxs_driving,locbuffys_driving = localbuffer_driving.exterior.xy
-                    
-                    #for each sample point, count the number of supermarkets within walking and driving distance, and the bodegas within walking distance
-                    supermarket_enumerator_walking.extend([j for j in supermarket_points if localbuffer_walking.contains(j)])
-                    supermarket_enumerator_driving.extend([k for k in supermarket_points if localbuffer_driving.contains(k)])
-                    bodega_enumerator_walking.extend([l for l in bodega_points if localbuffer_walking.contains(l)])
-                #make these quantities useable (TODO: find a more efficient pythonic way of doing this with masks)
-                try:
-                    avg_walking_distance_supermarkets = len(supermarket_enumerator_walking)/len(valid_points)
-                except:
-                    avg_walking_distance_supermarkets = 0.0
-                try:
-                    avg_driving_distance_supermarkets = len(supermarket_enumerator_driving)/len(valid_points)
-                except:
-                    avg_driving_distance_supermarkets = 0.0
-                try:
-                    avg_walking_distance_bodegas = len(bodega_enumerator_walking)/len(valid_points)
-                except:
-                    avg_walking_distance_bodegas = 0.0
-                
-                #calculate the number of accessible markets and other relevant quantities
-                food_access_ind = np.maximum(1.0, avg_walking_distance_supermarkets + avg_driving_distance_supermarkets*fraction_of_vehicles_in_ct)
-                #number_of_bodegas = np.maximum(0.0, avg_walking_distance_bodegas)
-                number_of_bodegas = avg_walking_distance_bodegas
-                FOOD_ACCESSIBILITY.append(food_access_ind)
-                NUMBER_OF_BODEGAS.append(number_of_bodegas)
-                NUMBER_OF_PEOPLE.append(population_in_ct)
-                
-                food_desert_index = population_in_ct/food_access_ind
-                food_swamp_index = number_of_bodegas/food_access_ind
-                FOOD_DESERT_INDEX.append(food_desert_index)
-                FOOD_SWAMP_INDEX.append(food_swamp_index)
-                
-                if(rewrite_results):
-                    #print("%s %s %1.5e %1.5e %1.5e %1.5e" %(GEO_BORONAME[i], boro_census_tract, food_desert_index, food_swamp_index, number_of_bodegas, population_in_ct))
-                    desert_swamp_results.write("%s %s %1.5e %1.5e %1.5e %1.5e \n" %(GEO_BORONAME[i], boro_census_tract, food_desert_index, food_swamp_index, number_of_bodegas, population_in_ct))
-                
-                ax[0].fill(xs, ys, alpha=0.75, color=cmap1(normalize1(food_desert_index)))
-                ax[1].fill(xs, ys, alpha=0.75, color=cmap2(normalize2(food_swamp_index)))
-            else:
-                ax[0].fill(xs, ys, alpha=1.0, color='black')
-                ax[1].fill(xs, ys, alpha=1.0, color='black')
-ax[0].set_title(r"$\text{Food Desert Index } C_{\rm desert} \text{ throughout NYC}$", fontsize=universal_fontsize)
-ax[1].set_title(r"$\text{Food Swamp Index } C_{\rm swamp} \text{ throughout NYC}$", fontsize=universal_fontsize)
-ax[0].set_xlabel("Longitude", fontsize=universal_fontsize)
-ax[1].set_xlabel("Longitude", fontsize=universal_fontsize)
-ax[0].set_ylabel("Latitude", fontsize=universal_fontsize)
-
-cb_ax1 = fig.add_axes([0.062, 1.05, 0.425, 0.02])
-cb1 = cbar.ColorbarBase(cb_ax1, cmap=cmap1,norm=matplotlib.colors.LogNorm(vmin=minsupes[0], vmax=maxsupes[0]), orientation='horizontal')
-
-cb_ax2 = fig.add_axes([0.547, 1.05, 0.425, 0.02])
-cb2 = cbar.ColorbarBase(cb_ax2, cmap=cmap2,norm=matplotlib.colors.LogNorm(vmin=minsupes[1], vmax=maxsupes[1]),orientation='horizontal')
-#for aind in range(0, 2):
-#    ax[aind].set_xlim([-74.3, -73.7])
-#    ax[aind].set_ylim([40.5, 40.95])
-if(rewrite_results):
-    desert_swamp_results.close()
-print("Done")
-print((datetime.now() - startTime))
-
-plt.savefig('figures/food_desert_food_swamp.pdf')
+#calculate the indices of every tract for each combination of the walking and driving distances and vehicle fraction scales
+#of the sweep, and save them to args.sweep_output (see radius_sweep.sweep_indices for its arrays, the distances are saved in
+#miles and the tracts by their BoroCT2010 code)
+def compute_sweep(args, INPUTS, RUN_REPORT):
+    GEO_TABLE = INPUTS['GEO_TABLE']
+    miles_per_degree = conv_km_to_mi*conv_deg_to_km
+    resolution = distances_in_degrees(args)[0]
+    TRACT_TASKS = make_tract_tasks(INPUTS, args.boroughs)
+    print("Sweeping %d walking distances, %d driving distances and %d vehicle fraction scales" %(
+        len(args.sweep_walking), len(args.sweep_driving), len(args.sweep_vehicle_scale)))
+    with timed_stage(RUN_REPORT, "radius_sweep") as stage:
+        SWEEP = sweep_indices(TRACT_TASKS, INPUTS['SUPERMARKET_COORDS'], INPUTS['BODEGA_COORDS'], resolution,
+                              np.asarray(args.sweep_walking)/miles_per_degree, np.asarray(args.sweep_driving)/miles_per_degree,
+                              args.sweep_vehicle_scale, number_of_workers=args.workers)
+        stage['items'] = len(TRACT_TASKS)
+    SWEEP['boroct2010'] = np.asarray(GEO_TABLE['BoroCT2010'], dtype=np.int64)[SWEEP['tract_index']]
+    SWEEP['walking_mi'] = SWEEP.pop('walking_radii')*miles_per_degree
+    SWEEP['driving_mi'] = SWEEP.pop('driving_radii')*miles_per_degree
+    with timed_stage(RUN_REPORT, "write_sweep") as stage:
+        save_sweep(args.sweep_output, SWEEP)
+        stage['items'] = SWEEP['food_access_ind'].size
+    return SWEEP
+
+#calculate the food insecurity index of every tract, and write it to args.output (or patch the rows of the affected tracts in
+#an incremental run). Returns the polygons to map, with their desert and swamp indices and park masks, and whether the run
+#was incremental
+def compute_indices(args, INPUTS, RUN_REPORT):
+    GEO_TABLE = INPUTS['GEO_TABLE']
+    GEO_BORONAME=GEO_TABLE['BoroName']
+    GEO_BOROCT2010=GEO_TABLE['BoroCT2010']
+    SUPERMARKET_COORDS_COMBINED = INPUTS['SUPERMARKET_COORDS']
+    BODEGA_COORDS_NYCOD = INPUTS['BODEGA_COORDS']
+    rewrite_results = not args.no_rewrite
+    write_text = args.format in ('text', 'both')
+    write_binary = args.format in ('binary', 'both')
+    binary_path = binary_output_path(args.output)
+    incremental_run = (args.incremental and exists(args.state_file) and (not write_text or exists(args.output))
+                       and (not write_binary or exists(binary_path)))
+    #the stores which can reach a tract along the streets are not tracked, so street network runs recompute every tract
+    if(incremental_run and args.street_graph):
+        print("Street network runs recompute every census tract")
+        incremental_run = False
+
+    resolution, walking_distance, driving_distance = distances_in_degrees(args)
+
+    #make empty arrays for some of the quantities we want to keep from the analysis
+    FOOD_ACCESSIBILITY=[]
+    NUMBER_OF_BODEGAS=[]
+    NUMBER_OF_PEOPLE=[]
+    FOOD_DESERT_INDEX=[]
+    FOOD_SWAMP_INDEX=[]
+    #outlines of every polygon to map, with their desert and swamp indices (NaN for parks and cemeteries)
+    MAP_POLYGONS=[]
+    MAP_DESERT_INDEX=[]
+    MAP_SWAMP_INDEX=[]
+    MAP_PARKS=[]
+
+    TRACT_TASKS = make_tract_tasks(INPUTS, args.boroughs)
+
+    #the raster grid covers every tract we consider, so that incremental runs use the same cells as a full run
+    RASTER_BOUNDS = shapely.total_bounds([task[1] for task in TRACT_TASKS])
+
+    #keep only the tracts affected by the stores which changed since the last run (if it used the same tracts and distances)
+    if(incremental_run):
+        TRACT_STATE = load_tract_state(args.state_file)
+        if(state_matches(TRACT_STATE, GEO_BOROCT2010, resolution, walking_distance, driving_distance, method=counting_method(args))):
+            AFFECTED_TRACTS = affected_tracts(TRACT_STATE, SUPERMARKET_COORDS_COMBINED, BODEGA_COORDS_NYCOD)
+            TRACT_TASKS = [task for task in TRACT_TASKS if AFFECTED_TRACTS[task[0]]]
+            print("INCREMENTAL UPDATE: recomputing %d affected census tracts" %len(TRACT_TASKS))
+        else:
+            print("Tracts, distances or counting method changed since the last run")
+            incremental_run = False
+    if(rewrite_results and not incremental_run):
+        print("REWRITING RESULTS OF ANALYSIS")
+        if(write_text):
+            desert_swamp_results=open(args.output,"w")
+            desert_swamp_results.write(RESULTS_HEADER)
+    #rows of the recomputed tracts in an incremental run, by BoroCT2010 code
+    PATCHED_ROWS={}
+    #full precision rows for the binary output
+    INDEX_ROWS=[]
+
+    print("Calculating Food Desert and Swamp Indices")
+    #the tracts are spread across args.workers processes (or all computed from city-wide rasters), and come back in the
+    #same order as TRACT_TASKS
+    ACCESSIBILITY_RASTERS={}
+    #time taken, sample points and stores counted for each tract
+    TRACT_STATS=[]
+    #with a street graph, the stores within reach of every street node are counted before the tracts are sampled
+    NETWORK_COUNTS=None
+    if(args.street_graph):
+        print("Counting the stores within reach along the street network")
+        with timed_stage(RUN_REPORT, "street_network_counts") as stage:
+            STREET_GRAPH = load_street_graph(args.street_graph, conv_km_to_mi*conv_deg_to_km)
+            NETWORK_COUNTS = network_count_tables(STREET_GRAPH, SUPERMARKET_COORDS_COMBINED, BODEGA_COORDS_NYCOD,
+                                                  walking_distance, driving_distance)
+            stage['items'] = len(STREET_GRAPH['node_lon'])
+    if(args.raster_engine):
+        TRACT_RESULTS = iterate_raster_tract_indices(TRACT_TASKS, SUPERMARKET_COORDS_COMBINED, BODEGA_COORDS_NYCOD, resolution,
+                                                     walking_distance, driving_distance, RASTERS=ACCESSIBILITY_RASTERS,
+                                                     TRACT_STATS=TRACT_STATS, grid_bounds=RASTER_BOUNDS)
+    else:
+        TRACT_RESULTS = iterate_tract_indices(TRACT_TASKS, SUPERMARKET_COORDS_COMBINED, BODEGA_COORDS_NYCOD, resolution,
+                                              walking_distance, driving_distance, number_of_workers=args.workers, TRACT_STATS=TRACT_STATS,
+                                              NETWORK_COUNTS=NETWORK_COUNTS, adaptive_tolerance=args.adaptive_tolerance)
+    with timed_stage(RUN_REPORT, "tract_indices") as stage:
+        for task, (i, TRACT_PARTS) in zip(TRACT_TASKS, TRACT_RESULTS):
+            boro_census_tract=GEO_BOROCT2010[i]
+            population_in_ct=task[4]
+            #for each geometry, record the relevant quantity and keep it for the map
+            for part in TRACT_PARTS:
+                MAP_POLYGONS.append(np.column_stack([part['xs'], part['ys']]))
+                MAP_PARKS.append(part['park'])
+                if(not part['park']):
+                    food_access_ind = part['food_access_ind']
+                    number_of_bodegas = part['number_of_bodegas']
+                    food_desert_index = part['food_desert_index']
+                    food_swamp_index = part['food_swamp_index']
+                    FOOD_ACCESSIBILITY.append(food_access_ind)
+                    NUMBER_OF_BODEGAS.append(number_of_bodegas)
+                    NUMBER_OF_PEOPLE.append(population_in_ct)
+                    FOOD_DESERT_INDEX.append(food_desert_index)
+                    FOOD_SWAMP_INDEX.append(food_swamp_index)
+
+                    result_row = format_result_row(GEO_BORONAME[i], boro_census_tract, food_desert_index, food_swamp_index, number_of_bodegas, population_in_ct)
+                    if(incremental_run):
+                        PATCHED_ROWS.setdefault(boro_census_tract, []).append(result_row)
+                    elif(rewrite_results and write_text):
+                        desert_swamp_results.write(result_row)
+                    INDEX_ROWS.append((GEO_BORONAME[i], boro_census_tract, food_desert_index, food_swamp_index, number_of_bodegas,
+                                       population_in_ct, food_access_ind))
+
+                    MAP_DESERT_INDEX.append(food_desert_index)
+                    MAP_SWAMP_INDEX.append(food_swamp_index)
+                else:
+                    MAP_DESERT_INDEX.append(np.nan)
+                    MAP_SWAMP_INDEX.append(np.nan)
+        stage['items'] = len(TRACT_TASKS)
+    for stats in TRACT_STATS:
+        stats['BoroCT2010'] = GEO_BOROCT2010[stats['tract_index']]
+    RUN_REPORT['tracts'].extend(TRACT_STATS)
+
+    if('grid' in ACCESSIBILITY_RASTERS):
+        save_rasters(args.raster_file, ACCESSIBILITY_RASTERS.pop('grid'), ACCESSIBILITY_RASTERS)
+
+    with timed_stage(RUN_REPORT, "write_results") as stage:
+        if(incremental_run):
+            if(write_text):
+                patch_results_file(args.output, PATCHED_ROWS)
+            if(write_binary):
+                patch_index_records(binary_path, make_index_records(INDEX_ROWS))
+        elif(rewrite_results):
+            if(write_text):
+                desert_swamp_results.close()
+            if(write_binary):
+                write_index_records(binary_path, make_index_records(INDEX_ROWS))
+        #save the store sets and the tract to store index, for incremental updates in later runs
+        if(incremental_run or rewrite_results):
+            save_tract_state(args.state_file, GEO_BOROCT2010, GEO_TABLE['bounds'], SUPERMARKET_COORDS_COMBINED, BODEGA_COORDS_NYCOD,
+                             resolution, walking_distance, driving_distance,
+                             method=counting_method(args))
+        stage['items'] = len(PATCHED_ROWS) if incremental_run else len(TRACT_TASKS)
+    return {'MAP_POLYGONS': MAP_POLYGONS, 'MAP_DESERT_INDEX': MAP_DESERT_INDEX, 'MAP_SWAMP_INDEX': MAP_SWAMP_INDEX,
+            'MAP_PARKS': MAP_PARKS, 'incremental_run': incremental_run}
+
+#map the indices and save the map to args.map. The plotting libraries are only imported here
+def draw_index_maps(args, RESULTS, RUN_REPORT):
+    import matplotlib
+    #the map is only ever saved to a file, so no interactive backend is needed
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import matplotlib.colorbar as cbar
+    from matplotlib import rcParams
+    from map_rendering import polygon_colors, draw_polygons, save_map
+
+    universal_fontsize=20
+    universal_linewidth=2
+
+    rcParams.update({'figure.autolayout': True})
+    #the draft render skips LaTeX, which is the slowest part of drawing the text
+    matplotlib.rc('text', usetex = not args.draft)
+    matplotlib.rc('font', **{'family': 'serif', 'serif':['Computer Modern'], 'size':11})
+    matplotlib.rcParams['text.latex.preamble']=r"\usepackage{amsmath,amssymb}"
+    matplotlib.rcParams['xtick.minor.size'] = 1
+    matplotlib.rcParams['xtick.minor.width'] = 1
+    matplotlib.rcParams['xtick.labelsize'] = universal_fontsize
+    matplotlib.rcParams['ytick.labelsize'] = universal_fontsize
+    matplotlib.rc('legend', fontsize=universal_fontsize)
+
+    print("Mapping Food Desert and Swamp Indices")
+    fig, ax= plt.subplots(nrows=1, ncols=2,figsize=(16,8))
+    cmap1 = matplotlib.colormaps['PiYG_r']
+    cmap2 = matplotlib.colormaps['PRGn_r']
+
+    #these bounds make for nice plots
+    minsupes=[1e1, 1e-1]
+    maxsupes=[1e5, 1e1]
+    normalize1 = matplotlib.colors.LogNorm(vmin=minsupes[0], vmax=maxsupes[0])
+    normalize2 = matplotlib.colors.LogNorm(vmin=minsupes[1], vmax=maxsupes[1])
+
+    #map the indices, with all of the polygons on each axis drawn at once (parks and cemeteries in black)
+    with timed_stage(RUN_REPORT, "draw_maps") as stage:
+        draw_polygons(ax[0], RESULTS['MAP_POLYGONS'], polygon_colors(cmap1, normalize1, RESULTS['MAP_DESERT_INDEX'], alpha=0.75,
+                                                                     mask=RESULTS['MAP_PARKS']), rasterized=args.draft)
+        draw_polygons(ax[1], RESULTS['MAP_POLYGONS'], polygon_colors(cmap2, normalize2, RESULTS['MAP_SWAMP_INDEX'], alpha=0.75,
+                                                                     mask=RESULTS['MAP_PARKS']), rasterized=args.draft)
+        stage['items'] = len(RESULTS['MAP_POLYGONS'])
+    if(args.draft):
+        ax[0].set_title("Food Desert Index throughout NYC", fontsize=universal_fontsize)
+        ax[1].set_title("Food Swamp Index throughout NYC", fontsize=universal_fontsize)
+    else:
+        ax[0].set_title(r"$\text{Food Desert Index } C_{\rm desert} \text{ throughout NYC}$", fontsize=universal_fontsize)
+        ax[1].set_title(r"$\text{Food Swamp Index } C_{\rm swamp} \text{ throughout NYC}$", fontsize=universal_fontsize)
+    ax[0].set_xlabel("Longitude", fontsize=universal_fontsize)
+    ax[1].set_xlabel("Longitude", fontsize=universal_fontsize)
+    ax[0].set_ylabel("Latitude", fontsize=universal_fontsize)
+
+    cb_ax1 = fig.add_axes([0.062, 1.05, 0.425, 0.02])
+    cb1 = cbar.ColorbarBase(cb_ax1, cmap=cmap1,norm=matplotlib.colors.LogNorm(vmin=minsupes[0], vmax=maxsupes[0]), orientation='horizontal')
+
+    cb_ax2 = fig.add_axes([0.547, 1.05, 0.425, 0.02])
+    cb2 = cbar.ColorbarBase(cb_ax2, cmap=cmap2,norm=matplotlib.colors.LogNorm(vmin=minsupes[1], vmax=maxsupes[1]),orientation='horizontal')
+    #for aind in range(0, 2):
+    #    ax[aind].set_xlim([-74.3, -73.7])
+    #    ax[aind].set_ylim([40.5, 40.95])
+    with timed_stage(RUN_REPORT, "save_map") as stage:
+        save_map(fig, args.map, draft=args.draft)
+
+def main(argv=None):
+    args = parse_arguments(argv)
+    #the time, memory and items of each stage and tract are written to args.report
+    RUN_REPORT = new_report("food_desert_swamp_indices", profile_dir=args.profile_dir, trace_memory=args.trace_memory)
+    INPUTS = load_inputs(args, RUN_REPORT)
+
+    startTime = datetime.now()
+    if(args.sweep):
+        compute_sweep(args, INPUTS, RUN_REPORT)
+        print("Done")
+        print((datetime.now() - startTime))
+        write_report(args.report, RUN_REPORT)
+        return
+    RESULTS = compute_indices(args, INPUTS, RUN_REPORT)
+    print("Done")
+    print((datetime.now() - startTime))
+
+    #incremental runs only recompute some tracts, so they do not redraw the map
+    if(not args.no_map and not RESULTS['incremental_run']):
+        draw_index_maps(args, RESULTS, RUN_REPORT)
+    write_report(args.report, RUN_REPORT)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+#Author(s)     : Pedro Espino (pespino@berkeley.edu)
+#Licence       : GPLv3
+
+# This module reads the food store data shared by all of the scripts: the NYC zipcodes (MODZCTA dataset), the Retail Food Stores
+# database from NYC Open Data, and the list of supermarkets scraped from the web (output of pull_supermarkets_from_web.py).
+# The retail stores are parsed in a single pass into one columnar table of NYC stores, with masks marking the bodegas,
+# supermarkets and "markets", so that every script works from the same data. The retail store files cover all of New York State,
+# so they are streamed in bounded-size chunks, reading only the columns that are used.
+
+import numpy as np
+import pandas
+
+from store_classification import STORE_RULES, apply_store_rules
+
+#get the set of NYC zipcodes, each MODZCTA row can list several zipcodes separated by commas
+def load_nyc_zipcodes(zipcode_csv):
+    zipcode_dataframe = pandas.read_csv(zipcode_csv, usecols=['ZCTA'], dtype={'ZCTA': str})
+    #the last row of the dataset is not a real zip code tabulation area, so it is left out
+    ZCTA = zipcode_dataframe['ZCTA'].iloc[:-1].dropna()
+    return set(ZCTA.str.split(',').explode().str.strip())
+
+#parse "POINT (lon lat)" strings into arrays of longitudes and latitudes (NaN where missing)
+def parse_georeference(georeference):
+    lonlat = pandas.Series(georeference).astype(str).str.extract(r'POINT \(\s*(\S+)\s+([^\s)]+)\s*\)')
+    return pandas.to_numeric(lonlat[0], errors='coerce').to_numpy(float), pandas.to_numeric(lonlat[1], errors='coerce').to_numpy(float)
+
+#add the bodega / supermarket / market masks and the category codes (see store_classification.py) to a table of stores
+def classify_stores(stores, rules=STORE_RULES):
+    MASKS, codes = apply_store_rules(stores['name'], stores['dbaname'], stores['type'], rules)
+    for category, mask in MASKS.items():
+        stores['is_%s' %category] = mask
+    stores['category'] = codes
+    return stores
+
+#columns of the retail food store database which are used, everything else is never read
+FOODSTORE_COLUMNS=['County', 'License Number', 'Operation Type', 'Establishment Type', 'Entity Name', 'DBA Name',
+                   'Street Number', 'Street Name', 'Zip Code', 'Square Footage', 'Georeference']
+
+#turn a chunk of the retail food store database into the columnar store table, with the category masks
+def _store_table(foodstore_dataframe):
+    lon, lat = parse_georeference(foodstore_dataframe['Georeference'])
+    stores = pandas.DataFrame({
+        'address': foodstore_dataframe['Street Number'].astype(str) + ' ' + foodstore_dataframe['Street Name'].astype(str),
+        'boro': foodstore_dataframe['County'],
+        'zipcode': foodstore_dataframe['Zip Code'],
+        'lon': lon,
+        'lat': lat,
+        'area_sqft': pandas.to_numeric(foodstore_dataframe['Square Footage'].str.replace(',', '', regex=False), errors='coerce').to_numpy(float),
+        'name': foodstore_dataframe['Entity Name'],
+        'dbaname': foodstore_dataframe['DBA Name'],
+        'type': foodstore_dataframe['Establishment Type'],
+        'optype': foodstore_dataframe['Operation Type'],
+        'license': foodstore_dataframe['License Number'],
+    }).reset_index(drop=True)
+    return classify_stores(stores)
+
+#stream one or more retail food store files (e.g. several yearly or statewide extracts) in chunks of chunksize rows, reading
+#only FOODSTORE_COLUMNS as strings. If zipcodes are given only the stores in them are kept. Yields one store table per chunk,
+#so the memory used stays bounded by the chunk size however large the files are
+def iter_food_store_chunks(foodstore_csvs, zipcodes=None, chunksize=100000):
+    if(isinstance(foodstore_csvs, str)):
+        foodstore_csvs = [foodstore_csvs]
+    if(zipcodes is not None):
+        zipcodes = set(zipcodes)
+    for foodstore_csv in foodstore_csvs:
+        with pandas.read_csv(foodstore_csv, usecols=FOODSTORE_COLUMNS, dtype=str, chunksize=chunksize) as reader:
+            for chunk in reader:
+                if(zipcodes is not None):
+                    #a hashed set lookup for every row, instead of scanning a list of zipcodes
+                    chunk = chunk[chunk['Zip Code'].str.strip().isin(zipcodes).to_numpy()]
+                if(len(chunk)>0):
+                    yield _store_table(chunk)
+
+#read the retail food store database and keep the NYC stores, returns a table with one row per store and the columns
+#address, boro, zipcode, lon, lat, area_sqft, name, dbaname, type, optype, license, is_bodega, is_supermarket, is_market, category
+def load_nyc_food_stores(foodstore_csvs, nyc_zipcodes, chunksize=100000):
+    STORE_CHUNKS = list(iter_food_store_chunks(foodstore_csvs, nyc_zipcodes, chunksize=chunksize))
+    if(len(STORE_CHUNKS)==0):
+        return _store_table(pandas.DataFrame({column: pandas.Series(dtype=object) for column in FOODSTORE_COLUMNS}))
+    return pandas.concat(STORE_CHUNKS, ignore_index=True)
+
+#[longitude, latitude] coordinates of the stores selected by a mask, as an (N, 2) array. Stores without a location (no or
+#unparseable Georeference) can not be placed, so they are left out
+def store_coords(stores, mask=None):
+    if(mask is not None):
+        stores = stores[np.asarray(mask)]
+    coords = stores[['lon', 'lat']].to_numpy(float)
+    return coords[np.isfinite(coords).all(axis=1)]
+
+#read the supermarkets scraped from the web (ADDRESS, STATE ZIPCODE, LATITUDE, LONGITUDE), returns a table with the columns
+#address, zipcode, lon, lat
+def load_web_supermarkets(supermarketpage_file):
+    web_dataframe = pandas.read_csv(supermarketpage_file, comment='#', header=None, skipinitialspace=True,
+                                    names=['address', 'state_zipcode', 'lat', 'lon'], dtype={'address': str, 'state_zipcode': str})
+    return pandas.DataFrame({
+        'address': web_dataframe['address'],
+        'zipcode': web_dataframe['state_zipcode'].str.split().str[-1],
+        'lon': web_dataframe['lon'].astype(float),
+        'lat': web_dataframe['lat'].astype(float),
+    })
@@ -0,0 +1,118 @@
+#Author(s)     : Pedro Espino (pespino@berkeley.edu)
+#Licence       : GPLv3
+
+# This module geocodes store addresses through a persistent cache. Results are kept in an SQLite database keyed by the
+# normalized address, so re-crawling the same stores costs (almost) no calls to the geocoding service. Only the addresses
+# missing from the cache are sent to the provider, in batches, over a few threads and under a rate limit, and each batch is
+# committed to the cache as soon as it is done. A provider is any function taking an address and returning its
+# (longitude, latitude), None if the address can not be found, or raising an exception for errors worth retrying later.
+# Addresses that can not be found are cached as such, and are reported as NaN coordinates instead of [0.0, 0.0].
+
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+#normalize an address into its cache key: upper case, without punctuation and with single spaces between words
+def normalize_address(address):
+    return ' '.join(re.sub(r'[^\w\s]', ' ', str(address).upper()).split())
+
+#open (and create if needed) the SQLite geocoding cache at path
+def open_geocode_cache(path):
+    cache = sqlite3.connect(path)
+    cache.execute("CREATE TABLE IF NOT EXISTS geocodes (address TEXT PRIMARY KEY, lon REAL, lat REAL, found INTEGER NOT NULL)")
+    cache.commit()
+    return cache
+
+#cached results for a list of normalized addresses, as a dict of address to (lon, lat), or None for addresses not found
+def lookup_cached(cache, addresses):
+    CACHED={}
+    addresses = list(addresses)
+    #look up at most 500 addresses per query, below SQLite's limit on query parameters
+    for start in range(0, len(addresses), 500):
+        batch = addresses[start:start+500]
+        rows = cache.execute("SELECT address, lon, lat, found FROM geocodes WHERE address IN (%s)" %','.join('?'*len(batch)), batch)
+        for address, lon, lat, found in rows:
+            CACHED[address] = (lon, lat) if found else None
+    return CACHED
+
+#store the results of a batch of lookups (dict of normalized address to (lon, lat) or None) in one transaction
+def store_cached(cache, RESULTS):
+    with cache:
+        cache.executemany("INSERT OR REPLACE INTO geocodes (address, lon, lat, found) VALUES (?, ?, ?, ?)",
+                          [(address, None, None, 0) if coords is None else (address, float(coords[0]), float(coords[1]), 1)
+                           for address, coords in RESULTS.items()])
+
+#function which blocks so that calls to it are spaced by at least 1/rate seconds across all threads (no limit for rate None)
+def _rate_limiter(rate):
+    lock = threading.Lock()
+    next_call = [time.monotonic()]
+    def wait():
+        if(rate is None):
+            return
+        with lock:
+            now = time.monotonic()
+            delay = next_call[0] - now
+            next_call[0] = max(now, next_call[0]) + 1.0/rate
+        if(delay>0):
+            time.sleep(delay)
+    return wait
+
+#geocode a list of addresses through the cache, returns an (N, 2) array of [longitude, latitude] (NaN for addresses that
+#could not be found or failed) and the number of provider calls made. Cache misses are sent to the provider batch_size at a
+#time, across max_concurrency threads, at no more than rate_limit calls per second. Addresses cached as not found are only
+#sent again with retry_not_found
+def geocode_addresses(addresses, cache, provider, batch_size=50, max_concurrency=4, rate_limit=5.0, retry_not_found=False):
+    keys = [normalize_address(address) for address in addresses]
+    RESULTS = lookup_cached(cache, set(keys))
+    #the original spelling of each address missing from the cache is what gets sent to the provider
+    MISSES={}
+    for key, address in zip(keys, addresses):
+        if(key not in MISSES and (key not in RESULTS or (retry_not_found and RESULTS[key] is None))):
+            MISSES[key] = address
+    wait = _rate_limiter(rate_limit)
+    def lookup(key):
+        wait()
+        try:
+            return key, provider(MISSES[key]), None
+        except Exception as error:
+            return key, None, error
+
+    number_of_calls = 0
+    FAILURES={}
+    miss_keys = list(MISSES)
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        for start in range(0, len(miss_keys), batch_size):
+            BATCH={}
+            for key, coords, error in executor.map(lookup, miss_keys[start:start+batch_size]):
+                number_of_calls += 1
+                #errors are not cached, so the address is tried again on the next run
+                if(error is not None):
+                    FAILURES[key] = error
+                else:
+                    BATCH[key] = coords
+            store_cached(cache, BATCH)
+            RESULTS.update(BATCH)
+    for key, error in FAILURES.items():
+        print("GEOCODING FAILED FOR %s: %s" %(MISSES[key], error))
+
+    COORDS = np.full((len(keys), 2), np.nan)
+    for k, key in enumerate(keys):
+        if(RESULTS.get(key) is not None):
+            COORDS[k] = RESULTS[key]
+    return COORDS, number_of_calls
+
+#provider for the Bing Maps geocoding API through the geocoder package (a Bing Maps API key is required)
+def bing_provider(api_key):
+    import geocoder
+    def geocode(address):
+        result = geocoder.bing(address, key=api_key)
+        if(result.ok):
+            return result.lng, result.lat
+        #addresses Bing has no results for are not found, any other error is worth retrying
+        if('no results' in str(result.status).lower()):
+            return None
+        raise RuntimeError(result.status)
+    return geocode
@@ -0,0 +1,77 @@
+#Author(s)     : Pedro Espino (pespino@berkeley.edu)
+#Licence       : GPLv3
+
+# This module keeps a binary cache of the census tract geometries in nyct2010.csv (NYC Open Data). Parsing the WKT of every
+# tract is a noticeable part of the startup of each script, so the first time a file is seen its tracts are parsed once and
+# stored as WKB alongside their bounds and the useful descriptive columns (BoroName, NTACode, BoroCT2010, ...). The cache is
+# keyed by a hash of the source file, so it is rebuilt automatically whenever the CSV changes. Callers can then load only the
+# boroughs or the bounding box they need, without touching WKT.
+
+import hashlib
+import os
+import numpy as np
+import pandas
+import shapely
+
+#columns of nyct2010.csv kept alongside the geometries
+GEO_COLUMNS=['BoroName', 'NTAName', 'PUMA', 'NTACode', 'CTLabel', 'CT2010', 'BoroCT2010']
+
+#hash the contents of a file in chunks, so that large files are never read in full
+def file_hash(path, chunk_size=1<<20):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+#path of the cache file for a given source file, stored next to it unless a cache directory is given
+def cache_path(csv_path, cache_dir=None):
+    if(cache_dir is None):
+        cache_dir = os.path.dirname(os.path.abspath(csv_path))
+    base = os.path.splitext(os.path.basename(csv_path))[0]
+    return os.path.join(cache_dir, "%s.%s.geocache.npz" %(base, file_hash(csv_path)[:16]))
+
+#parse the WKT of every tract once and write the WKB, bounds and descriptive columns to the cache file
+def build_geometry_cache(csv_path, path):
+    geo_dataframe = pandas.read_csv(csv_path, usecols=GEO_COLUMNS+['the_geom'])
+    geometries = shapely.from_wkt(np.asarray(geo_dataframe['the_geom']))
+    #store the WKB of all tracts back to back in one byte buffer, with offsets marking where each tract starts
+    wkbs = shapely.to_wkb(geometries)
+    offsets = np.zeros(len(wkbs)+1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(w) for w in wkbs])
+    columns = {'col_%s' %key: np.asarray(geo_dataframe[key]).astype(str) for key in GEO_COLUMNS}
+    #write to a temporary file first so that an interrupted run never leaves a broken cache behind
+    tmp_path = path + '.tmp.npz'
+    np.savez(tmp_path, wkb=np.frombuffer(b''.join(wkbs), dtype=np.uint8), offsets=offsets,
+             bounds=shapely.bounds(geometries), **columns)
+    os.replace(tmp_path, path)
+
+#load the census tracts from nyct2010.csv through the cache, optionally keeping only some boroughs and/or the tracts
+#intersecting a (lonmin, latmin, lonmax, latmax) bounding box. Returns a dict of arrays with the GEO_COLUMNS, the 'bounds'
+#of each tract and its shapely 'geometry'
+def load_tract_geometries(csv_path, boroughs=None, bbox=None, cache_dir=None):
+    path = cache_path(csv_path, cache_dir)
+    if(not os.path.exists(path)):
+        print("Building geometry cache for %s" %csv_path)
+        build_geometry_cache(csv_path, path)
+    with np.load(path) as cache:
+        bounds = cache['bounds']
+        columns = {key: cache['col_%s' %key] for key in GEO_COLUMNS}
+        keep = np.ones(len(bounds), dtype=bool)
+        if(boroughs is not None):
+            keep &= np.isin(columns['BoroName'], list(boroughs))
+        if(bbox is not None):
+            lonmin, latmin, lonmax, latmax = bbox
+            keep &= (bounds[:,0]<=lonmax) & (bounds[:,2]>=lonmin) & (bounds[:,1]<=latmax) & (bounds[:,3]>=latmin)
+        #only decode the WKB of the tracts we keep
+        kept = np.nonzero(keep)[0]
+        wkb = cache['wkb'].tobytes()
+        offsets = cache['offsets']
+        wkbs = np.array([wkb[offsets[k]:offsets[k+1]] for k in kept], dtype=object)
+    GEO_TABLE = {key: column[kept] for key, column in columns.items()}
+    #these codes are integers in the source data
+    for key in ['PUMA', 'CT2010', 'BoroCT2010']:
+        GEO_TABLE[key] = GEO_TABLE[key].astype(np.int64)
+    GEO_TABLE['bounds'] = bounds[kept]
+    GEO_TABLE['geometry'] = shapely.from_wkb(wkbs) if len(wkbs)>0 else np.empty(0, dtype=object)
+    return GEO_TABLE
@@ -0,0 +1,107 @@
+#Author(s)     : Pedro Espino (pespino@berkeley.edu)
+#Licence       : GPLv3
+
+# This module samples census tract geometries on a regular grid of longitude/latitude points. Rather than building a MultiPoint
+# and testing each point against the geometry one at a time, the whole grid is tested against a prepared geometry in a single
+# vectorized call, and the points that fall inside are returned as plain NumPy coordinate arrays. Geometries can also be
+# sampled adaptively, on a quadtree which is only refined where the store counts change within a cell, so
+# large uniform tracts need far fewer samples and small tracts always get at least one.
+
+import numpy as np
+import shapely
+
+#make the grid of points covering the bounds of a geometry, separated by resolution (in degrees)
+def make_grid(bounds, resolution):
+    lonmin, latmin, lonmax, latmax = bounds
+    xgrid, ygrid = np.meshgrid(np.arange(lonmin, lonmax, resolution), np.arange(latmin, latmax, resolution))
+    return xgrid.ravel(), ygrid.ravel()
+
+#return the x (longitude) and y (latitude) coordinates of the grid points which fall inside the geometry
+def sample_geometry(geom, resolution):
+    xgrid, ygrid = make_grid(geom.bounds, resolution)
+    if(len(xgrid)==0):
+        return np.empty(0), np.empty(0)
+    #preparing the geometry builds its spatial index once, so the containment test over the whole grid is fast
+    shapely.prepare(geom)
+    inside = shapely.contains_xy(geom, xgrid, ygrid)
+    return xgrid[inside], ygrid[inside]
+
+#squares of side size with lower left corners x0, y0, as an array of polygons
+def _cells(x0, y0, size):
+    return shapely.box(x0, y0, x0+size, y0+size)
+
+#sample point and weight of each cell which overlaps the geometry: the centre of the cell if it lies inside the geometry (a
+#point on the overlap otherwise), weighted by the area of the overlap. Returns the indices (into x0, y0) of the overlapping
+#cells and these
+def _cell_samples(geom, x0, y0, size):
+    cells = _cells(x0, y0, size)
+    overlapping = np.flatnonzero(shapely.intersects(geom, cells))
+    cells = cells[overlapping]
+    xs = x0[overlapping] + size/2
+    ys = y0[overlapping] + size/2
+    #only the cells on the boundary need their overlap worked out
+    weights = np.full(len(cells), size*size)
+    boundary = ~shapely.contains(geom, cells)
+    pieces = shapely.intersection(geom, cells[boundary])
+    weights[boundary] = shapely.area(pieces)
+    outside = ~shapely.contains_xy(geom, xs[boundary], ys[boundary])
+    if(outside.any()):
+        surface_points = shapely.point_on_surface(pieces[outside])
+        xs[np.flatnonzero(boundary)[outside]] = shapely.get_x(surface_points)
+        ys[np.flatnonzero(boundary)[outside]] = shapely.get_y(surface_points)
+    #cells which only touch the geometry along an edge carry no area
+    keep = weights>0
+    return overlapping[keep], xs[keep], ys[keep], weights[keep]
+
+#sample a geometry on a quadtree of cells, refining only where the store counts change within a cell. count_samples(xs, ys)
+#returns the counts at the sample points as an (n, k) array. Each sample is weighted by the area of the geometry its cell
+#covers. The quadtree starts from a single cell as wide as the longer side of the geometry (or resolution, in degrees, if
+#that is larger) and goes down one level at a time: the cells still being refined are split in four and sampled, and the error of a cell is how
+#much its children change its share of the tract sums (relative to the tract average, or to one store if the average is
+#lower). A cell whose error is within tolerance*sqrt(its share of the area) keeps its children and is not refined further,
+#so the errors of the cells, added in quadrature, stay within tolerance. No cell gets smaller than resolution, and there is
+#always at least one sample. Returns the x and y coordinates, weights and counts of the samples
+def adaptive_sample_geometry(geom, count_samples, resolution, tolerance=0.02):
+    shapely.prepare(geom)
+    lonmin, latmin, lonmax, latmax = geom.bounds
+    size = max(lonmax-lonmin, latmax-latmin, resolution)
+    #the first cell covers the whole geometry, so it is refined down to where the counts change rather than from a fixed size
+    _, xs, ys, weights = _cell_samples(geom, np.array([lonmin]), np.array([latmin]), size)
+    if(len(xs)==0):
+        #degenerate geometries (no area) still get a sample
+        point = geom.representative_point()
+        return np.array([point.x]), np.array([point.y]), np.ones(1), np.asarray(count_samples(np.array([point.x]), np.array([point.y])), dtype=float).reshape(1, -1)
+    x0 = np.array([lonmin])
+    y0 = np.array([latmin])
+    counts = np.asarray(count_samples(xs, ys), dtype=float).reshape(len(xs), -1)
+    area = weights.sum()
+    #every cell being refined has the current size, the others are final
+    refining = np.ones(len(xs), dtype=bool)
+    while(refining.any() and size/2>=resolution*(1-1e-9)):
+        parents = np.flatnonzero(refining)
+        size = size/2
+        child_x0 = np.concatenate([x0[parents], x0[parents]+size, x0[parents], x0[parents]+size])
+        child_y0 = np.concatenate([y0[parents], y0[parents], y0[parents]+size, y0[parents]+size])
+        children, child_xs, child_ys, child_weights = _cell_samples(geom, child_x0, child_y0, size)
+        child_parents = np.tile(parents, 4)[children]
+        child_counts = np.asarray(count_samples(child_xs, child_ys), dtype=float).reshape(len(child_xs), -1)
+
+        #the sums of each parent's children, against the parent's own sample times its area
+        refined = np.zeros((len(xs), counts.shape[1]))
+        np.add.at(refined, child_parents, child_weights[:,None]*child_counts)
+        coarse = weights[:,None]*counts
+        average = (coarse[~refining].sum(axis=0) + refined[refining].sum(axis=0))/area
+        errors = (np.abs(refined[parents]-coarse[parents])/area/np.maximum(np.abs(average), 1.0)).max(axis=1)
+        converged = np.zeros(len(xs), dtype=bool)
+        converged[parents] = errors<=tolerance*np.sqrt(weights[parents]/area)
+
+        #replace the parents by their children, which are refined further unless their parent converged
+        keep = ~refining
+        x0 = np.concatenate([x0[keep], child_x0[children]])
+        y0 = np.concatenate([y0[keep], child_y0[children]])
+        xs = np.concatenate([xs[keep], child_xs])
+        ys = np.concatenate([ys[keep], child_ys])
+        weights = np.concatenate([weights[keep], child_weights])
+        counts = np.concatenate([counts[keep], child_counts])
+        refining = np.concatenate([np.zeros(keep.sum(), dtype=bool), ~converged[child_parents]])
+    return xs, ys, weights, counts
@@ -0,0 +1,135 @@
+#Author(s)     : Pedro Espino (pespino@berkeley.edu)
+#Licence       : GPLv3
+
+# This module lets food_desert_swamp_indices.py recompute only the census tracts affected by a change in the store database
+# (a new Retail Food Stores snapshot or a refreshed list of web supermarkets), rather than rerunning the whole city. After a
+# run, the store sets are saved along with an index from each tract to the stores within driving distance of it. On the
+# next run the new store sets are diffed against the saved ones, and only the tracts within driving distance of a store that
+# opened or closed are recomputed. Their rows are then patched into DESERT_SWAMP_INDICES in place.
+
+import os
+import numpy as np
+from scipy.spatial import cKDTree
+
+#index from each tract to the stores within radius of its bounding box, in compressed form: the stores of tract k are
+#indices[offsets[k]:offsets[k+1]]. Every sample point of a tract lies inside its bounding box, so this covers every store
+#that can change the tract's indices
+def build_tract_store_index(tract_bounds, store_coords, radius):
+    tract_bounds = np.asarray(tract_bounds, dtype=float).reshape(-1, 4)
+    store_coords = np.asarray(store_coords, dtype=float).reshape(-1, 2)
+    offsets = np.zeros(len(tract_bounds)+1, dtype=np.int64)
+    if(len(store_coords)==0 or len(tract_bounds)==0):
+        return offsets, np.empty(0, dtype=np.int64)
+    #look for stores within the half-diagonal of the box plus the radius of its centre, then keep those near the box itself
+    centres = np.column_stack([(tract_bounds[:,0]+tract_bounds[:,2])/2, (tract_bounds[:,1]+tract_bounds[:,3])/2])
+    half_diagonals = np.hypot(tract_bounds[:,2]-tract_bounds[:,0], tract_bounds[:,3]-tract_bounds[:,1])/2
+    CANDIDATES = cKDTree(store_coords).query_ball_point(centres, half_diagonals+radius)
+    TRACT_STORES=[]
+    for k, candidates in enumerate(CANDIDATES):
+        candidates = np.asarray(candidates, dtype=np.int64)
+        near = distance_to_boxes(store_coords[candidates], tract_bounds[k]) <= radius
+        TRACT_STORES.append(np.sort(candidates[near]))
+        offsets[k+1] = offsets[k] + np.count_nonzero(near)
+    return offsets, np.concatenate(TRACT_STORES)
+
+#distance (in degrees) from each point to a (lonmin, latmin, lonmax, latmax) box, zero inside it. Boxes can be one per point
+def distance_to_boxes(points, bounds):
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    bounds = np.asarray(bounds, dtype=float)
+    dx = np.maximum(np.maximum(bounds[...,0]-points[:,0], points[:,0]-bounds[...,2]), 0.0)
+    dy = np.maximum(np.maximum(bounds[...,1]-points[:,1], points[:,1]-bounds[...,3]), 0.0)
+    return np.hypot(dx, dy)
+
+#save the state of a run: the tracts and their bounds, the store sets, the parameters and the tract to store indices. method
+#describes how the stores were counted if not by the default grid sampler in straight lines (engine, street graph, ...)
+def save_tract_state(path, boroct2010, tract_bounds, supermarket_coords, bodega_coords, resolution, walking_distance, driving_distance,
+                     method=''):
+    supermarket_coords = np.asarray(supermarket_coords, dtype=float).reshape(-1, 2)
+    bodega_coords = np.asarray(bodega_coords, dtype=float).reshape(-1, 2)
+    supermarket_offsets, supermarket_indices = build_tract_store_index(tract_bounds, supermarket_coords, driving_distance)
+    bodega_offsets, bodega_indices = build_tract_store_index(tract_bounds, bodega_coords, driving_distance)
+    tmp_path = path + '.tmp.npz'
+    np.savez(tmp_path, boroct2010=np.asarray(boroct2010, dtype=np.int64), tract_bounds=np.asarray(tract_bounds, dtype=float),
+             supermarket_coords=supermarket_coords, bodega_coords=bodega_coords,
+             parameters=np.array([resolution, walking_distance, driving_distance], dtype=float), method=np.array(method),
+             supermarket_offsets=supermarket_offsets, supermarket_indices=supermarket_indices,
+             bodega_offsets=bodega_offsets, bodega_indices=bodega_indices)
+    os.replace(tmp_path, path)
+
+#load the state saved by save_tract_state into a dict of arrays
+def load_tract_state(path):
+    with np.load(path) as state:
+        return {key: state[key] for key in state.files}
+
+#whether a saved state can be used for an incremental update of a run over the given tracts and parameters
+def state_matches(TRACT_STATE, boroct2010, resolution, walking_distance, driving_distance, method=''):
+    return (np.array_equal(TRACT_STATE['boroct2010'], np.asarray(boroct2010, dtype=np.int64))
+            and np.allclose(TRACT_STATE['parameters'], [resolution, walking_distance, driving_distance], rtol=0, atol=1e-12)
+            and str(TRACT_STATE.get('method', ''))==method)
+
+#diff two store sets, with stores identified by their coordinates rounded to decimals places. Returns the indices of the
+#old stores that were removed and the coordinates of the new stores that were added
+def diff_stores(old_coords, new_coords, decimals=6):
+    old_coords = np.asarray(old_coords, dtype=float).reshape(-1, 2)
+    new_coords = np.asarray(new_coords, dtype=float).reshape(-1, 2)
+    old_keys = [tuple(row) for row in np.round(old_coords, decimals)]
+    new_keys = [tuple(row) for row in np.round(new_coords, decimals)]
+    #count duplicates, so that one of two stores at the same address closing is still noticed
+    remaining = {}
+    for key in new_keys:
+        remaining[key] = remaining.get(key, 0) + 1
+    removed = []
+    for k, key in enumerate(old_keys):
+        if(remaining.get(key, 0)>0):
+            remaining[key] -= 1
+        else:
+            removed.append(k)
+    added = []
+    for row, key in zip(new_coords, new_keys):
+        if(remaining.get(key, 0)>0):
+            remaining[key] -= 1
+            added.append(row)
+    return np.asarray(removed, dtype=np.int64), np.asarray(added, dtype=float).reshape(-1, 2)
+
+#mask of the tracts in the saved state affected by the change from the saved store sets to the new ones: tracts indexed to a
+#removed store, or within driving distance of an added one
+def affected_tracts(TRACT_STATE, supermarket_coords, bodega_coords):
+    driving_distance = TRACT_STATE['parameters'][2]
+    tract_bounds = TRACT_STATE['tract_bounds']
+    affected = np.zeros(len(tract_bounds), dtype=bool)
+    for store_type, new_coords in [('supermarket', supermarket_coords), ('bodega', bodega_coords)]:
+        removed, added = diff_stores(TRACT_STATE['%s_coords' %store_type], new_coords)
+        if(len(removed)>0):
+            offsets = TRACT_STATE['%s_offsets' %store_type]
+            indices = TRACT_STATE['%s_indices' %store_type]
+            tract_of_entry = np.repeat(np.arange(len(tract_bounds)), np.diff(offsets))
+            affected[tract_of_entry[np.isin(indices, removed)]] = True
+        for store in added:
+            affected |= distance_to_boxes(np.broadcast_to(store, (len(tract_bounds), 2)), tract_bounds) <= driving_distance
+    return affected
+
+#replace the rows of some census tracts in a DESERT_SWAMP_INDICES file. NEW_ROWS maps BoroCT2010 codes to their new rows,
+#which take the place of the old rows of that tract (tracts without old rows are added at the end). Other rows are untouched
+def patch_results_file(path, NEW_ROWS):
+    NEW_ROWS = {int(code): rows for code, rows in NEW_ROWS.items()}
+    PATCHED=[]
+    written=set()
+    with open(path, 'r') as f:
+        for line in f:
+            fields = line.split()
+            code = None
+            if(not line.startswith('#') and len(fields)>=6):
+                #the borough name can contain spaces (Staten Island), so the code is counted from the end of the row
+                code = int(fields[-5])
+            if(code is None or code not in NEW_ROWS):
+                PATCHED.append(line)
+            elif(code not in written):
+                PATCHED.extend(NEW_ROWS[code])
+                written.add(code)
+    for code, rows in NEW_ROWS.items():
+        if(code not in written):
+            PATCHED.extend(rows)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        f.writelines(PATCHED)
+    os.replace(tmp_path, path)
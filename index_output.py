@@ -0,0 +1,59 @@
+#Author(s)     : Pedro Espino (pespino@berkeley.edu)
+#Licence       : GPLv3
+
+# This module stores the Food Desert and Food Swamp Indices in a binary, columnar form next to (or instead of) the text
+# DESERT_SWAMP_INDICES file. The rows (one per polygon part of each census tract, as in the text file) are kept as a NumPy
+# structured array in a .npy file, at full double precision, with the BoroCT2010 code, indices, bodega count, population and
+# food accessibility of each part. The file can be memory-mapped, so readers get every column without parsing any text and
+# without copying the data into memory up front.
+
+import os
+import numpy as np
+
+#fields of the binary output, one record per polygon part
+INDEX_DTYPE = np.dtype([('boroname', 'U13'), ('boroct2010', np.int64), ('food_desert_index', np.float64),
+                        ('food_swamp_index', np.float64), ('number_of_bodegas', np.float64), ('population', np.float64),
+                        ('food_access_ind', np.float64)])
+
+#path of the binary output for a text output path
+def binary_output_path(path):
+    return path + '.npy'
+
+#make the structured array of records from a list of (boroname, boroct2010, food_desert_index, food_swamp_index,
+#number_of_bodegas, population, food_access_ind) tuples
+def make_index_records(ROWS):
+    return np.array([tuple(row) for row in ROWS], dtype=INDEX_DTYPE)
+
+#write the records to a .npy file (through a temporary file, so readers never see a half-written file)
+def write_index_records(path, records):
+    records = np.asarray(records, dtype=INDEX_DTYPE)
+    tmp_path = path + '.tmp.npy'
+    np.save(tmp_path, records, allow_pickle=False)
+    os.replace(tmp_path, path)
+
+#read the records of a .npy file. With mmap the file is memory-mapped read-only, and columns (records['boroct2010'], ...)
+#are views into it that are only read from disk as they are used
+def load_index_records(path, mmap=True):
+    records = np.load(path, mmap_mode='r' if mmap else None, allow_pickle=False)
+    if(records.dtype!=INDEX_DTYPE):
+        raise ValueError("%s does not hold desert / swamp index records (found fields %s)" %(path, records.dtype.names))
+    return records
+
+#replace the records of some census tracts in a .npy file by NEW_RECORDS, as patch_results_file does for the text output:
+#the new records of a tract take the place of its old ones, and tracts without old records are added at the end
+def patch_index_records(path, NEW_RECORDS):
+    NEW_RECORDS = np.asarray(NEW_RECORDS, dtype=INDEX_DTYPE)
+    old_records = np.array(load_index_records(path, mmap=False))
+    replaced = np.isin(old_records['boroct2010'], NEW_RECORDS['boroct2010'])
+    #the new records go where the first old record of their tract was, so the order of the tracts is kept
+    PATCHED=[]
+    written=set()
+    for k in range(len(old_records)):
+        code = old_records['boroct2010'][k]
+        if(not replaced[k]):
+            PATCHED.append(old_records[k:k+1])
+        elif(code not in written):
+            PATCHED.append(NEW_RECORDS[NEW_RECORDS['boroct2010']==code])
+            written.add(code)
+    PATCHED.append(NEW_RECORDS[~np.isin(NEW_RECORDS['boroct2010'], list(written))])
+    write_index_records(path, np.concatenate(PATCHED))
@@ -0,0 +1,90 @@
+#Author(s)     : Pedro Espino (pespino@berkeley.edu)
+#Licence       : GPLv3
+
+# This module records where the time (and memory) of a run goes. Each stage of a pipeline (reading the data, classifying the
+# stores, computing the indices, drawing the maps, ...) is wrapped in timed_stage, which records its wall clock time, CPU time,
+# peak memory and the number of items it handled, and can run it under cProfile. Per-tract statistics (time, sample points,
+# stores counted) can be added alongside, and everything is written to a JSON report next to the results of the run.
+
+import cProfile
+import json
+import os
+import platform
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+#peak resident memory of this process so far in MB, or None where the platform does not report it
+def peak_rss_mb():
+    if(resource is None):
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    #ru_maxrss is in bytes on macOS and in kB elsewhere
+    return peak/2.**20 if platform.system()=='Darwin' else peak/2.**10
+
+#start a report for a run. With profile_dir, every stage is run under cProfile and its stats are dumped to
+#<profile_dir>/<stage>.prof. With trace_memory, the peak Python memory allocated in each stage is traced (this slows it down)
+def new_report(name, profile_dir=None, trace_memory=False):
+    return {'name': name, 'started': datetime.now().isoformat(timespec='seconds'), 'profile_dir': profile_dir,
+            'trace_memory': trace_memory, 'stages': [], 'tracts': []}
+
+#record a stage of the run in REPORT. The stage dict is handed to the caller, which can set its 'items' (or any other key)
+@contextmanager
+def timed_stage(REPORT, name):
+    stage = {'name': name, 'items': None}
+    profiler = cProfile.Profile() if REPORT.get('profile_dir') else None
+    if(REPORT.get('trace_memory')):
+        if(not tracemalloc.is_tracing()):
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    if(profiler is not None):
+        profiler.enable()
+    try:
+        yield stage
+    finally:
+        if(profiler is not None):
+            profiler.disable()
+        stage['wall_s'] = time.perf_counter() - wall_start
+        stage['cpu_s'] = time.process_time() - cpu_start
+        stage['peak_rss_mb'] = peak_rss_mb()
+        if(REPORT.get('trace_memory')):
+            stage['peak_traced_mb'] = tracemalloc.get_traced_memory()[1]/2.**20
+        if(profiler is not None):
+            os.makedirs(REPORT['profile_dir'], exist_ok=True)
+            stage['profile'] = os.path.join(REPORT['profile_dir'], '%s.prof' %name)
+            profiler.dump_stats(stage['profile'])
+        REPORT['stages'].append(stage)
+
+#the (wall clock, CPU) time of a function call, for per-item statistics where a whole stage record is too heavy
+def timed_call(function, *args, **kwargs):
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - wall_start, time.process_time() - cpu_start
+
+#numpy scalars (tract codes, counts, ...) are written as the plain numbers they hold
+def _to_json(value):
+    if(hasattr(value, 'item')):
+        return value.item()
+    raise TypeError("%s is not JSON serializable" %type(value).__name__)
+
+#write REPORT to a JSON file, with a summary of the slowest stages and the slowest top_tracts tracts
+def write_report(path, REPORT, top_tracts=20):
+    REPORT = dict(REPORT)
+    REPORT['finished'] = datetime.now().isoformat(timespec='seconds')
+    REPORT['total_wall_s'] = sum(stage['wall_s'] for stage in REPORT['stages'])
+    REPORT['slowest_stages'] = [stage['name'] for stage in sorted(REPORT['stages'], key=lambda stage: -stage['wall_s'])]
+    REPORT['slowest_tracts'] = sorted(REPORT['tracts'], key=lambda tract: -tract.get('wall_s', 0.0))[:top_tracts]
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(REPORT, f, indent=2, default=_to_json)
+    os.replace(tmp_path, path)
+    return path
@@ -0,0 +1,100 @@
+#Author(s)     : Pedro Espino (pespino@berkeley.edu)
+#Licence       : GPLv3
+
+# This module parses the listing pages of supermarketpage.com as they are downloaded. The html is fed, a chunk at a time,
+# into an event-based parser (html.parser) which only keeps the table row it is currently in, and every row with an address,
+# a state and a zipcode is handed out through a generator as soon as the row closes. Nothing holds the whole page, so the
+# memory used per page stays constant, and parsing runs while the rest of the page is still arriving. Rows are read by their
+# cells rather than by splitting the raw html, so changes in attributes, whitespace or nested tags do not break the parsing.
+
+import codecs
+from collections import deque
+from html.parser import HTMLParser
+
+#read a response (or any file-like object) chunk_size bytes at a time
+def iter_response_chunks(response, chunk_size=65536):
+    while True:
+        chunk = response.read(chunk_size)
+        if(not chunk):
+            return
+        yield chunk
+
+#html parser that queues the links of a page and the text of the cells of each table row as the html is fed to it
+class ListingParser(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.links = deque()
+        self.rows = deque()
+        self._cells = None
+        self._cell_text = None
+
+    def handle_starttag(self, tag, attrs):
+        if(tag=='a'):
+            href = dict(attrs).get('href')
+            if(href):
+                self.links.append(href)
+        elif(tag=='tr'):
+            self._close_row()
+            self._cells = []
+        elif(tag in ('td', 'th')):
+            self._close_cell()
+            if(self._cells is None):
+                self._cells = []
+            self._cell_text = []
+
+    def handle_endtag(self, tag):
+        if(tag in ('td', 'th')):
+            self._close_cell()
+        elif(tag in ('tr', 'table')):
+            self._close_row()
+
+    def handle_data(self, data):
+        if(self._cell_text is not None):
+            self._cell_text.append(data)
+
+    def close(self):
+        super().close()
+        self._close_row()
+
+    def _close_cell(self):
+        if(self._cell_text is not None):
+            self._cells.append(' '.join(''.join(self._cell_text).split()))
+            self._cell_text = None
+
+    def _close_row(self):
+        self._close_cell()
+        if(self._cells):
+            self.rows.append(self._cells)
+        self._cells = None
+
+#feed chunks of html bytes into a parser, yielding after each chunk so that the queued links and rows can be handed out
+def _feed_chunks(parser, chunks, encoding='utf-8'):
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    for chunk in chunks:
+        parser.feed(decoder.decode(chunk))
+        yield
+    parser.feed(decoder.decode(b'', final=True))
+    parser.close()
+    yield
+
+#links to the listing pages (.htm) in a stream of html chunks from a state page
+def iter_store_links(chunks, encoding='utf-8'):
+    parser = ListingParser()
+    for _ in _feed_chunks(parser, chunks, encoding):
+        while parser.links:
+            link = parser.links.popleft()
+            if(link.endswith('htm')):
+                yield link
+        parser.rows.clear()
+
+#(address, state, zipcode) records in a stream of html chunks from a listing page. A record is a row cell holding state,
+#preceded by the address cell and followed by the zipcode cell. With zipcodes, only the records in one of them are kept
+def iter_listing_records(chunks, zipcodes=None, state='NY', encoding='utf-8'):
+    parser = ListingParser()
+    for _ in _feed_chunks(parser, chunks, encoding):
+        parser.links.clear()
+        while parser.rows:
+            cells = parser.rows.popleft()
+            for j in range(1, len(cells)-1):
+                if(cells[j]==state and (zipcodes is None or cells[j+1] in zipcodes)):
+                    yield cells[j-1], cells[j], cells[j+1]
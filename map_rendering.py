@@ -0,0 +1,50 @@
+#Author(s)     : Pedro Espino (pespino@berkeley.edu)
+#Licence       : GPLv3
+
+# This module draws the choropleth maps of NYC census tracts. Instead of one ax.fill call per polygon (thousands of separate
+# artists, each written to the PDF on its own), all of the polygons on an axis are drawn as a single PolyCollection with one
+# face colour per polygon, computed from the normalized data arrays in one go. Stores are drawn with one scatter per store set.
+# Maps can also be saved as low resolution PNGs through the raster (Agg) backend for quick draft renders.
+
+import os
+import numpy as np
+import matplotlib
+from matplotlib.collections import PolyCollection
+
+#colours for each polygon from a colour map and normalization of the data values. Polygons in mask (parks, cemeteries, ...)
+#get mask_color instead, and every colour gets the alpha of its polygon (alpha for data, mask_alpha for masked polygons)
+def polygon_colors(cmap, norm, values, alpha=1.0, mask=None, mask_color='black', mask_alpha=1.0):
+    values = np.asarray(values, dtype=float)
+    colors = np.asarray(cmap(norm(np.ma.masked_invalid(values))), dtype=float).reshape(-1, 4)
+    colors[:,3] = alpha
+    if(mask is not None):
+        mask = np.asarray(mask, dtype=bool)
+        colors[mask] = matplotlib.colors.to_rgba(mask_color, mask_alpha)
+    return colors
+
+#draw a list of polygons ((N, 2) arrays of x, y vertices) on an axis as a single PolyCollection with the given RGBA colours.
+#The edges get the face colours, as with ax.fill
+def draw_polygons(ax, POLYGONS, colors, rasterized=False, **kwargs):
+    colors = matplotlib.colors.to_rgba_array(colors)
+    if(len(colors)==1 and len(POLYGONS)>1):
+        colors = np.repeat(colors, len(POLYGONS), axis=0)
+    collection = PolyCollection(POLYGONS, facecolors=colors, edgecolors=colors, **kwargs)
+    collection.set_rasterized(rasterized)
+    ax.add_collection(collection)
+    ax.autoscale_view()
+    return collection
+
+#draw a set of stores ((N, 2) array of [longitude, latitude]) on an axis with a single scatter call
+def draw_points(ax, coords, **kwargs):
+    coords = np.asarray(coords, dtype=float).reshape(-1, 2)
+    return ax.scatter(coords[:,0], coords[:,1], **kwargs)
+
+#save a map to path. Draft renders go through the raster (Agg) backend into a low resolution PNG next to path instead,
+#returns the path that was written
+def save_map(fig, path, draft=False, draft_dpi=72):
+    if(draft):
+        path = os.path.splitext(path)[0] + '_draft.png'
+        fig.savefig(path, dpi=draft_dpi)
+    else:
+        fig.savefig(path)
+    return path
@@ -4,35 +4,23 @@
 # This script pulls a list of supermarket locations from supermarketpage.com, a third party website listing stores across the US.
 # After scraping that page for supermarket locations in NY, it cross-references the addresses with a list of NYC zipcodes, to parse
 # into a list of NYC supermarkets. It then queries Bing Maps to find the supermarket latitude and longitude. A Bing Maps API key is required.
+# Geocoded addresses are kept in an SQLite cache, so only addresses not seen in previous runs are sent to Bing Maps.
+# The inputs and settings are set from the command line (see python pull_supermarkets_from_web.py --help), for example
+#     python pull_supermarkets_from_web.py --query-bing --bing-key YOUR_KEY
 
 #IMPORT THE LIBRARIES
+import argparse
 import os
-from os.path import exists
-import numpy.ma as ma
-import pandas
 import numpy as np
 
-import geocoder
+#URL fetching and parsing (asyncio, over a pool of keep-alive connections)
+import asyncio
+from async_scraper import DEFAULT_BASE_URL, scrape_supermarkets
 
-#SET THE BING MAPS API KEY
-API_key='Place Bing Maps API key here! If you would like to use one but cannot create one, please contact me at pe7868@princeton.edu'
+from food_stores import load_nyc_zipcodes
+from geocoding_cache import open_geocode_cache, geocode_addresses, bing_provider
+from food_desert_swamp_indices import ZIPCODE_CSV, WEB_SUPERMARKETS_FILE
 
-#Do you want to query Bing Maps API to get the coordinates for each address?
-query_bing=False
-if(query_bing):
-    f_supermarket_results=open("SUPERMARKET_ADDRESSES_AND_COORDINATES_WEB","w")
-    f_supermarket_results.write("#INFORMATION ON SUPERMARKETS IN NYC - PARSED FROM http://supermarketpage.com/supermarkets and Bing maps API\n")
-    f_supermarket_results.write("#ADDRESS, LATITUDE, LONGITUDE\n")
-
-#URL parsing libraries
-import re
-from urllib.request import Request, urlopen
-
-#Define a function for grabbing the raw page content
-def get_page_content(url, head):
-
-    req = Request(url, headers=head)
-    return urlopen(req)
 #the following helps with sites that block automated scraping
 head = {
     "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_14_6) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/99.0.4844.84 Safari/537.36",
@@ -45,70 +33,72 @@ head = {
     "cookie": """your cookie value ( you can get that from your web page) """,
 }
 
-#import the zipcode data
-zipcode_dataframe = pandas.read_csv('PATH_TO_ZIPCODE_DATABASE')
-#Get all NYC Zipcodes - useful for things later on
-ZCTA = np.asarray(zipcode_dataframe['ZCTA'])
-NYC_ZIPCODES=[]
-for i in range(0, len(ZCTA)-1):
-    for j in range(0, len(ZCTA[i].split(','))):
-        zipcode=ZCTA[i].split(',')[j].strip()
-        NYC_ZIPCODES.append(zipcode)
-
-#SCRAPE AND PARSE SUPERMARKET PAGE 
-metasite_url = "http://supermarketpage.com/state/NY/"
-
-#pull the meta site data and html
-metasites_data = get_page_content(metasite_url,head).read()
-metasites_data_html = metasites_data.decode("utf-8")
-metasites_data_html_bytes = metasites_data_html.split('href="')
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description="Scrape the NYC supermarkets from supermarketpage.com and geocode them with Bing Maps")
+    parser.add_argument('--zipcodes', default=ZIPCODE_CSV, help="NYC zipcodes (MODZCTA)")
+    #point the base url at another server, e.g. a local copy of the site, to crawl that instead
+    parser.add_argument('--base-url', default=DEFAULT_BASE_URL, help="site the supermarket listings are scraped from")
+    parser.add_argument('--max-concurrency', type=int, default=8, help="number of pages fetched at once")
+    parser.add_argument('--retries', type=int, default=3, help="how many times a failed page is retried")
+    #Do you want to query Bing Maps API to get the coordinates for each address?
+    parser.add_argument('--query-bing', action='store_true', help="look up the coordinates of each address with Bing Maps")
+    parser.add_argument('--bing-key', default=None, help="Bing Maps API key (needed with --query-bing)")
+    #cache of geocoded addresses, and the batch size, number of threads and calls per second for the addresses not in it
+    parser.add_argument('--geocode-cache', default="GEOCODE_CACHE.sqlite", help="SQLite cache of geocoded addresses")
+    parser.add_argument('--geocode-batch-size', type=int, default=50, help="addresses sent to Bing Maps per batch")
+    parser.add_argument('--geocode-concurrency', type=int, default=4, help="number of threads querying Bing Maps")
+    parser.add_argument('--geocode-rate-limit', type=float, default=5.0, help="Bing Maps calls per second")
+    parser.add_argument('--output', default=WEB_SUPERMARKETS_FILE, help="file the supermarket addresses and coordinates are written to")
+    args = parser.parse_args(argv)
+    if(args.query_bing and args.bing_key is None):
+        parser.error("--query-bing needs a Bing Maps API key (--bing-key)")
+    return args
 
-#make empty arrays in which to store things
-supermarket_websites=[]
-SUPERMARKET_ADDRESSES_web=[]
-SUPERMARKET_ZIPCODES_web=[]
-SUPERMARKET_ADDNUMS_web=[]
-SUPERMARKET_COORDS_web=[]
-print("parsing list of NYC supermarkets from the web:\n")
-for i in range(0, len(metasites_data_html_bytes)):
-    nested_site=metasites_data_html_bytes[i].split('>')[0][:-1]
-    #parse things based on structure of html
-    if(nested_site[-3:]=='htm'):
-        supermarket_websites.append(nested_site)
-        market_data = get_page_content(nested_site, head).read()
-        market_html = market_data.decode("utf-8")
-        market_html_bytes=market_html.split('</td><td>')
-        for j in range(0, len(market_html_bytes)):
-            #keep the supermarkets in NY state
-            if market_html_bytes[j]=='NY':
-                zipcode=market_html_bytes[j+1]
-                borough=market_html_bytes[j-1].split(' ')[-2][:-1]
-                #keep the supermarkets in NYC 
-                if zipcode in NYC_ZIPCODES:
-                    #joing things to make a full address and store it in the proper array
-                    full_address = ' '.join(map(str, [market_html_bytes[j-1], market_html_bytes[j], market_html_bytes[j+1]]))
-                    SUPERMARKET_ADDRESSES_web.append(full_address.upper())
-                    SUPERMARKET_ADDNUMS_web.append(full_address.split(' ')[0])
-                    SUPERMARKET_ZIPCODES_web.append(zipcode)
-                    print(full_address)
-                    #if Bing query is true, then search Bing Maps for the address and grab the coordinates
-                    if(query_bing==1):
-                        print("Querying Bing...")
-                        long_lat_mont = [-73.89523018917087, 40.847372509635]
+#scrape the NYC supermarkets, returns their full (upper case) addresses
+def scrape_nyc_supermarkets(args):
+    #import the zipcode data and get all NYC Zipcodes - useful for things later on
+    NYC_ZIPCODES = load_nyc_zipcodes(args.zipcodes)
+    SUPERMARKET_ADDRESSES_web=[]
+    print("parsing list of NYC supermarkets from the web:\n")
+    #fetch and parse the listing pages of NY state, keeping the supermarkets in NYC
+    NYC_SUPERMARKETS_web, supermarket_websites = asyncio.run(scrape_supermarkets(NYC_ZIPCODES, base_url=args.base_url, state='NY', headers=head,
+                                                                                max_concurrency=args.max_concurrency, retries=args.retries))
+    for address, state, zipcode in NYC_SUPERMARKETS_web:
+        #joing things to make a full address and store it in the proper array
+        full_address = ' '.join([address, state, zipcode])
+        SUPERMARKET_ADDRESSES_web.append(full_address.upper())
+        print(full_address)
+    return SUPERMARKET_ADDRESSES_web
 
-                        geocode_bing = geocoder.bing('%s'%full_address, key=API_key)
-                        try:
-                            checktype = geocode_bing.type
-                            print("COULD NOT FIND ADDRESS COORDINATES... USING DEFAULT ADDRESS")
-                            long_lat_mont = [0.0, 0.0]
-                        except:
-                            latlong_results = geocode_bing.json
-                            long_lat_mont = [latlong_results['lng'], latlong_results['lat']]
-                            print("ADDRESS COORDS: ", latlong_results['lat'], latlong_results['lng'])
+#look up the coordinates of each address (through the cache, then Bing Maps) and write the addresses that were found to
+#args.output. The file is written to a temporary file first, so an interrupted run leaves the previous one in place
+def geocode_nyc_supermarkets(args, SUPERMARKET_ADDRESSES_web):
+    print("Querying Bing...")
+    geocode_cache = open_geocode_cache(args.geocode_cache)
+    GEOCODED_COORDS, number_of_calls = geocode_addresses(SUPERMARKET_ADDRESSES_web, geocode_cache, bing_provider(args.bing_key),
+                                                         batch_size=args.geocode_batch_size, max_concurrency=args.geocode_concurrency,
+                                                         rate_limit=args.geocode_rate_limit)
+    geocode_cache.close()
+    print("%d Bing Maps queries for %d addresses" %(number_of_calls, len(SUPERMARKET_ADDRESSES_web)))
+    tmp_path = args.output + '.tmp'
+    with open(tmp_path, "w") as f_supermarket_results:
+        f_supermarket_results.write("#INFORMATION ON SUPERMARKETS IN NYC - PARSED FROM http://supermarketpage.com/supermarkets and Bing maps API\n")
+        f_supermarket_results.write("#ADDRESS, LATITUDE, LONGITUDE\n")
+        for full_address, long_lat_mont in zip(SUPERMARKET_ADDRESSES_web, GEOCODED_COORDS):
+            #addresses that could not be found are left out, rather than placed at [0.0, 0.0]
+            if(np.isnan(long_lat_mont).any()):
+                print("COULD NOT FIND ADDRESS COORDINATES FOR %s" %full_address)
+                continue
+            print("ADDRESS COORDS: ", long_lat_mont[1], long_lat_mont[0])
+            f_supermarket_results.write("%s, %s, %s\n" %(full_address, str(long_lat_mont[1]), str(long_lat_mont[0])))
+    os.replace(tmp_path, args.output)
 
-                        SUPERMARKET_COORDS_web.append([long_lat_mont[1], long_lat_mont[0]])
-                        f_supermarket_results.write("%s, %s, %s\n" %(full_address.upper(), str(long_lat_mont[1]), str(long_lat_mont[0])))
+def main(argv=None):
+    args = parse_arguments(argv)
+    SUPERMARKET_ADDRESSES_web = scrape_nyc_supermarkets(args)
+    if(args.query_bing):
+        geocode_nyc_supermarkets(args, SUPERMARKET_ADDRESSES_web)
+    print("\nDone. %d supermarkets found" %(len(SUPERMARKET_ADDRESSES_web)))
 
-print("\nDone. %d supermarkets found" %(len(SUPERMARKET_ADDRESSES_web)))
-if(query_bing):
-    f_supermarket_results.close()
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,276 @@
+#Author(s)     : Pedro Espino (pespino@berkeley.edu)
+#Licence       : GPLv3
+
+# This script runs a local HTTP service which answers food access queries for points and census tracts. The tracts, consumer
+# data and stores are read once at startup (as in food_desert_swamp_indices.py), the indices of every tract are computed once,
+# and the store KD-trees and a tree of the tract geometries are kept in memory, so each query only costs a few tree lookups.
+# Points get the number of supermarkets and bodegas within walking and driving distance of the point itself, combined with the
+# vehicle fraction and population of the tract it falls in through the same formula as the tract indices. What-if queries
+# return the change of the indices of every tract affected by opening or closing stores (see whatif_simulator.py), removed
+# stores are given by the coordinates of existing ones. Responses are JSON:
+#     GET  /point?lon=-73.90&lat=40.85                         indices at a point, and the tract it falls in
+#     GET  /tract?boroct2010=2000100                           indices of a census tract
+#     POST /batch  {"points": [[lon, lat], ...], "tracts": [2000100, ...]}
+#     POST /whatif {"add": {"supermarkets": [[lon, lat], ...], "bodegas": [...]}, "remove": {"supermarkets": [...], "bodegas": [...]}}
+#     GET  /health
+# For example
+#     python query_service.py --boroughs Bronx Brooklyn --port 8050 --workers 4
+
+import argparse
+import json
+import sys
+import time
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+import numpy as np
+
+from food_desert_swamp_indices import NYC_BOROUGHS, add_input_arguments, load_inputs, distances_in_degrees, make_tract_tasks
+from instrumentation import new_report, timed_stage
+from store_counting import build_store_tree
+from batch_scoring import make_tract_data, score_points
+from whatif_simulator import COUNT_COLUMNS, build_whatif_state, simulate_changes
+
+#NaN (e.g. the desert index of a point outside every tract) is written as null
+def _json_number(value):
+    value = float(value)
+    return value if np.isfinite(value) else None
+
+#the summary of every tract task by BoroCT2010 code. The indices of the tracts which are not parks or cemeteries are those of
+#the what-if state before any change, which sums the store counts over the same sample points as tract_indices, so the
+#tracts are only sampled once
+def tract_summaries(INPUTS, TASKS, WHATIF):
+    GEO_TABLE = INPUTS['GEO_TABLE']
+    POSITIONS = {int(tract_index): k for k, tract_index in enumerate(WHATIF['tract_index'])}
+    SUMMARIES = {}
+    for task in TASKS:
+        tract_index = task[0]
+        SUMMARY = {'boroname': GEO_TABLE['BoroName'][tract_index], 'boroct2010': int(GEO_TABLE['BoroCT2010'][tract_index]),
+                   'ntacode': GEO_TABLE['NTACode'][tract_index],
+                   'vehicle_fraction': float(INPUTS['GEO_VEHICLE_FRACTION'][tract_index]),
+                   'population': float(INPUTS['GEO_POPULATION'][tract_index]),
+                   'park': True, 'food_access_ind': None, 'number_of_bodegas': None, 'food_desert_index': None, 'food_swamp_index': None}
+        if(tract_index in POSITIONS):
+            SUMMARY['park'] = False
+            for key in ('food_access_ind', 'number_of_bodegas', 'food_desert_index', 'food_swamp_index'):
+                SUMMARY[key] = _json_number(WHATIF[key][POSITIONS[tract_index]])
+        SUMMARIES[SUMMARY['boroct2010']] = SUMMARY
+    return SUMMARIES
+
+#load everything a query needs: the store KD-trees, the tract tree and the indices of every tract, returns the service state
+def build_service_state(args, INPUTS, RUN_REPORT, workers=1):
+    GEO_TABLE = INPUTS['GEO_TABLE']
+    resolution, walking_distance, driving_distance = distances_in_degrees(args)
+    STATE = {'walking_distance': walking_distance, 'driving_distance': driving_distance}
+    with timed_stage(RUN_REPORT, "build_spatial_indexes") as stage:
+        STATE['supermarket_tree'] = build_store_tree(INPUTS['SUPERMARKET_COORDS'])
+        STATE['bodega_tree'] = build_store_tree(INPUTS['BODEGA_COORDS'])
+        STATE['tract_data'] = make_tract_data(INPUTS)
+        stage['items'] = len(GEO_TABLE['geometry'])
+
+    print("Computing the indices of every census tract")
+    with timed_stage(RUN_REPORT, "compute_tract_indices") as stage:
+        TRACT_TASKS = make_tract_tasks(INPUTS, args.boroughs)
+        #the store counts at the sample points of every tract, patched by what-if queries, also give the tract indices
+        STATE['whatif'] = build_whatif_state(TRACT_TASKS, INPUTS['SUPERMARKET_COORDS'], INPUTS['BODEGA_COORDS'], resolution,
+                                             walking_distance, driving_distance, workers=workers)
+        STATE['tracts'] = tract_summaries(INPUTS, TRACT_TASKS, STATE['whatif'])
+        stage['items'] = len(TRACT_TASKS)
+    return STATE
+
+#the indices at a batch of points, one dict per point (see batch_scoring.score_points). Points outside every tract have no
+#population (so no desert index) and count no vehicles, as tracts without car access data do
+def query_points(STATE, lons, lats):
+    lons = np.asarray(lons, dtype=float).ravel()
+    lats = np.asarray(lats, dtype=float).ravel()
+    SCORES = score_points(lons, lats, STATE['supermarket_tree'], STATE['bodega_tree'], STATE['walking_distance'],
+                          STATE['driving_distance'], TRACT_DATA=STATE['tract_data'])
+    RESULTS=[]
+    for k in range(len(lons)):
+        RESULTS.append({'lon': float(lons[k]), 'lat': float(lats[k]),
+                        'supermarkets_walking': int(SCORES['supermarkets_walking'][k]),
+                        'supermarkets_driving': int(SCORES['supermarkets_driving'][k]),
+                        'food_access_ind': _json_number(SCORES['food_access_ind'][k]),
+                        'number_of_bodegas': int(SCORES['bodegas_walking'][k]),
+                        'food_desert_index': _json_number(SCORES['food_desert_index'][k]),
+                        'food_swamp_index': _json_number(SCORES['food_swamp_index'][k]),
+                        'tract': _tract_copy(STATE['tracts'].get(int(SCORES['boroct2010'][k])))})
+    return RESULTS
+
+#a copy of a tract summary (None stays None), so responses never share the state's dicts
+def _tract_copy(SUMMARY):
+    return None if SUMMARY is None else dict(SUMMARY)
+
+#the indices of a batch of census tracts (BoroCT2010 codes), None for the codes which are not loaded
+def query_tracts(STATE, codes):
+    return [_tract_copy(STATE['tracts'].get(int(code))) for code in codes]
+
+#the change of the indices of every tract affected by opening the stores in ADD and closing the ones in REMOVE (dicts of
+#[lon, lat] lists by 'supermarkets' and 'bodegas'), one dict per tract
+def query_whatif(STATE, ADD, REMOVE):
+    CHANGES = simulate_changes(STATE['whatif'], add_supermarkets=ADD.get('supermarkets') or [], remove_supermarkets=REMOVE.get('supermarkets') or [],
+                               add_bodegas=ADD.get('bodegas') or [], remove_bodegas=REMOVE.get('bodegas') or [])
+    RESULTS=[]
+    for k, tract_index in enumerate(CHANGES['tract_index']):
+        SUMMARY = STATE['tracts'][int(STATE['tract_data']['boroct2010'][tract_index])]
+        RESULTS.append({'boroname': SUMMARY['boroname'], 'boroct2010': SUMMARY['boroct2010'],
+                        'count_changes': {key: int(CHANGES['count_changes'][k,column]) for column, key in enumerate(COUNT_COLUMNS)},
+                        'food_desert_index_before': _json_number(CHANGES['food_desert_index_before'][k]),
+                        'food_desert_index': _json_number(CHANGES['food_desert_index'][k]),
+                        'food_desert_index_delta': _json_number(CHANGES['food_desert_index_delta'][k]),
+                        'food_swamp_index_before': _json_number(CHANGES['food_swamp_index_before'][k]),
+                        'food_swamp_index': _json_number(CHANGES['food_swamp_index'][k]),
+                        'food_swamp_index_delta': _json_number(CHANGES['food_swamp_index_delta'][k])})
+    return RESULTS
+
+#=======================================================================
+#  _    _ _______ _______ _____
+# | |  | |__   __|__   __|  __ \
+# | |__| |  | |     | |  | |__) |
+# |  __  |  | |     | |  |  ___/
+# | |  | |  | |     | |  | |
+# |_|  |_|  |_|     |_|  |_|
+#=======================================================================
+#error answered with an HTTP status and a JSON message
+class QueryError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+#a single float query parameter
+def _float_parameter(QUERY, name):
+    try:
+        return float(QUERY[name][0])
+    except (KeyError, ValueError):
+        raise QueryError(400, "a numeric '%s' parameter is needed" %name)
+
+#answer a request for path with its query string (and the decoded JSON body of a POST), returns the JSON response as a dict
+def answer_request(STATE, method, path, query, BODY=None, max_batch=10000):
+    QUERY = parse_qs(query)
+    if(method=='GET' and path=='/health'):
+        return {'status': 'ok', 'tracts': len(STATE['tracts']), 'supermarkets': int(STATE['supermarket_tree'].n),
+                'bodegas': int(STATE['bodega_tree'].n)}
+    if(method=='GET' and path=='/point'):
+        return query_points(STATE, [_float_parameter(QUERY, 'lon')], [_float_parameter(QUERY, 'lat')])[0]
+    if(method=='GET' and path=='/tract'):
+        try:
+            code = int(QUERY['boroct2010'][0])
+        except (KeyError, ValueError):
+            raise QueryError(400, "an integer 'boroct2010' parameter is needed")
+        SUMMARY = query_tracts(STATE, [code])[0]
+        if(SUMMARY is None):
+            raise QueryError(404, "census tract %d is not loaded" %code)
+        return SUMMARY
+    if(method=='POST' and path=='/batch'):
+        if(not isinstance(BODY, dict)):
+            raise QueryError(400, "the body should be a JSON object with 'points' and/or 'tracts'")
+        POINTS = BODY.get('points') or []
+        CODES = BODY.get('tracts') or []
+        try:
+            if(not isinstance(POINTS, list) or not isinstance(CODES, list)):
+                raise QueryError(400, "'points' and 'tracts' should be lists")
+            if(len(POINTS)+len(CODES)>max_batch):
+                raise QueryError(413, "at most %d points and tracts can be queried at once" %max_batch)
+            points = np.asarray(POINTS, dtype=float).reshape(-1, 2)
+            codes = [int(code) for code in CODES]
+        except (TypeError, ValueError):
+            raise QueryError(400, "points should be [longitude, latitude] pairs and tracts BoroCT2010 codes")
+        return {'points': query_points(STATE, points[:,0], points[:,1]), 'tracts': query_tracts(STATE, codes)}
+    if(method=='POST' and path=='/whatif'):
+        if(not isinstance(BODY, dict) or not isinstance(BODY.get('add') or {}, dict) or not isinstance(BODY.get('remove') or {}, dict)):
+            raise QueryError(400, "the body should be a JSON object with 'add' and/or 'remove' objects of 'supermarkets' and 'bodegas'")
+        ADD = BODY.get('add') or {}
+        REMOVE = BODY.get('remove') or {}
+        try:
+            if(sum(len(STORES.get(kind) or []) for STORES in (ADD, REMOVE) for kind in ('supermarkets', 'bodegas'))>max_batch):
+                raise QueryError(413, "at most %d stores can be added or removed at once" %max_batch)
+            return {'tracts': query_whatif(STATE, ADD, REMOVE)}
+        except TypeError:
+            raise QueryError(400, "stores should be [longitude, latitude] pairs")
+    raise QueryError(404, "unknown endpoint %s %s" %(method, path))
+
+#request handler class answering queries from STATE
+def make_handler(STATE, max_batch=10000, max_body_bytes=1<<24, verbose=False):
+    class QueryHandler(BaseHTTPRequestHandler):
+        #keep connections open between requests, and send small responses right away
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+
+        def _respond(self, method):
+            start = time.perf_counter()
+            url = urlsplit(self.path)
+            try:
+                BODY = None
+                if(method=='POST'):
+                    length = int(self.headers.get('Content-Length') or 0)
+                    if(length>max_body_bytes):
+                        self.close_connection = True
+                        raise QueryError(413, "request body too large")
+                    try:
+                        BODY = json.loads(self.rfile.read(length) or b'null')
+                    except ValueError:
+                        raise QueryError(400, "the body is not valid JSON")
+                RESPONSE = answer_request(STATE, method, url.path, url.query, BODY, max_batch=max_batch)
+                status = 200
+            except QueryError as error:
+                RESPONSE, status = {'error': str(error)}, error.status
+            except ValueError as error:
+                RESPONSE, status = {'error': str(error)}, 400
+            except Exception:
+                #anything else is logged and answered, so no request drops the connection without a response
+                sys.stderr.write("Error answering %s %s\n%s" %(method, self.path, traceback.format_exc()))
+                RESPONSE, status = {'error': "internal error"}, 500
+            #the time goes on a new dict, never on the one answer_request returned
+            if(isinstance(RESPONSE, dict)):
+                RESPONSE = dict(RESPONSE, compute_ms=1e3*(time.perf_counter() - start))
+            payload = json.dumps(RESPONSE).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            self._respond('GET')
+
+        def do_POST(self):
+            self._respond('POST')
+
+        def log_message(self, format, *args):
+            if(verbose):
+                super().log_message(format, *args)
+    return QueryHandler
+
+#HTTP server answering queries from STATE, one thread per connection (call serve_forever() on it)
+def make_server(STATE, host='127.0.0.1', port=8050, max_batch=10000, verbose=False):
+    server = ThreadingHTTPServer((host, port), make_handler(STATE, max_batch=max_batch, verbose=verbose))
+    server.daemon_threads = True
+    return server
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description="Serve food access queries for points and NYC census tracts over HTTP")
+    add_input_arguments(parser, boroughs=NYC_BOROUGHS)
+    parser.add_argument('--host', default='127.0.0.1', help="address to listen on")
+    parser.add_argument('--port', type=int, default=8050, help="port to listen on")
+    parser.add_argument('--workers', type=int, default=1, help="number of threads for the store counts of the startup index computation (-1 uses every CPU)")
+    parser.add_argument('--max-batch', type=int, default=10000, help="largest number of points and tracts in a batch request")
+    parser.add_argument('--verbose', action='store_true', help="log every request")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_arguments(argv)
+    RUN_REPORT = new_report('query_service')
+    INPUTS = load_inputs(args, RUN_REPORT)
+    STATE = build_service_state(args, INPUTS, RUN_REPORT, workers=args.workers)
+    print("Ready in %.1f s" %sum(stage['wall_s'] for stage in RUN_REPORT['stages']))
+    server = make_server(STATE, args.host, args.port, max_batch=args.max_batch, verbose=args.verbose)
+    print("Serving food access queries on http://%s:%d" %server.server_address[:2])
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == '__main__':
+    main()
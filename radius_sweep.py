@@ -0,0 +1,116 @@
+#Author(s)     : Pedro Espino (pespino@berkeley.edu)
+#Licence       : GPLv3
+
+# This module computes the Food Desert and Food Swamp Indices for many walking distances, driving distances and vehicle
+# fraction assumptions in a single pass, instead of one run per combination. Each tract is sampled once (on the same grid as
+# tract_indices), the stores within the largest radius of every sample point are found once along with their distances, and
+# each distance is placed among the sorted radii of the sweep by binary search. Cumulative sums over the radii then give the
+# number of stores within every radius at once. The per-tract averages are combined into a cube of indices with one axis per
+# swept quantity: (tract, walking distance, driving distance, vehicle fraction scale).
+
+import os
+import numpy as np
+import shapely
+from scipy.spatial import cKDTree
+
+from grid_sampling import sample_geometry
+from store_counting import build_store_tree
+from tract_indices import access_indices, iterate_pool
+
+#number of stores in the tree within each of the sorted radii (in degrees) of each sample point, as an (n, number of radii)
+#integer array. The store distances are found chunk_size points at a time, up to the largest radius
+def counts_within_radii(store_tree, xps, yps, radii, chunk_size=4096):
+    xps = np.asarray(xps, dtype=float)
+    yps = np.asarray(yps, dtype=float)
+    radii = np.asarray(radii, dtype=float)
+    counts = np.zeros((len(xps), len(radii)+1), dtype=np.int64)
+    if(len(xps)==0 or store_tree.n==0 or len(radii)==0):
+        return counts[:, :len(radii)]
+    for k in range(0, len(xps), chunk_size):
+        points = np.column_stack([xps[k:k+chunk_size], yps[k:k+chunk_size]])
+        PAIRS = cKDTree(points).sparse_distance_matrix(store_tree, radii[-1], output_type='ndarray')
+        #index of the smallest radius each store is within
+        bins = np.searchsorted(radii, PAIRS['v'], side='left')
+        counts[k:k+len(points)] = np.bincount(PAIRS['i']*(len(radii)+1) + bins,
+                                              minlength=len(points)*(len(radii)+1)).reshape(len(points), -1)
+    return np.cumsum(counts, axis=1)[:, :len(radii)]
+
+#state shared by every tract handled in this process, set up by init_sweep_worker
+_SWEEP_STATE = {}
+
+#set up the store KD-trees, the sampling resolution and the sorted radii (in degrees) of the sweep for this process
+def init_sweep_worker(supermarket_coords, bodega_coords, resolution, walking_radii, driving_radii):
+    _SWEEP_STATE['supermarket_tree'] = build_store_tree(supermarket_coords)
+    _SWEEP_STATE['bodega_tree'] = build_store_tree(bodega_coords)
+    _SWEEP_STATE['resolution'] = resolution
+    _SWEEP_STATE['walking_radii'] = np.asarray(walking_radii, dtype=float)
+    _SWEEP_STATE['driving_radii'] = np.asarray(driving_radii, dtype=float)
+
+#average number of supermarkets within each walking and driving radius and of bodegas within each walking radius over the
+#sample points of a tract task (tract index, geometry, NTA code, vehicle fraction, population). Returns the tract index and
+#a dict of the averages and number of sample points, or None for parks and cemeteries (NTA codes ending in '99')
+def compute_tract_sweep(task):
+    tract_index, tract_geometry, ntacode, fraction_of_vehicles_in_ct, population_in_ct = task
+    if(ntacode[-2:]=='99'):
+        return tract_index, None
+    walking_radii = _SWEEP_STATE['walking_radii']
+    driving_radii = _SWEEP_STATE['driving_radii']
+    SAMPLES = [sample_geometry(geom, _SWEEP_STATE['resolution']) for geom in shapely.get_parts(tract_geometry)]
+    xps = np.concatenate([geom_xps for geom_xps, geom_yps in SAMPLES])
+    yps = np.concatenate([geom_yps for geom_xps, geom_yps in SAMPLES])
+    #the supermarkets are counted once for the walking and driving radii together
+    supermarket_radii, radius_ids = np.unique(np.concatenate([walking_radii, driving_radii]), return_inverse=True)
+    supermarket_counts = counts_within_radii(_SWEEP_STATE['supermarket_tree'], xps, yps, supermarket_radii)
+    bodega_counts = counts_within_radii(_SWEEP_STATE['bodega_tree'], xps, yps, walking_radii)
+    #no sample points means no accessible stores
+    supermarket_averages = supermarket_counts.mean(axis=0) if len(xps)>0 else np.zeros(len(supermarket_radii))
+    return tract_index, {'supermarkets_walking': supermarket_averages[radius_ids[:len(walking_radii)]],
+                         'supermarkets_driving': supermarket_averages[radius_ids[len(walking_radii):]],
+                         'bodegas_walking': bodega_counts.mean(axis=0) if len(xps)>0 else np.zeros(len(walking_radii)),
+                         'sample_points': len(xps)}
+
+#calculate the indices of the tract tasks for every combination of walking and driving radius (in degrees) and scale of the
+#vehicle fraction of each tract (capped at one), spreading the tracts across number_of_workers processes. Returns a dict
+#with the tract index, vehicle fraction, population and number of sample points of every tract which is not a park or
+#cemetery, the number of bodegas (tract, walking radius) and the food access, desert and swamp indices as cubes of shape
+#(tract, walking radius, driving radius, vehicle scale)
+def sweep_indices(TASKS, supermarket_coords, bodega_coords, resolution, walking_radii, driving_radii, vehicle_scales=(1.0,),
+                  number_of_workers=1, chunksize=4):
+    walking_radii = np.sort(np.asarray(walking_radii, dtype=float))
+    driving_radii = np.sort(np.asarray(driving_radii, dtype=float))
+    vehicle_scales = np.asarray(vehicle_scales, dtype=float)
+    TASKS = list(TASKS)
+    init_args = (np.asarray(supermarket_coords, dtype=float), np.asarray(bodega_coords, dtype=float), resolution,
+                 walking_radii, driving_radii)
+    if(number_of_workers is None or number_of_workers<=1):
+        init_sweep_worker(*init_args)
+        results = map(compute_tract_sweep, TASKS)
+    else:
+        results = iterate_pool(compute_tract_sweep, TASKS, init_sweep_worker, init_args, number_of_workers, chunksize)
+    TRACTS=[]
+    AVERAGES=[]
+    for task, (tract_index, averages) in zip(TASKS, results):
+        if(averages is not None):
+            TRACTS.append(task)
+            AVERAGES.append(averages)
+
+    supermarkets_walking = np.array([averages['supermarkets_walking'] for averages in AVERAGES]).reshape(-1, len(walking_radii))
+    supermarkets_driving = np.array([averages['supermarkets_driving'] for averages in AVERAGES]).reshape(-1, len(driving_radii))
+    bodegas_walking = np.array([averages['bodegas_walking'] for averages in AVERAGES]).reshape(-1, len(walking_radii))
+    vehicle_fraction = np.array([task[3] for task in TRACTS], dtype=float)
+    population = np.array([task[4] for task in TRACTS], dtype=float)
+    #every combination at once, broadcasting over (tract, walking, driving, vehicle scale)
+    food_access_ind, number_of_bodegas, food_desert_index, food_swamp_index = access_indices(
+        supermarkets_walking[:,:,None,None], supermarkets_driving[:,None,:,None], bodegas_walking[:,:,None,None],
+        np.minimum(vehicle_fraction[:,None,None,None]*vehicle_scales[None,None,None,:], 1.0), population[:,None,None,None])
+    return {'tract_index': np.array([task[0] for task in TRACTS], dtype=np.int64), 'vehicle_fraction': vehicle_fraction,
+            'population': population, 'sample_points': np.array([averages['sample_points'] for averages in AVERAGES], dtype=np.int64),
+            'walking_radii': walking_radii, 'driving_radii': driving_radii, 'vehicle_scales': vehicle_scales,
+            'number_of_bodegas': bodegas_walking, 'food_access_ind': food_access_ind,
+            'food_desert_index': food_desert_index, 'food_swamp_index': np.broadcast_to(food_swamp_index, food_access_ind.shape).copy()}
+
+#save the sweep results (a dict of arrays) to an npz file
+def save_sweep(path, SWEEP):
+    tmp_path = path + '.tmp.npz'
+    np.savez(tmp_path, **SWEEP)
+    os.replace(tmp_path, path)
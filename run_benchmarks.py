@@ -0,0 +1,176 @@
+#Author(s)     : Pedro Espino (pespino@berkeley.edu)
+#Licence       : GPLv3
+
+# This script benchmarks each stage of the analysis on synthetic data (see synthetic_data.py), so that it can be timed without
+# the original datasets: ingestion of the tracts, stores and consumer data, store classification, supermarket deduplication,
+# grid sampling, store counting (in straight lines and along the street graph), the desert and swamp index computation
+# (per-tract grid and adaptive samplers, and raster engine) and map rendering.
+# Each stage is run several times on the same inputs and every timing is written to a JSON file, along with the scale, seed
+# and software versions, so that runs on different commits can be compared to catch regressions. For example
+#     python run_benchmarks.py --scale 1 --repeat 3 --output benchmark_results.json
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas
+import scipy
+import shapely
+
+from accessibility_raster import iterate_raster_tract_indices
+from consumer_data import load_consumer_table, join_consumer_data
+from food_stores import load_nyc_zipcodes, load_nyc_food_stores, load_web_supermarkets, store_coords
+from geometry_cache import load_tract_geometries, cache_path
+from grid_sampling import sample_geometry
+from map_rendering import polygon_colors, draw_polygons, save_map
+from radius_sweep import sweep_indices
+from store_classification import apply_store_rules
+from store_counting import build_store_tree, count_stores_within
+from street_network import load_street_graph, network_count_tables
+from supermarket_dedup import combine_supermarkets
+from synthetic_data import generate_dataset
+from tract_indices import iterate_tract_indices
+
+#distances used by food_desert_swamp_indices.py (in degrees)
+conv_deg_to_km = 1e4/90.
+conv_km_to_mi = 0.6213712
+resolution = 0.15/(conv_km_to_mi*conv_deg_to_km)
+walking_distance = 0.5/(conv_km_to_mi*conv_deg_to_km)
+driving_distance = 2.0/(conv_km_to_mi*conv_deg_to_km)
+
+#run stage() repeat times, returns the wall clock time of each run and the result of the last one
+def time_stage(stage, repeat):
+    times=[]
+    for k in range(repeat):
+        start = time.perf_counter()
+        result = stage()
+        times.append(time.perf_counter() - start)
+    return times, result
+
+#software versions and the commit the benchmarks ran on
+def environment_info():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {'commit': commit, 'python': platform.python_version(), 'platform': platform.platform(), 'numpy': np.__version__,
+            'pandas': pandas.__version__, 'scipy': scipy.__version__, 'shapely': shapely.__version__,
+            'matplotlib': matplotlib.__version__, 'cpu_count': os.cpu_count()}
+
+#run every stage on the dataset in PATHS, returns a dict of stage name to a dict of its timings and the number of items it handled
+def run_stages(PATHS, repeat, out_dir, number_of_workers=1):
+    STAGES={}
+    def record(name, stage, items):
+        times, result = time_stage(stage, repeat)
+        STAGES[name] = {'times_s': times, 'min_s': min(times), 'mean_s': float(np.mean(times)), 'items': items(result)}
+        print("%-28s min %8.4f s   mean %8.4f s   (%d items)" %(name, STAGES[name]['min_s'], STAGES[name]['mean_s'], STAGES[name]['items']))
+        return result
+
+    #ingestion: parsing the tract WKT into the geometry cache, then loading from it, and reading the stores and consumer data
+    def load_tracts_cold():
+        if(os.path.exists(cache_path(PATHS['tracts']))):
+            os.remove(cache_path(PATHS['tracts']))
+        return load_tract_geometries(PATHS['tracts'])
+    record('ingest_tracts_cold', load_tracts_cold, lambda table: len(table['geometry']))
+    GEO_TABLE = record('ingest_tracts_cached', lambda: load_tract_geometries(PATHS['tracts']), lambda table: len(table['geometry']))
+    NYC_ZIPCODES = load_nyc_zipcodes(PATHS['zipcodes'])
+    NYC_FOODSTORES = record('ingest_food_stores', lambda: load_nyc_food_stores(PATHS['food_stores'], NYC_ZIPCODES), len)
+    CONSUMER_TABLE = record('ingest_consumer_data', lambda: load_consumer_table(PATHS['car_access'], PATHS['population'],
+                                                                                PATHS['percap_income']), len)
+    record('join_consumer_data', lambda: join_consumer_data(GEO_TABLE['BoroCT2010'], CONSUMER_TABLE),
+           lambda data: len(data['population']))
+    WEB_SUPERMARKETS = record('ingest_web_supermarkets', lambda: load_web_supermarkets(PATHS['web_supermarkets']), len)
+
+    #classification of the stores already read
+    record('classify_stores', lambda: apply_store_rules(NYC_FOODSTORES['name'], NYC_FOODSTORES['dbaname'], NYC_FOODSTORES['type']),
+           lambda result: len(result[1]))
+
+    #deduplication of the web and NYC Open Data supermarkets
+    BODEGA_COORDS = store_coords(NYC_FOODSTORES, NYC_FOODSTORES['is_bodega'])
+    SUPERMARKET_COORDS_NYCOD = store_coords(NYC_FOODSTORES, NYC_FOODSTORES['is_supermarket'] & ~NYC_FOODSTORES['is_bodega'])
+    SUPERMARKET_COORDS, MATCHES = record('dedup_supermarkets', lambda: combine_supermarkets(store_coords(WEB_SUPERMARKETS),
+                                                                                            SUPERMARKET_COORDS_NYCOD),
+                                         lambda result: len(result[0]))
+
+    #grid sampling of every polygon part, and the store counts at the sample points
+    PARTS = shapely.get_parts(GEO_TABLE['geometry'])
+    SAMPLES = record('grid_sampling', lambda: [sample_geometry(geom, resolution) for geom in PARTS],
+                     lambda samples: sum(len(xps) for xps, yps in samples))
+    xps = np.concatenate([xps for xps, yps in SAMPLES])
+    yps = np.concatenate([yps for xps, yps in SAMPLES])
+    supermarket_tree = build_store_tree(SUPERMARKET_COORDS)
+    bodega_tree = build_store_tree(BODEGA_COORDS)
+    record('store_counting', lambda: (count_stores_within(supermarket_tree, xps, yps, walking_distance),
+                                      count_stores_within(supermarket_tree, xps, yps, driving_distance),
+                                      count_stores_within(bodega_tree, xps, yps, walking_distance)), lambda counts: len(counts[0]))
+    STREET_GRAPH = load_street_graph(PATHS['street_graph'], conv_km_to_mi*conv_deg_to_km)
+    record('street_network_counts', lambda: network_count_tables(STREET_GRAPH, SUPERMARKET_COORDS, BODEGA_COORDS, walking_distance,
+                                                                 driving_distance), lambda counts: len(STREET_GRAPH['node_lon']))
+
+    #the desert and swamp indices of every tract, with the per-tract sampler and the city-wide rasters
+    data = join_consumer_data(GEO_TABLE['BoroCT2010'], CONSUMER_TABLE)
+    vehicle_fraction = np.where(data['has_vehicles_pct'], data['vehicles_pct']/100.0, 0.0)
+    population = np.where(data['has_population'], data['population'], 1.0)
+    TASKS = [(i, GEO_TABLE['geometry'][i], GEO_TABLE['NTACode'][i], vehicle_fraction[i], population[i]) for i in range(len(GEO_TABLE['geometry']))]
+    TRACT_RESULTS = record('tract_indices', lambda: list(iterate_tract_indices(TASKS, SUPERMARKET_COORDS, BODEGA_COORDS, resolution,
+                                                                               walking_distance, driving_distance,
+                                                                               number_of_workers=number_of_workers)), len)
+    record('tract_indices_adaptive', lambda: list(iterate_tract_indices(TASKS, SUPERMARKET_COORDS, BODEGA_COORDS, resolution/4,
+                                                                        walking_distance, driving_distance, number_of_workers=number_of_workers,
+                                                                        adaptive_tolerance=0.05)), len)
+    #the default sweep of walking and driving distances (in miles), in one pass
+    record('radius_sweep', lambda: sweep_indices(TASKS, SUPERMARKET_COORDS, BODEGA_COORDS, resolution,
+                                                 np.array([0.25, 0.5, 0.75, 1.0])/(conv_km_to_mi*conv_deg_to_km),
+                                                 np.array([1.0, 2.0, 3.0, 4.0, 5.0])/(conv_km_to_mi*conv_deg_to_km),
+                                                 number_of_workers=number_of_workers), lambda sweep: sweep['food_access_ind'].size)
+    record('tract_indices_raster', lambda: list(iterate_raster_tract_indices(TASKS, SUPERMARKET_COORDS, BODEGA_COORDS, resolution,
+                                                                             walking_distance, driving_distance)), len)
+
+    #rendering the desert index map, as a draft PNG and a full PDF
+    POLYGONS = [np.column_stack([part['xs'], part['ys']]) for i, parts in TRACT_RESULTS for part in parts]
+    DESERT_INDEX = [np.nan if part['park'] else part['food_desert_index'] for i, parts in TRACT_RESULTS for part in parts]
+    PARKS = [part['park'] for i, parts in TRACT_RESULTS for part in parts]
+    def render(draft):
+        fig, ax = plt.subplots(figsize=(8, 8))
+        draw_polygons(ax, POLYGONS, polygon_colors(matplotlib.colormaps['PiYG_r'], matplotlib.colors.LogNorm(vmin=1e1, vmax=1e5),
+                                                   DESERT_INDEX, alpha=0.75, mask=PARKS), rasterized=draft)
+        path = save_map(fig, os.path.join(out_dir, 'benchmark_map.pdf'), draft=draft)
+        plt.close(fig)
+        return path
+    record('render_map_draft', lambda: render(True), lambda path: len(POLYGONS))
+    record('render_map_pdf', lambda: render(False), lambda path: len(POLYGONS))
+    return STAGES
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the stages of the food desert / swamp analysis on synthetic data")
+    parser.add_argument('--scale', type=float, default=1.0, help="size of the synthetic dataset, in units of NYC (0.2 is about one borough)")
+    parser.add_argument('--seed', type=int, default=0, help="seed of the synthetic data generator")
+    parser.add_argument('--repeat', type=int, default=3, help="number of times each stage is run")
+    parser.add_argument('--workers', type=int, default=1, help="number of processes for the per-tract index computation")
+    parser.add_argument('--data-dir', default=None, help="directory for the synthetic data (a temporary directory by default)")
+    parser.add_argument('--output', default='benchmark_results.json', help="JSON file the results are written to")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        data_dir = args.data_dir or tmp_dir
+        print("Generating synthetic data (scale %g) in %s" %(args.scale, data_dir))
+        generate_start = time.perf_counter()
+        PATHS = generate_dataset(data_dir, scale=args.scale, seed=args.seed)
+        print("Done in %.2f s\n" %(time.perf_counter() - generate_start))
+        STAGES = run_stages(PATHS, args.repeat, data_dir, number_of_workers=args.workers)
+
+    RESULTS = {'timestamp': datetime.now().isoformat(timespec='seconds'), 'scale': args.scale, 'seed': args.seed,
+               'repeat': args.repeat, 'workers': args.workers, 'environment': environment_info(), 'stages': STAGES}
+    with open(args.output, 'w') as f:
+        json.dump(RESULTS, f, indent=2)
+    print("\nResults written to %s" %args.output)
@@ -0,0 +1,46 @@
+#Author(s)     : Pedro Espino (pespino@berkeley.edu)
+#Licence       : GPLv3
+
+# This module classifies food stores (bodegas, supermarkets, markets, ...) from a declarative set of rules. Each rule gives the
+# keywords that mark a category when they appear in the entity or DBA name of a store, the establishment types allowed for it,
+# and the categories that take precedence over it. The rules are applied to a whole table of stores at once, with the keywords
+# of each rule compiled into a single pattern, so new taxonomies can be tried out on statewide data in seconds.
+
+import re
+import numpy as np
+import pandas
+
+#acceptable store types - mainly excludes wholesale that doesn't specialize in food
+ACCEPTABLE_TYPES=['JACD', 'JACK', 'JABC', 'JABCK', 'JABCD', 'JAC', 'JAD', 'JACH', 'JABCH', 'JABHK', 'JACDK']
+
+#the rules used throughout the project, in order of precedence. 'types' of None allows any establishment type, and a store
+#matching any of the 'exclude' categories is left out of the category
+STORE_RULES=[
+    {'category': 'bodega', 'keywords': ['DELI', 'GROCER', 'BODEG'], 'types': None, 'exclude': []},
+    {'category': 'supermarket', 'keywords': ['SUPERMARKET', 'COOP'], 'types': ACCEPTABLE_TYPES, 'exclude': []},
+    {'category': 'market', 'keywords': ['SUPERMARKET', 'COOP', ' MARKET '], 'types': ACCEPTABLE_TYPES, 'exclude': ['bodega']},
+]
+
+#compile the keywords of a rule into one pattern that matches any of them
+def compile_keywords(keywords):
+    return re.compile('|'.join(re.escape(keyword) for keyword in keywords))
+
+#apply the rules to arrays of store names, DBA names and establishment types. Returns a dict with a boolean mask for every
+#category, and an array of category codes: the index in rules of the first (highest precedence) category a store is in,
+#or -1 for stores in none of them
+def apply_store_rules(names, dbanames, types, rules=STORE_RULES):
+    store_name_reference = pandas.Series(names, dtype=object).fillna('').astype(str).str.cat(
+        pandas.Series(dbanames, dtype=object).fillna('').astype(str).to_numpy(), sep='\t')
+    types = pandas.Series(types, dtype=object)
+    MASKS={}
+    for rule in rules:
+        mask = store_name_reference.str.contains(compile_keywords(rule['keywords'])).to_numpy(bool)
+        if(rule.get('types') is not None):
+            mask = mask & types.isin(rule['types']).to_numpy(bool)
+        for excluded in rule.get('exclude', []):
+            mask = mask & ~MASKS[excluded]
+        MASKS[rule['category']] = mask
+    if(len(rules)==0):
+        return MASKS, np.full(len(store_name_reference), -1, dtype=np.int8)
+    codes = np.select([MASKS[rule['category']] for rule in rules], np.arange(len(rules)), default=-1).astype(np.int8)
+    return MASKS, codes
@@ -0,0 +1,24 @@
+#Author(s)     : Pedro Espino (pespino@berkeley.edu)
+#Licence       : GPLv3
+
+# This module counts the number of stores (supermarkets, bodegas, ...) within a given radius of a batch of sample points.
+# The store coordinates are put into a KD-tree once, so that the number of stores within walking or driving distance of
+# every sample point in a census tract can be found with a single query instead of testing each store against a buffer.
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+#build a KD-tree from a list or array of [longitude, latitude] store coordinates
+def build_store_tree(store_coords):
+    store_coords = np.asarray(store_coords, dtype=float).reshape(-1, 2)
+    return cKDTree(store_coords)
+
+#count the stores in the tree within radius (in degrees) of each sample point, returns an integer array with one entry per point.
+#workers threads share the query (-1 uses every CPU), which pays off for large batches of points
+def count_stores_within(store_tree, xps, yps, radius, workers=1):
+    xps = np.asarray(xps, dtype=float)
+    yps = np.asarray(yps, dtype=float)
+    if(len(xps)==0 or store_tree.n==0):
+        return np.zeros(len(xps), dtype=int)
+    sample_points = np.column_stack([xps, yps])
+    return np.asarray(store_tree.query_ball_point(sample_points, radius, return_length=True, workers=workers), dtype=int)
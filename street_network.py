@@ -0,0 +1,130 @@
+#Author(s)     : Pedro Espino (pespino@berkeley.edu)
+#Licence       : GPLv3
+
+# This module measures store access along a street network instead of in straight lines, so that rivers, highways and rail
+# yards without crossings are no longer walked (or driven) through. The street graph is read from a local .npz file of node
+# coordinates and edges, and every store is snapped to its nearest node. Shortest paths are then run from all the store nodes
+# at once with scipy's Dijkstra, cut off at the walking or driving distance, which gives each node the number of stores within
+# reach along the streets (and the network distance to its nearest store). Edges are never shorter than the straight line
+# between their nodes, so a path within the cutoff never leaves the circle of that radius around its store, and the stores
+# are searched in groups on the part of the graph around them only. The sample points of each tract are snapped to
+# their nearest node through a KD-tree, so counting the stores around them is a lookup into the per-node counts.
+# Distances along the network are measured between the snapped nodes, the short legs from a point or store to its node are
+# left out.
+
+import os
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+from scipy.spatial import cKDTree
+
+#store the street graph in a .npz file: node coordinates (in degrees), the two end nodes of each edge and, optionally, the
+#length of each edge in miles (straight lines between the end nodes by default)
+def save_street_graph(path, node_lon, node_lat, edge_from, edge_to, edge_length_mi=None):
+    ARRAYS = {'node_lon': np.asarray(node_lon, dtype=float), 'node_lat': np.asarray(node_lat, dtype=float),
+              'edge_from': np.asarray(edge_from, dtype=np.int64), 'edge_to': np.asarray(edge_to, dtype=np.int64)}
+    if(edge_length_mi is not None):
+        ARRAYS['edge_length_mi'] = np.asarray(edge_length_mi, dtype=float)
+    tmp_path = path + '.tmp.npz'
+    np.savez(tmp_path, **ARRAYS)
+    os.replace(tmp_path, path)
+
+#read a street graph saved by save_street_graph. miles_per_degree converts the edge lengths to the degrees the rest of the
+#analysis measures distances in. Returns a dict with the node coordinates, a KD-tree of the nodes and the sparse graph
+def load_street_graph(path, miles_per_degree):
+    with np.load(path) as graph:
+        node_lon = graph['node_lon']
+        node_lat = graph['node_lat']
+        edge_from = graph['edge_from']
+        edge_to = graph['edge_to']
+        if('edge_length_mi' in graph.files):
+            edge_length = graph['edge_length_mi']/miles_per_degree
+        else:
+            edge_length = np.hypot(node_lon[edge_to]-node_lon[edge_from], node_lat[edge_to]-node_lat[edge_from])
+    return make_street_graph(node_lon, node_lat, edge_from, edge_to, edge_length)
+
+#the graph of the streets, with edge lengths in degrees (at least the straight line between their nodes). Streets are walked
+#and driven both ways, and where two nodes are joined by several edges only the shortest one is kept
+def make_street_graph(node_lon, node_lat, edge_from, edge_to, edge_length):
+    node_lon = np.asarray(node_lon, dtype=float)
+    node_lat = np.asarray(node_lat, dtype=float)
+    number_of_nodes = len(node_lon)
+    edge_from = np.asarray(edge_from, dtype=np.int64)
+    edge_to = np.asarray(edge_to, dtype=np.int64)
+    edge_length = np.maximum(np.asarray(edge_length, dtype=float),
+                             np.hypot(node_lon[edge_to]-node_lon[edge_from], node_lat[edge_to]-node_lat[edge_from]))
+    first = np.minimum(edge_from, edge_to)
+    second = np.maximum(edge_from, edge_to)
+    #sort by node pair and then by length, so the first edge of each pair is its shortest
+    order = np.lexsort((edge_length, second, first))
+    first, second, edge_length = first[order], second[order], edge_length[order]
+    keep = np.ones(len(first), dtype=bool)
+    keep[1:] = (first[1:]!=first[:-1]) | (second[1:]!=second[:-1])
+    keep &= first!=second
+    #zero lengths would be read as missing edges
+    lengths = np.maximum(edge_length[keep], 1e-12)
+    graph = csr_matrix((lengths, (first[keep], second[keep])), shape=(number_of_nodes, number_of_nodes))
+    return {'node_lon': node_lon, 'node_lat': node_lat, 'node_tree': cKDTree(np.column_stack([node_lon, node_lat])),
+            'graph': graph}
+
+#nearest node of each point
+def snap_to_nodes(node_tree, xps, yps):
+    if(len(xps)==0):
+        return np.zeros(0, dtype=np.int64)
+    return node_tree.query(np.column_stack([np.asarray(xps, dtype=float), np.asarray(yps, dtype=float)]))[1]
+
+#the nodes the stores are snapped to, with the number of stores on each
+def store_nodes(GRAPH, store_coords):
+    store_coords = np.asarray(store_coords, dtype=float).reshape(-1, 2)
+    return np.unique(snap_to_nodes(GRAPH['node_tree'], store_coords[:,0], store_coords[:,1]), return_counts=True)
+
+#network distance (in degrees) from every node to its nearest store, in one multi-source shortest path sweep (infinite for
+#nodes which cannot reach a store)
+def nearest_store_distance(GRAPH, store_coords):
+    nodes, stores_per_node = store_nodes(GRAPH, store_coords)
+    if(len(nodes)==0):
+        return np.full(GRAPH['graph'].shape[0], np.inf)
+    return dijkstra(GRAPH['graph'], directed=False, indices=nodes, min_only=True)
+
+#number of stores within radius (in degrees) of every node along the network. The store nodes are grouped into square cells,
+#and the shortest paths from the stores of each cell (chunk_size at a time) are cut off at the radius and run on the nodes
+#within radius of the cell's stores, which hold every path that short
+def network_store_counts(GRAPH, store_coords, radius, chunk_size=256):
+    node_lon = GRAPH['node_lon']
+    node_lat = GRAPH['node_lat']
+    nodes, stores_per_node = store_nodes(GRAPH, store_coords)
+    counts = np.zeros(GRAPH['graph'].shape[0], dtype=np.int64)
+    if(len(nodes)==0):
+        return counts
+    #nodes by longitude, so the nodes around a cell are found within a slice of them
+    lon_order = np.argsort(node_lon)
+    sorted_lon = node_lon[lon_order]
+    #cells hold about chunk_size store nodes on average (and are at least twice the radius across), so that the number of
+    #searches stays small whatever the radius
+    store_area = np.ptp(node_lon[nodes])*np.ptp(node_lat[nodes])
+    cell_size = max(2*radius, np.sqrt(store_area*chunk_size/len(nodes)))
+    cell_x = np.floor(node_lon[nodes]/cell_size).astype(np.int64)
+    cell_y = np.floor(node_lat[nodes]/cell_size).astype(np.int64)
+    order = np.lexsort((cell_y, cell_x))
+    nodes, stores_per_node, cell_x, cell_y = nodes[order], stores_per_node[order], cell_x[order], cell_y[order]
+    cell_starts = np.flatnonzero(np.r_[True, (cell_x[1:]!=cell_x[:-1]) | (cell_y[1:]!=cell_y[:-1]), True])
+    for start, stop in zip(cell_starts[:-1], cell_starts[1:]):
+        cell_nodes = nodes[start:stop]
+        cell_stores = stores_per_node[start:stop]
+        strip = lon_order[np.searchsorted(sorted_lon, node_lon[cell_nodes].min()-radius):
+                          np.searchsorted(sorted_lon, node_lon[cell_nodes].max()+radius, side='right')]
+        local = np.sort(strip[(node_lat[strip]>=node_lat[cell_nodes].min()-radius) & (node_lat[strip]<=node_lat[cell_nodes].max()+radius)])
+        local_graph = GRAPH['graph'][local][:,local]
+        sources = np.searchsorted(local, cell_nodes)
+        for k in range(0, len(sources), chunk_size):
+            distances = dijkstra(local_graph, directed=False, indices=sources[k:k+chunk_size], limit=radius)
+            counts[local] += cell_stores[k:k+chunk_size] @ np.isfinite(distances)
+    return counts
+
+#the per-node store counts used by the indices (supermarkets within walking and driving distance, bodegas within walking
+#distance), with the KD-tree the sample points are snapped through, as taken by tract_indices.iterate_tract_indices
+def network_count_tables(GRAPH, supermarket_coords, bodega_coords, walking_distance, driving_distance):
+    return {'node_tree': GRAPH['node_tree'],
+            'supermarkets_walking': network_store_counts(GRAPH, supermarket_coords, walking_distance),
+            'supermarkets_driving': network_store_counts(GRAPH, supermarket_coords, driving_distance),
+            'bodegas_walking': network_store_counts(GRAPH, bodega_coords, walking_distance)}
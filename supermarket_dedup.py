@@ -0,0 +1,41 @@
+#Author(s)     : Pedro Espino (pespino@berkeley.edu)
+#Licence       : GPLv3
+
+# This module combines the supermarkets scraped from the web (pull_supermarkets_from_web.py) with the ones from the NYC Open Data
+# retail food store database, without counting the same store twice. Stores from the two lists within a given distance
+# (200 ft. by default) of each other are considered duplicates. All of the matches are found with a single query between two
+# KD-trees, so several web stores can match several NYC Open Data stores and the cost stays near-linear in the list sizes.
+
+import numpy as np
+import pandas
+from scipy.spatial import cKDTree
+
+#useful conversion factors
+conv_deg_to_km = 1e4/90.
+conv_km_to_ft = 3280.84
+
+#project [longitude, latitude] coordinates onto a local flat grid in feet, with longitudes shrunk by cos(latitude) about ref_lat
+def project_to_feet(coords, ref_lat):
+    coords = np.asarray(coords, dtype=float).reshape(-1, 2)
+    conv_deg_to_ft = conv_deg_to_km*conv_km_to_ft
+    return np.column_stack([coords[:,0]*np.cos(np.radians(ref_lat))*conv_deg_to_ft, coords[:,1]*conv_deg_to_ft])
+
+#match every web supermarket against every NYC Open Data supermarket within radius_ft of it. Returns the combined coordinates
+#(all web supermarkets, followed by the NYC Open Data supermarkets that match none of them) and a report of the matches,
+#with one row per (web_index, nycod_index) pair and their distance_ft
+def combine_supermarkets(web_coords, nycod_coords, radius_ft=200.0):
+    web_coords = np.asarray(web_coords, dtype=float).reshape(-1, 2)
+    nycod_coords = np.asarray(nycod_coords, dtype=float).reshape(-1, 2)
+    all_coords = np.concatenate([web_coords, nycod_coords])
+    ref_lat = np.nanmean(all_coords[:,1]) if len(all_coords)>0 else 0.0
+    web_tree = cKDTree(project_to_feet(web_coords, ref_lat))
+    nycod_tree = cKDTree(project_to_feet(nycod_coords, ref_lat))
+    matches = web_tree.sparse_distance_matrix(nycod_tree, radius_ft, output_type='ndarray')
+    order = np.lexsort((matches['j'], matches['i']))
+    MATCH_REPORT = pandas.DataFrame({'web_index': matches['i'][order], 'nycod_index': matches['j'][order],
+                                     'distance_ft': matches['v'][order]})
+    #keep the NYC Open Data supermarkets which are not duplicates of any web supermarket
+    duplicate = np.zeros(len(nycod_coords), dtype=bool)
+    duplicate[MATCH_REPORT['nycod_index'].to_numpy()] = True
+    SUPERMARKET_COORDS_COMBINED = np.concatenate([web_coords, nycod_coords[~duplicate]])
+    return SUPERMARKET_COORDS_COMBINED, MATCH_REPORT
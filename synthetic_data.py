@@ -0,0 +1,211 @@
+#Author(s)     : Pedro Espino (pespino@berkeley.edu)
+#Licence       : GPLv3
+
+# This module generates synthetic stand-ins for every dataset the analysis reads: the census tracts (nyct2010.csv), the NYC
+# zipcodes (MODZCTA), the statewide Retail Food Stores database, the SimplyAnalytics consumer data and the web-scraped
+# supermarket list. The files have the same columns and formats as the real ones, so every script and module can run on them
+# without access to the original data. The size is set by scale, in units of NYC (scale=0.2 is about one borough, scale=10 is
+# ten times NYC), keeping the tract size and store density of the city fixed so that per-tract costs stay realistic. A street
+# graph (see street_network.py) is written too: a grid of streets with rivers between the boroughs, crossed only by bridges.
+
+import os
+import numpy as np
+import pandas
+import shapely
+
+from consumer_data import CARACCESS_COLUMN, POPULATION_COLUMN, PERCAP_INC_COLUMN
+from street_network import save_street_graph
+
+#approximate numbers for NYC at scale=1 (the number of tracts follows from the bounds and TRACT_SIZE)
+NYC_FOOD_STORES = 16000
+NYC_ZIPCODES = 180
+NYC_WEB_SUPERMARKETS = 500
+#stores outside NYC in the statewide database, per store in NYC
+UPSTATE_STORES_PER_NYC_STORE = 1.0
+#bounds of NYC, and the size of a tract (in degrees)
+NYC_BOUNDS = (-74.26, 40.49, -73.70, 40.92)
+TRACT_SIZE = 0.0106
+#separation of the streets (in degrees), and the number of streets between bridges across the rivers between boroughs
+STREET_SPACING = 0.0018
+STREETS_PER_BRIDGE = 20
+
+#borough names and codes as they appear in nyct2010.csv, and the county names used by SimplyAnalytics
+BOROUGHS = [('Manhattan', 1, 'New York'), ('Bronx', 2, 'Bronx'), ('Brooklyn', 3, 'Kings'), ('Queens', 4, 'Queens'),
+            ('Staten Island', 5, 'Richmond')]
+
+#store names by kind, and the establishment types and street names the stores are drawn from
+STORE_NAMES = {
+    'bodega': ['%s DELI', '%s GROCERY', '%s BODEGA', '%s DELI & GROCERY'],
+    'supermarket': ['%s SUPERMARKET', '%s FOOD COOP', '%s SUPERMARKET INC'],
+    'market': ['%s FRESH MARKET INC', 'THE %s MARKET CORP'],
+    'other': ['%s PHARMACY', '%s LIQUORS', '%s BAKERY', '%s CANDY STORE', '%s WHOLESALE'],
+}
+STORE_KIND_WEIGHTS = {'bodega': 0.55, 'supermarket': 0.08, 'market': 0.07, 'other': 0.30}
+STORE_TYPES = ['JAC', 'JACD', 'JABC', 'JACK', 'JAD', 'JABCK', 'JACDK', 'JBC', 'JAB', 'JAH']
+STREET_NAMES = ['BROADWAY', 'MAIN ST', 'GRAND CONCOURSE', 'FLATBUSH AVE', 'QUEENS BLVD', 'AMBOY RD', 'FULTON ST', '3RD AVE']
+NAME_STEMS = ['SUNRISE', 'GOLDEN', 'EMPIRE', 'CITY', 'LUCKY', 'PARK', 'STAR', 'FAMILY', 'CORNER', 'UNION']
+
+#bounds of the synthetic city at a given scale: NYC_BOUNDS grown about its centre so the area is scale times that of NYC
+def synthetic_bounds(scale):
+    lonmin, latmin, lonmax, latmax = NYC_BOUNDS
+    grow = np.sqrt(scale)
+    lonc, latc = (lonmin+lonmax)/2, (latmin+latmax)/2
+    return (lonc - (lonc-lonmin)*grow, latc - (latc-latmin)*grow, lonc + (lonmax-lonc)*grow, latc + (latmax-latc)*grow)
+
+#census tracts on a grid of TRACT_SIZE squares covering the bounds, with the boroughs in vertical strips. Every 10th tract
+#is split into two polygons (as for tracts across water), and every 50th is a park (NTA code ending in '99')
+def make_tracts(bounds, rng):
+    lonmin, latmin, lonmax, latmax = bounds
+    nx = max(int(round((lonmax-lonmin)/TRACT_SIZE)), 1)
+    ny = max(int(round((latmax-latmin)/TRACT_SIZE)), 1)
+    columns, rows = np.meshgrid(np.arange(nx), np.arange(ny))
+    columns = columns.ravel()
+    rows = rows.ravel()
+    #jitter the tract edges a little so that the sample grids do not line up with them
+    x0 = lonmin + columns*TRACT_SIZE + rng.uniform(0, 0.1*TRACT_SIZE, len(columns))
+    y0 = latmin + rows*TRACT_SIZE + rng.uniform(0, 0.1*TRACT_SIZE, len(rows))
+    x1 = x0 + 0.9*TRACT_SIZE
+    y1 = y0 + 0.9*TRACT_SIZE
+    GEOMETRIES=[]
+    for k in range(len(x0)):
+        if(k%10==9):
+            xm = (x0[k]+x1[k])/2
+            parts = [shapely.box(x0[k], y0[k], xm - 0.05*TRACT_SIZE, y1[k]), shapely.box(xm + 0.05*TRACT_SIZE, y0[k], x1[k], y1[k])]
+        else:
+            parts = [shapely.box(x0[k], y0[k], x1[k], y1[k])]
+        GEOMETRIES.append(shapely.MultiPolygon(parts))
+    borough = np.minimum(columns*len(BOROUGHS)//nx, len(BOROUGHS)-1)
+    #census tract codes count up within each borough
+    ct2010 = np.zeros(len(x0), dtype=np.int64)
+    for b in range(len(BOROUGHS)):
+        in_borough = borough==b
+        ct2010[in_borough] = 100*(np.arange(np.count_nonzero(in_borough))+1)
+    TRACTS = pandas.DataFrame({
+        'the_geom': shapely.to_wkt(np.array(GEOMETRIES, dtype=object), rounding_precision=7),
+        'CTLabel': ['%g' %(ct/100.) for ct in ct2010],
+        'BoroCode': [BOROUGHS[b][1] for b in borough],
+        'BoroName': [BOROUGHS[b][0] for b in borough],
+        'CT2010': ['%06d' %ct for ct in ct2010],
+        'BoroCT2010': ['%d%06d' %(BOROUGHS[b][1], ct) for b, ct in zip(borough, ct2010)],
+        'NTACode': ['%s%02d' %(BOROUGHS[b][0][:2].upper(), 99 if k%50==49 else 1 + (k//40)%98) for k, b in enumerate(borough)],
+        'NTAName': ['Neighborhood %d' %(k//40) for k in range(len(x0))],
+        'PUMA': [3700 + 100*BOROUGHS[b][1] + (k//200)%100 for k, b in enumerate(borough)],
+    })
+    return TRACTS
+
+#the MODZCTA table, with several zipcodes in some rows and a last row which is not a real zip code tabulation area
+def make_zipcodes(number_of_zipcodes):
+    zipcodes = ['%05d' %(10001 + k) for k in range(number_of_zipcodes)]
+    ZCTA = [', '.join(zipcodes[k:k+2]) if k%7==0 else zipcodes[k] for k in range(number_of_zipcodes) if k%7!=1]
+    return zipcodes, pandas.DataFrame({'MODZCTA': [z.split(',')[0] for z in ZCTA] + ['99999'], 'ZCTA': ZCTA + ['99999']})
+
+#rows of the statewide retail food store database: number_of_stores stores inside bounds with NYC zipcodes, and
+#number_of_upstate stores elsewhere in the state
+def make_food_stores(bounds, zipcodes, number_of_stores, number_of_upstate, rng):
+    total = number_of_stores + number_of_upstate
+    lonmin, latmin, lonmax, latmax = bounds
+    lon = np.concatenate([rng.uniform(lonmin, lonmax, number_of_stores), rng.uniform(-79.5, -74.5, number_of_upstate)])
+    lat = np.concatenate([rng.uniform(latmin, latmax, number_of_stores), rng.uniform(41.5, 44.5, number_of_upstate)])
+    kinds = rng.choice(list(STORE_KIND_WEIGHTS), total, p=list(STORE_KIND_WEIGHTS.values()))
+    names = [rng.choice(STORE_NAMES[kind]) %rng.choice(NAME_STEMS) for kind in kinds]
+    #the DBA name is often the same as the entity name, and sometimes missing
+    dbanames = [name if k%3 else ('' if k%2 else name.replace(' INC', '')) for k, name in enumerate(names)]
+    zips = np.concatenate([rng.choice(zipcodes, number_of_stores), ['%05d' %z for z in rng.integers(12000, 14999, number_of_upstate)]])
+    counties = [BOROUGHS[k%len(BOROUGHS)][2] for k in range(number_of_stores)] + ['Albany']*number_of_upstate
+    square_footage = np.where(kinds=='supermarket', rng.integers(5000, 60000, total), rng.integers(200, 4000, total))
+    georeference = np.array(['POINT (%.6f %.6f)' %(x, y) for x, y in zip(lon, lat)], dtype=object)
+    #a few stores have no location
+    georeference[rng.random(total)<0.01] = ''
+    STORES = pandas.DataFrame({
+        'County': counties,
+        'License Number': ['%06d' %(700000 + k) for k in range(total)],
+        'Operation Type': 'Store',
+        'Establishment Type': rng.choice(STORE_TYPES, total),
+        'Entity Name': names,
+        'DBA Name': dbanames,
+        'Street Number': rng.integers(1, 9999, total).astype(str),
+        'Street Name': rng.choice(STREET_NAMES, total),
+        'Address Line 2': '',
+        'City': ['NEW YORK']*number_of_stores + ['ALBANY']*number_of_upstate,
+        'State': 'NY',
+        'Zip Code': zips,
+        'Square Footage': ['{:,}'.format(int(s)) for s in square_footage],
+        'Georeference': georeference,
+    })
+    #shuffle so that the NYC stores are spread through the file, as in the real database
+    return STORES.iloc[rng.permutation(total)].reset_index(drop=True)
+
+#the SimplyAnalytics consumer data (car access, population, per capita income) for the tracts, with a few tracts missing
+def make_consumer_data(TRACTS, rng):
+    county = {str(code): county_name for name, code, county_name in BOROUGHS}
+    names = np.array(['CT%s, %s County, NY' %(ct, county[boroct[0]]) for ct, boroct in zip(TRACTS['CT2010'], TRACTS['BoroCT2010'])])
+    CONSUMER_DATA={}
+    for column, values in [(CARACCESS_COLUMN, rng.uniform(5, 60, len(names))),
+                           (POPULATION_COLUMN, rng.integers(0, 9000, len(names)).astype(float)),
+                           (PERCAP_INC_COLUMN, rng.lognormal(10.5, 0.6, len(names)))]:
+        present = rng.random(len(names))>0.02
+        CONSUMER_DATA[column] = pandas.DataFrame({'Name': names[present], column: np.round(values[present], 2)})
+    return CONSUMER_DATA
+
+#the web-scraped supermarkets (ADDRESS, STATE ZIPCODE, LATITUDE, LONGITUDE), about a third of them duplicates of NYC Open Data
+#supermarkets a few feet away
+def write_web_supermarkets(path, STORES, zipcodes, bounds, number_of_supermarkets, rng):
+    lon, lat = (pandas.to_numeric(c, errors='coerce') for c in STORES['Georeference'].str.extract(r'POINT \((\S+) (\S+)\)').T.values)
+    supermarkets = np.nonzero(STORES['Entity Name'].str.contains('SUPERMARKET').to_numpy() & STORES['Zip Code'].isin(zipcodes).to_numpy()
+                              & ~np.isnan(lon))[0]
+    duplicates = rng.choice(supermarkets, min(number_of_supermarkets//3, len(supermarkets)), replace=False)
+    number_of_new = number_of_supermarkets - len(duplicates)
+    lonmin, latmin, lonmax, latmax = bounds
+    web_lon = np.concatenate([lon[duplicates] + rng.normal(0, 1e-4, len(duplicates)), rng.uniform(lonmin, lonmax, number_of_new)])
+    web_lat = np.concatenate([lat[duplicates] + rng.normal(0, 1e-4, len(duplicates)), rng.uniform(latmin, latmax, number_of_new)])
+    with open(path, 'w') as f:
+        f.write("#INFORMATION ON SUPERMARKETS IN NYC - PARSED FROM http://supermarketpage.com/supermarkets and Bing maps API\n")
+        f.write("#ADDRESS, LATITUDE, LONGITUDE\n")
+        for k in range(number_of_supermarkets):
+            f.write("%d %s NEW YORK,  NY %s, %.6f, %.6f\n" %(rng.integers(1, 9999), rng.choice(STREET_NAMES), rng.choice(zipcodes),
+                                                           web_lat[k], web_lon[k]))
+
+#street graph on a grid of STREET_SPACING covering the bounds, with the node positions jittered a little. The boroughs are
+#separated by rivers, which only every STREETS_PER_BRIDGE-th street crosses. Returns the node coordinates and edge end nodes
+def make_street_graph(bounds, rng):
+    lonmin, latmin, lonmax, latmax = bounds
+    nx = max(int(round((lonmax-lonmin)/STREET_SPACING)), 1) + 1
+    ny = max(int(round((latmax-latmin)/STREET_SPACING)), 1) + 1
+    columns, rows = np.meshgrid(np.arange(nx), np.arange(ny))
+    node_lon = lonmin + columns.ravel()*STREET_SPACING + rng.uniform(-0.1, 0.1, nx*ny)*STREET_SPACING
+    node_lat = latmin + rows.ravel()*STREET_SPACING + rng.uniform(-0.1, 0.1, nx*ny)*STREET_SPACING
+    node = np.arange(nx*ny).reshape(ny, nx)
+    #east-west streets cross a river where the borough of the node columns changes (as the tract strips do)
+    borough = np.minimum(np.arange(nx)*len(BOROUGHS)//nx, len(BOROUGHS)-1)
+    crosses_river = borough[1:]!=borough[:-1]
+    east = np.ones((ny, nx-1), dtype=bool)
+    east[:, crosses_river] = (np.arange(ny)%STREETS_PER_BRIDGE==0)[:,None]
+    edge_from = np.concatenate([node[:,:-1][east], node[:-1,:].ravel()])
+    edge_to = np.concatenate([node[:,1:][east], node[1:,:].ravel()])
+    return node_lon, node_lat, edge_from, edge_to
+
+#write a full synthetic dataset into out_dir, returns a dict with the path of each file (keys tracts, zipcodes, food_stores,
+#car_access, population, percap_income, web_supermarkets, street_graph)
+def generate_dataset(out_dir, scale=1.0, seed=0):
+    rng = np.random.default_rng(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    bounds = synthetic_bounds(scale)
+    PATHS = {key: os.path.join(out_dir, name) for key, name in [
+        ('tracts', 'nyct2010.csv'), ('zipcodes', 'MODZCTA.csv'), ('food_stores', 'Retail_Food_Stores.csv'),
+        ('car_access', 'Percent_Households_One_Vehicle_Available.csv'), ('population', 'Population_by_CT.csv'),
+        ('percap_income', 'Per_Capita_Income_CT.csv'), ('web_supermarkets', 'SUPERMARKET_ADDRESSES_AND_COORDINATES_WEB'),
+        ('street_graph', 'street_graph.npz')]}
+
+    TRACTS = make_tracts(bounds, rng)
+    TRACTS.to_csv(PATHS['tracts'], index=False)
+    zipcodes, ZIPCODES = make_zipcodes(max(int(round(NYC_ZIPCODES*scale)), 2))
+    ZIPCODES.to_csv(PATHS['zipcodes'], index=False)
+    number_of_stores = int(round(NYC_FOOD_STORES*scale))
+    STORES = make_food_stores(bounds, zipcodes, number_of_stores, int(round(number_of_stores*UPSTATE_STORES_PER_NYC_STORE)), rng)
+    STORES.to_csv(PATHS['food_stores'], index=False)
+    CONSUMER_DATA = make_consumer_data(TRACTS, rng)
+    for key, column in [('car_access', CARACCESS_COLUMN), ('population', POPULATION_COLUMN), ('percap_income', PERCAP_INC_COLUMN)]:
+        CONSUMER_DATA[column].to_csv(PATHS[key], index=False)
+    write_web_supermarkets(PATHS['web_supermarkets'], STORES, zipcodes, bounds, max(int(round(NYC_WEB_SUPERMARKETS*scale)), 1), rng)
+    save_street_graph(PATHS['street_graph'], *make_street_graph(bounds, rng))
+    return PATHS
@@ -0,0 +1,171 @@
+#Author(s)     : Pedro Espino (pespino@berkeley.edu)
+#Licence       : GPLv3
+
+# This module calculates the Food Desert and Food Swamp Indices for individual census tracts. Once the supermarket and bodega
+# coordinates are loaded the tracts are independent of each other, so they can be spread across a pool of worker processes.
+# Each worker builds its store KD-trees once when it starts, and results are streamed back in the same order as the tracts
+# were given, so a parallel run writes exactly the same DESERT_SWAMP_INDICES as a serial one.
+
+import multiprocessing
+import numpy as np
+import shapely
+
+from grid_sampling import sample_geometry, adaptive_sample_geometry
+from store_counting import build_store_tree, count_stores_within
+from street_network import snap_to_nodes
+from instrumentation import timed_call
+
+#header and row format of the DESERT_SWAMP_INDICES file, one row per polygon part of each census tract
+RESULTS_HEADER="#[1]Boro [2]CTCode [3]Desert [4]Swamp [5]No.Bodegas [6]No.People\n"
+
+def format_result_row(boroname, boro_census_tract, food_desert_index, food_swamp_index, number_of_bodegas, population_in_ct):
+    return "%s %s %1.5e %1.5e %1.5e %1.5e \n" %(boroname, boro_census_tract, food_desert_index, food_swamp_index, number_of_bodegas, population_in_ct)
+
+#the food access index, number of bodegas, and desert and swamp indices from the average number of supermarkets within
+#walking and driving distance and bodegas within walking distance. Works on single values or arrays (e.g. of points)
+def access_indices(supermarkets_walking, supermarkets_driving, bodegas_walking, fraction_of_vehicles_in_ct, population_in_ct):
+    food_access_ind = np.maximum(1.0, supermarkets_walking + supermarkets_driving*fraction_of_vehicles_in_ct)
+    number_of_bodegas = bodegas_walking
+    food_desert_index = population_in_ct/food_access_ind
+    food_swamp_index = number_of_bodegas/food_access_ind
+    return food_access_ind, number_of_bodegas, food_desert_index, food_swamp_index
+
+#state shared by every tract handled in this process (store KD-trees and distances), set up by init_worker
+_WORKER_STATE = {}
+
+#set up the store KD-trees and distances (in degrees) used for every tract handled by this process. With NETWORK_COUNTS (see
+#street_network.network_count_tables) stores are counted along the street network instead of within straight-line distances.
+#With adaptive_tolerance, tracts are sampled on an adaptive quadtree down to resolution (see grid_sampling) instead of a grid
+def init_worker(supermarket_coords, bodega_coords, resolution, walking_distance, driving_distance, NETWORK_COUNTS=None,
+                adaptive_tolerance=None):
+    _WORKER_STATE['supermarket_tree'] = build_store_tree(supermarket_coords)
+    _WORKER_STATE['bodega_tree'] = build_store_tree(bodega_coords)
+    _WORKER_STATE['resolution'] = resolution
+    _WORKER_STATE['walking_distance'] = walking_distance
+    _WORKER_STATE['driving_distance'] = driving_distance
+    _WORKER_STATE['network_counts'] = NETWORK_COUNTS
+    _WORKER_STATE['adaptive_tolerance'] = adaptive_tolerance
+
+#number of stores within reach of each sample point, where key names the stores and distance (e.g. 'supermarkets_walking')
+#for the per-node counts of a street network run
+def _count_stores(key, store_tree, xps, yps, radius):
+    NETWORK_COUNTS = _WORKER_STATE.get('network_counts')
+    if(NETWORK_COUNTS is None):
+        return count_stores_within(store_tree, xps, yps, radius)
+    return NETWORK_COUNTS[key][snap_to_nodes(NETWORK_COUNTS['node_tree'], xps, yps)]
+
+#supermarkets within walking and driving distance and bodegas within walking distance of each sample point, as an (n, 3) array
+def _count_samples(xps, yps):
+    return np.column_stack([
+        _count_stores('supermarkets_walking', _WORKER_STATE['supermarket_tree'], xps, yps, _WORKER_STATE['walking_distance']),
+        _count_stores('supermarkets_driving', _WORKER_STATE['supermarket_tree'], xps, yps, _WORKER_STATE['driving_distance']),
+        _count_stores('bodegas_walking', _WORKER_STATE['bodega_tree'], xps, yps, _WORKER_STATE['walking_distance'])])
+
+#mean of the counts at the sample points, weighted by the area of each sample in adaptive runs
+def _average(enumerator, weights):
+    if(weights is None):
+        return np.mean(enumerator)
+    return np.average(enumerator, weights=weights)
+
+#calculate the indices for each polygon part of a census tract, returns one dict per part. Parks and cemeteries (NTA codes
+#ending in '99') only carry their outline, the other parts carry the food access, bodega, desert and swamp quantities.
+#If stats is a dict, the number of sample points and of stores counted around them are put into it
+def compute_tract_indices(tract_geometry, ntacode, fraction_of_vehicles_in_ct, population_in_ct, stats=None):
+    supermarket_tree = _WORKER_STATE['supermarket_tree']
+    bodega_tree = _WORKER_STATE['bodega_tree']
+    resolution = _WORKER_STATE['resolution']
+    walking_distance = _WORKER_STATE['walking_distance']
+    driving_distance = _WORKER_STATE['driving_distance']
+    adaptive_tolerance = _WORKER_STATE.get('adaptive_tolerance')
+
+    TRACT_PARTS=[]
+    xps=np.empty(0)
+    yps=np.empty(0)
+    #area of each sample point in adaptive runs (every grid point counts the same otherwise)
+    sample_weights=None if adaptive_tolerance is None else np.empty(0)
+    supermarket_enumerator_walking=np.empty(0, dtype=int)
+    supermarket_enumerator_driving=np.empty(0, dtype=int)
+    bodega_enumerator_walking=np.empty(0, dtype=int)
+    for geom in shapely.get_parts(tract_geometry):
+        xs, ys = geom.exterior.xy
+        #areas ending in '99' are parks or cemeteries
+        if(ntacode[-2:]=='99'):
+            TRACT_PARTS.append({'xs': np.asarray(xs), 'ys': np.asarray(ys), 'park': True})
+            continue
+        if(adaptive_tolerance is not None):
+            #sample the geometry on a quadtree refined where the store counts change, with the counts at each sample
+            geom_xps, geom_yps, geom_weights, geom_counts = adaptive_sample_geometry(geom, _count_samples, resolution, adaptive_tolerance)
+            sample_weights = np.concatenate([sample_weights, geom_weights])
+            supermarket_enumerator_walking = np.concatenate([supermarket_enumerator_walking, geom_counts[:,0]])
+            supermarket_enumerator_driving = np.concatenate([supermarket_enumerator_driving, geom_counts[:,1]])
+            bodega_enumerator_walking = np.concatenate([bodega_enumerator_walking, geom_counts[:,2]])
+        else:
+            #sample a grid of points in this geometry, keeping the ones which fall inside it
+            geom_xps, geom_yps = sample_geometry(geom, resolution)
+            #for each sample point, count the number of supermarkets within walking and driving distance, and the bodegas within walking distance
+            supermarket_enumerator_walking = np.concatenate([supermarket_enumerator_walking, _count_stores('supermarkets_walking', supermarket_tree, geom_xps, geom_yps, walking_distance)])
+            supermarket_enumerator_driving = np.concatenate([supermarket_enumerator_driving, _count_stores('supermarkets_driving', supermarket_tree, geom_xps, geom_yps, driving_distance)])
+            bodega_enumerator_walking = np.concatenate([bodega_enumerator_walking, _count_stores('bodegas_walking', bodega_tree, geom_xps, geom_yps, walking_distance)])
+        xps = np.concatenate([xps, geom_xps])
+        yps = np.concatenate([yps, geom_yps])
+        #average these over the sample points (no sample points means no accessible stores)
+        if(len(xps)>0):
+            avg_walking_distance_supermarkets = _average(supermarket_enumerator_walking, sample_weights)
+            avg_driving_distance_supermarkets = _average(supermarket_enumerator_driving, sample_weights)
+            avg_walking_distance_bodegas = _average(bodega_enumerator_walking, sample_weights)
+        else:
+            avg_walking_distance_supermarkets = 0.0
+            avg_driving_distance_supermarkets = 0.0
+            avg_walking_distance_bodegas = 0.0
+
+        #calculate the number of accessible markets and other relevant quantities
+        food_access_ind, number_of_bodegas, food_desert_index, food_swamp_index = access_indices(
+            avg_walking_distance_supermarkets, avg_driving_distance_supermarkets, avg_walking_distance_bodegas,
+            fraction_of_vehicles_in_ct, population_in_ct)
+        TRACT_PARTS.append({'xs': np.asarray(xs), 'ys': np.asarray(ys), 'park': False,
+                            'food_access_ind': food_access_ind, 'number_of_bodegas': number_of_bodegas,
+                            'food_desert_index': food_desert_index, 'food_swamp_index': food_swamp_index})
+    if(stats is not None):
+        stats['sample_points'] = len(xps)
+        stats['stores_counted'] = int(np.sum(supermarket_enumerator_walking) + np.sum(supermarket_enumerator_driving) + np.sum(bodega_enumerator_walking))
+    return TRACT_PARTS
+
+#unpack a task tuple (tract index, geometry, NTA code, vehicle fraction, population) for the process pool, returns the tract
+#index, its parts and its statistics (time taken, sample points and stores counted)
+def _compute_task(task):
+    tract_index, tract_geometry, ntacode, fraction_of_vehicles_in_ct, population_in_ct = task
+    stats = {'tract_index': tract_index}
+    TRACT_PARTS, stats['wall_s'], stats['cpu_s'] = timed_call(compute_tract_indices, tract_geometry, ntacode,
+                                                              fraction_of_vehicles_in_ct, population_in_ct, stats)
+    return tract_index, TRACT_PARTS, stats
+
+#calculate the indices for a list of task tuples (tract index, geometry, NTA code, vehicle fraction, population), yielding
+#(tract index, parts) in the same order as TASKS. With number_of_workers > 1 the tracts are spread across a process pool.
+#If TRACT_STATS is a list, the statistics of each tract (see _compute_task) are appended to it as the tracts come back.
+#NETWORK_COUNTS switches the store counts to the street network and adaptive_tolerance the sampling to adaptive quadtrees
+#(see init_worker)
+def iterate_tract_indices(TASKS, supermarket_coords, bodega_coords, resolution, walking_distance, driving_distance,
+                          number_of_workers=1, chunksize=4, TRACT_STATS=None, NETWORK_COUNTS=None, adaptive_tolerance=None):
+    init_args = (np.asarray(supermarket_coords, dtype=float), np.asarray(bodega_coords, dtype=float),
+                 resolution, walking_distance, driving_distance, NETWORK_COUNTS, adaptive_tolerance)
+    if(number_of_workers is None or number_of_workers<=1):
+        init_worker(*init_args)
+        results = map(_compute_task, TASKS)
+    else:
+        results = iterate_pool(_compute_task, TASKS, init_worker, init_args, number_of_workers, chunksize)
+    for tract_index, TRACT_PARTS, stats in results:
+        if(TRACT_STATS is not None):
+            TRACT_STATS.append(stats)
+        yield tract_index, TRACT_PARTS
+
+#run function over TASKS in a process pool whose workers are set up by initializer(*init_args), yielding the results in task order
+def iterate_pool(function, TASKS, initializer, init_args, number_of_workers, chunksize):
+    #forked workers inherit the store coordinate arrays instead of receiving a pickled copy with every task
+    if('fork' in multiprocessing.get_all_start_methods()):
+        context = multiprocessing.get_context('fork')
+    else:
+        context = multiprocessing.get_context()
+    with context.Pool(processes=number_of_workers, initializer=initializer, initargs=init_args) as pool:
+        #imap hands results back in task order as soon as they are ready, which keeps the output deterministic
+        for result in pool.imap(function, TASKS, chunksize=chunksize):
+            yield result
@@ -0,0 +1,123 @@
+#Author(s)     : Pedro Espino (pespino@berkeley.edu)
+#Licence       : GPLv3
+
+# This module answers "what if" questions about the stores: how the Food Desert and Food Swamp Indices of the census tracts
+# change if supermarkets or bodegas open at some places, or if some of the existing ones close. Every tract is sampled once
+# (on the same grid as tract_indices) and the number of stores within walking and driving distance of each sample point is
+# kept in memory, along with a KD-tree of the sample points and the per-tract sums of the counts. A store only changes the
+# counts of the sample points within driving distance of it, so each change is one ball query around the store, and the
+# per-tract sums are patched by the number of affected samples in each tract. The indices of the affected tracts are then
+# recomputed from the patched averages, without going back over the other sample points or tracts.
+
+import numpy as np
+import shapely
+from scipy.spatial import cKDTree
+
+from grid_sampling import sample_geometry
+from store_counting import build_store_tree, count_stores_within
+from tract_indices import access_indices
+
+#columns of the per-sample and per-tract counts
+COUNT_COLUMNS=['supermarkets_walking', 'supermarkets_driving', 'bodegas_walking']
+
+#sample every tract task (tract index, geometry, NTA code, vehicle fraction, population) which is not a park or cemetery
+#(NTA codes ending in '99') and count the stores within walking and driving distance (in degrees) of its sample points,
+#with workers threads sharing the store counts (-1 uses every CPU). Returns the simulator state: the store coordinates and
+#KD-trees, the sample points with their tract and counts, and the per-tract sums of the counts, number of samples, vehicle
+#fraction, population and indices (food access, bodegas, desert and swamp) before any change
+def build_whatif_state(TASKS, supermarket_coords, bodega_coords, resolution, walking_distance, driving_distance, workers=1):
+    STATE = {'supermarket_coords': np.asarray(supermarket_coords, dtype=float).reshape(-1, 2),
+             'bodega_coords': np.asarray(bodega_coords, dtype=float).reshape(-1, 2),
+             'walking_distance': walking_distance, 'driving_distance': driving_distance}
+    STATE['supermarket_tree'] = build_store_tree(STATE['supermarket_coords'])
+    STATE['bodega_tree'] = build_store_tree(STATE['bodega_coords'])
+    TRACTS=[]
+    xps=[]
+    yps=[]
+    sample_tracts=[]
+    for tract_index, tract_geometry, ntacode, fraction_of_vehicles_in_ct, population_in_ct in TASKS:
+        if(ntacode[-2:]=='99'):
+            continue
+        for geom in shapely.get_parts(tract_geometry):
+            geom_xps, geom_yps = sample_geometry(geom, resolution)
+            xps.append(geom_xps)
+            yps.append(geom_yps)
+            sample_tracts.append(np.full(len(geom_xps), len(TRACTS), dtype=np.int64))
+        TRACTS.append((tract_index, fraction_of_vehicles_in_ct, population_in_ct))
+    xps = np.concatenate(xps) if xps else np.empty(0)
+    yps = np.concatenate(yps) if yps else np.empty(0)
+    STATE['sample_tract'] = np.concatenate(sample_tracts) if sample_tracts else np.zeros(0, dtype=np.int64)
+    STATE['sample_tree'] = cKDTree(np.column_stack([xps, yps]))
+    STATE['sample_counts'] = np.column_stack([
+        count_stores_within(STATE['supermarket_tree'], xps, yps, walking_distance, workers=workers),
+        count_stores_within(STATE['supermarket_tree'], xps, yps, driving_distance, workers=workers),
+        count_stores_within(STATE['bodega_tree'], xps, yps, walking_distance, workers=workers)]).reshape(-1, 3)
+    number_of_tracts = len(TRACTS)
+    STATE['tract_index'] = np.array([tract[0] for tract in TRACTS], dtype=np.int64)
+    STATE['vehicle_fraction'] = np.array([tract[1] for tract in TRACTS], dtype=float)
+    STATE['population'] = np.array([tract[2] for tract in TRACTS], dtype=float)
+    STATE['sample_points'] = np.bincount(STATE['sample_tract'], minlength=number_of_tracts)
+    STATE['tract_counts'] = np.column_stack([np.bincount(STATE['sample_tract'], weights=STATE['sample_counts'][:,k],
+                                                         minlength=number_of_tracts) for k in range(3)]).reshape(-1, 3)
+    STATE['food_access_ind'], STATE['number_of_bodegas'], STATE['food_desert_index'], STATE['food_swamp_index'] = _tract_indices(
+        STATE, STATE['tract_counts'], np.arange(number_of_tracts))
+    return STATE
+
+#food access, bodega, desert and swamp indices of the tracts (positions in the state) from the sums of their counts
+def _tract_indices(STATE, tract_counts, tracts):
+    sample_points = STATE['sample_points'][tracts]
+    #no sample points means no accessible stores
+    averages = tract_counts/np.maximum(sample_points, 1)[:,None]
+    return access_indices(averages[:,0], averages[:,1], averages[:,2], STATE['vehicle_fraction'][tracts], STATE['population'][tracts])
+
+#position (in the store coordinates) of the existing store each of coords refers to, the nearest one within match_distance
+#degrees. A store can only be removed once
+def _match_stores(store_tree, coords, match_distance, kind):
+    if(len(coords)==0):
+        return np.zeros(0, dtype=np.int64)
+    distances, matches = store_tree.query(coords, distance_upper_bound=match_distance)
+    missing = np.flatnonzero(~np.isfinite(distances))
+    if(len(missing)>0):
+        raise ValueError("there is no %s within %g degrees of (%g, %g) to remove" %(kind, match_distance, coords[missing[0],0], coords[missing[0],1]))
+    if(len(np.unique(matches))<len(matches)):
+        raise ValueError("the same %s is removed more than once" %kind)
+    return matches
+
+#add sign times the number of stores at coords within radius of each sample point to column of the per-tract changes
+def _count_changes(STATE, changes, column, coords, radius, sign):
+    if(len(coords)==0):
+        return
+    NEIGHBOURS = STATE['sample_tree'].query_ball_point(coords, radius)
+    samples = np.concatenate([np.asarray(neighbours, dtype=np.int64) for neighbours in NEIGHBOURS])
+    changes[:,column] += sign*np.bincount(STATE['sample_tract'][samples], minlength=len(changes))
+
+#per-tract changes of the indices if the supermarkets and bodegas at the given coordinates ((n, 2) arrays of longitude and
+#latitude) opened, and the existing ones nearest to the removal coordinates (within match_distance degrees) closed. The state
+#is left untouched. Returns a dict of arrays over the affected tracts only: their tract index, the change of their summed
+#counts, their indices before and after and the changes of the indices
+def simulate_changes(STATE, add_supermarkets=(), remove_supermarkets=(), add_bodegas=(), remove_bodegas=(), match_distance=1e-4):
+    add_supermarkets = np.asarray(add_supermarkets, dtype=float).reshape(-1, 2)
+    add_bodegas = np.asarray(add_bodegas, dtype=float).reshape(-1, 2)
+    remove_supermarkets = np.asarray(remove_supermarkets, dtype=float).reshape(-1, 2)
+    remove_bodegas = np.asarray(remove_bodegas, dtype=float).reshape(-1, 2)
+    for coords in (add_supermarkets, add_bodegas, remove_supermarkets, remove_bodegas):
+        if(not np.isfinite(coords).all()):
+            raise ValueError("stores need a finite longitude and latitude each")
+    #the removed stores are counted out from where they actually are
+    removed_supermarkets = STATE['supermarket_coords'][_match_stores(STATE['supermarket_tree'], remove_supermarkets, match_distance, 'supermarket')]
+    removed_bodegas = STATE['bodega_coords'][_match_stores(STATE['bodega_tree'], remove_bodegas, match_distance, 'bodega')]
+
+    changes = np.zeros(STATE['tract_counts'].shape, dtype=np.int64)
+    for coords, sign in ((add_supermarkets, 1), (removed_supermarkets, -1)):
+        _count_changes(STATE, changes, 0, coords, STATE['walking_distance'], sign)
+        _count_changes(STATE, changes, 1, coords, STATE['driving_distance'], sign)
+    for coords, sign in ((add_bodegas, 1), (removed_bodegas, -1)):
+        _count_changes(STATE, changes, 2, coords, STATE['walking_distance'], sign)
+
+    tracts = np.flatnonzero(changes.any(axis=1))
+    _, _, food_desert_index, food_swamp_index = _tract_indices(STATE, STATE['tract_counts'][tracts] + changes[tracts], tracts)
+    return {'tract_index': STATE['tract_index'][tracts], 'count_changes': changes[tracts],
+            'food_desert_index_before': STATE['food_desert_index'][tracts], 'food_desert_index': food_desert_index,
+            'food_desert_index_delta': food_desert_index - STATE['food_desert_index'][tracts],
+            'food_swamp_index_before': STATE['food_swamp_index'][tracts], 'food_swamp_index': food_swamp_index,
+            'food_swamp_index_delta': food_swamp_index - STATE['food_swamp_index'][tracts]}